@@ -1,119 +1,338 @@
-from flask import Flask, jsonify
-from flask_cors import CORS
-from pymongo import MongoClient
-from dotenv import load_dotenv
 import os
-from flasgger import Swagger
+import threading
+import time
+
+from flask import Flask, jsonify
 
+from audit import AuditLog
 from auth import auth_bp
+from cors import init_cors, parse_origins
+from images import ImageStore, images_bp
+from jobs import jobs_bp
+from job_runner import JobRunner
+from locations import location_bp
+from openapi import init_openapi
 from products import product_bp
-
-# --- Load environment variables ---
-load_dotenv()
-app = Flask(__name__)
-
-# --- Configuration ---
-app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
-mongo_uri = os.getenv('MONGO_URI')
-
-# --- Enable CORS ---
-CORS(app, resources={
-    r"/*": {
-        "origins": [
-            "http://localhost:3000",
-            "https://scintillating-fairy-1ea183.netlify.app"
-        ],
-        "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-        "allow_headers": ["Content-Type", "Authorization"],
-    }
-}, supports_credentials=True)
-
-# --- Swagger Configuration ---
-swagger_template = {
-    "swagger": "2.0",
-    "info": {
-        "title": "📦 Inventory Management API",
-        "description": """
-Welcome to the **Inventory Management API**! 🚀
-
-This API provides endpoints for managing products and authenticating users.
-
----
-
-### 🔐 Authentication Steps
-
-1. Register a new user via the **POST /register** endpoint.  
-2. Log in with your credentials using **POST /login** to receive a **JWT access token**.  
-3. Click the green **Authorize** button and enter your token in this format: **Bearer <your_token>**
-4. You can now access all **protected product endpoints**.
-
----
-
-### 📘 General Rules
-
-- All request and response bodies use **JSON format**.  
-- Refer to the **Models section** below for required schema formats.
-""",
-        "version": "1.0.0"
-    },
-    "host": "localhost:8080",
-    "basePath": "/",
-    "schemes": [
-        "http"
-    ],
-    "securityDefinitions": {
-        "bearerAuth": {
-            "type": "apiKey",
-            "name": "Authorization",
-            "in": "header",
-            "description": "Enter your bearer token in the format: `Bearer <token>`"
-        }
+from ratelimit import RateLimiter, parse_limits
+from utils import deadline_stats
+from validation import compile_validators
+from write_behind import QuantityWriteBuffer
+from sku_index import SkuIndex, HotProductCache
+from ledger import StockLedger
+from storage import create_audit_store, create_job_store, create_location_store, create_movement_store, create_stores
+
+
+def _flag(name, default):
+    return os.getenv(name, default).lower() in ('1', 'true', 'yes')
+
+
+def load_config():
+    """Reads the app configuration from the environment (and `.env`)."""
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    return {
+        'SECRET_KEY': os.getenv('SECRET_KEY'),
+        'MONGO_URI': os.getenv('MONGO_URI'),
+        # Connections the Mongo pool keeps open; warmup opens the first one.
+        'MONGO_MIN_POOL_SIZE': int(os.getenv('MONGO_MIN_POOL_SIZE', '0')),
+        # STORAGE_BACKEND: "mongo" (default), "memory" or "sqlite" (file at SQLITE_PATH)
+        'STORAGE_BACKEND': os.getenv('STORAGE_BACKEND', 'mongo'),
+        'SQLITE_PATH': os.getenv('SQLITE_PATH', 'inventory.db'),
+        'LOOKUP_MAX_ITEMS': int(os.getenv('LOOKUP_MAX_ITEMS', '100')),
+
+        # --- Request deadlines (seconds) applied to every Mongo call in a route ---
+        # REQUEST_DEADLINES overrides single routes, e.g. "products.get_products=2,auth.login=3"
+        'REQUEST_DEADLINE': float(os.getenv('REQUEST_DEADLINE', '5')),
+        'REQUEST_DEADLINES': {
+            endpoint.strip(): float(seconds)
+            for endpoint, seconds in (
+                item.split('=', 1) for item in os.getenv('REQUEST_DEADLINES', '').split(',') if '=' in item
+            )
+        },
+
+        'CORS_ENABLED': _flag('CORS_ENABLED', 'true'),
+        'CORS_ORIGINS': parse_origins(os.getenv(
+            'CORS_ORIGINS', 'http://localhost:3000,https://scintillating-fairy-1ea183.netlify.app'
+        )),
+        # Seconds browsers may reuse a preflight. Chromium caps this at 7200, Firefox at 86400.
+        'CORS_MAX_AGE': int(os.getenv('CORS_MAX_AGE', '7200')),
+
+        # --- Rate limiting and load shedding ---
+        # RATE_LIMITS: tokens per second / burst per client IP and per user, for each route class.
+        # CONCURRENCY_LIMITS: in-flight requests each route class may hold in this worker.
+        'RATE_LIMIT_ENABLED': _flag('RATE_LIMIT_ENABLED', 'true'),
+        'RATE_LIMITS': parse_limits(
+            os.getenv('RATE_LIMITS', 'auth=1/10,write=20/40,read=50/100'),
+            lambda v: tuple(float(x) for x in v.split('/', 1))
+        ),
+        'CONCURRENCY_LIMITS': parse_limits(os.getenv('CONCURRENCY_LIMITS', 'auth=4,write=8,read=16'), int),
+        # Reverse proxies in front of the app whose X-Forwarded-For / X-Forwarded-Proto are trusted.
+        # Without it every client behind a router shares the router's address (and its rate limit).
+        'TRUSTED_PROXIES': int(os.getenv('TRUSTED_PROXIES', '0')),
+
+        # --- SKU index and hot SKU lookup cache ---
+        'SKU_INDEX_TTL': float(os.getenv('SKU_INDEX_TTL', '300')),
+        'SKU_CACHE_SIZE': int(os.getenv('SKU_CACHE_SIZE', '1024')),
+        'SKU_CACHE_TTL': float(os.getenv('SKU_CACHE_TTL', '10')),
+
+        # --- Write-behind for quantity updates (opt-in) ---
+        'QUANTITY_WRITE_BEHIND': _flag('QUANTITY_WRITE_BEHIND', 'false'),
+        'QUANTITY_FLUSH_INTERVAL': float(os.getenv('QUANTITY_FLUSH_INTERVAL', '0.5')),
+        'QUANTITY_MAX_PENDING': int(os.getenv('QUANTITY_MAX_PENDING', '500')),
+        'QUANTITY_MAX_STALENESS': float(os.getenv('QUANTITY_MAX_STALENESS', '2.0')),
+
+        # --- Append-only stock movement ledger (opt-in) ---
+        'STOCK_LEDGER': _flag('STOCK_LEDGER', 'false'),
+        'LEDGER_FLUSH_INTERVAL': float(os.getenv('LEDGER_FLUSH_INTERVAL', '0.2')),
+        'LEDGER_BATCH_SIZE': int(os.getenv('LEDGER_BATCH_SIZE', '500')),
+
+        # --- Audit trail of product and auth events, written in batches ---
+        'AUDIT_ENABLED': _flag('AUDIT_ENABLED', 'true'),
+        'AUDIT_FLUSH_INTERVAL': float(os.getenv('AUDIT_FLUSH_INTERVAL', '1.0')),
+        'AUDIT_BATCH_SIZE': int(os.getenv('AUDIT_BATCH_SIZE', '200')),
+        'AUDIT_MAX_QUEUE': int(os.getenv('AUDIT_MAX_QUEUE', '10000')),
+        'AUDIT_BLOCK_TIMEOUT': float(os.getenv('AUDIT_BLOCK_TIMEOUT', '0.005')),
+        'AUDIT_RETENTION_DAYS': float(os.getenv('AUDIT_RETENTION_DAYS', '90')),
+
+        # --- Product images (content-addressed, on local disk) ---
+        'IMAGES_DIR': os.getenv('IMAGES_DIR'),
+        'IMAGE_MAX_BYTES': int(os.getenv('IMAGE_MAX_BYTES', str(5 * 1024 * 1024))),
+        'IMAGE_MAX_PIXELS': int(os.getenv('IMAGE_MAX_PIXELS', '40000000')),
+        'IMAGE_THUMBNAIL_SIZES': tuple(int(s) for s in os.getenv('IMAGE_THUMBNAIL_SIZES', '128,512').split(',') if s.strip()),
+        # Prefix of the image URLs in product responses, e.g. "https://api.example.com"; relative when empty.
+        'IMAGE_BASE_URL': os.getenv('IMAGE_BASE_URL', '').rstrip('/'),
+
+        # --- Background jobs (imports and exports) ---
+        'JOB_WORKERS': int(os.getenv('JOB_WORKERS', '2')),
+        'JOB_MAX_QUEUED': int(os.getenv('JOB_MAX_QUEUED', '100')),
+        'JOB_LEASE': float(os.getenv('JOB_LEASE', '30')),
+        'JOB_CHUNK_SIZE': int(os.getenv('JOB_CHUNK_SIZE', '500')),
+        # Import rows are stored with the job, which keeps it well below Mongo's 16MB document limit.
+        'JOB_MAX_ROWS': int(os.getenv('JOB_MAX_ROWS', '20000')),
+        'JOBS_DIR': os.getenv('JOBS_DIR'),
+
+        # --- OpenAPI spec (precomputed) and optional Swagger UI ---
+        'SWAGGER_UI': _flag('SWAGGER_UI', 'false'),
+        'OPENAPI_SPEC_DIR': os.getenv('OPENAPI_SPEC_DIR'),
+        'OPENAPI_MAX_AGE': int(os.getenv('OPENAPI_MAX_AGE', '3600')),
+
+        # --- Warmup: "background" (default), "sync" or "off" ---
+        'WARMUP': os.getenv('WARMUP', 'background'),
+        'WARMUP_TIMEOUT': float(os.getenv('WARMUP_TIMEOUT', '10')),
     }
-}
 
-swagger = Swagger(app, template=swagger_template)
 
-# --- MongoDB Setup ---
-try:
-    client = MongoClient(mongo_uri)
-    db = client.inventory_db
+def create_app(config=None, db=None):
+    """
+    Builds the API app. `config` overrides values read from the environment;
+    `db` injects an already opened Mongo database instead of connecting to
+    MONGO_URI. Nothing talks to the database here: the connection pool and
+    caches are filled by `warmup`, which `/ready` reports on.
+    """
+    app = Flask(__name__)
+    app.config.update(load_config())
+    if config:
+        app.config.update(config)
+
+    # --- Client address behind reverse proxies ---
+    if app.config['TRUSTED_PROXIES']:
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        hops = app.config['TRUSTED_PROXIES']
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops)
+
+    # --- Enable CORS ---
+    # Registered first, so preflights are answered before any other hook.
+    if app.config['CORS_ENABLED']:
+        init_cors(app)
+
+    # --- MongoDB Setup ---
+    # connect=False defers server discovery to the first operation (or warmup),
+    # so creating the app never blocks on the network.
+    if db is None and app.config['STORAGE_BACKEND'] == 'mongo':
+        try:
+            from pymongo import MongoClient
+            client = MongoClient(app.config['MONGO_URI'], connect=False, minPoolSize=app.config['MONGO_MIN_POOL_SIZE'])
+            db = client.inventory_db
+        except Exception as e:
+            print(f"❌ Could not connect to MongoDB: {e}")
     app.db = db
-    print("✅ Connected to MongoDB:", db.name)
-except Exception as e:
-    print(f"❌ Could not connect to MongoDB: {e}")
-    db = None
-
-# --- Health Route ---
-@app.route("/health", methods=["GET"])
-def health_check():
+
+    # --- Storage Setup ---
+    store_ready = app.config['STORAGE_BACKEND'] != 'mongo' or db is not None
+    if store_ready:
+        app.product_store, app.user_store = create_stores(
+            app.config['STORAGE_BACKEND'], db=db, sqlite_path=app.config['SQLITE_PATH']
+        )
+        app.location_store = create_location_store(app.product_store)
+
+    if app.config['RATE_LIMIT_ENABLED']:
+        app.rate_limiter = RateLimiter(app.config['RATE_LIMITS'], app.config['CONCURRENCY_LIMITS'])
+
+    if store_ready:
+        app.sku_index = SkuIndex(app.product_store, ttl=app.config['SKU_INDEX_TTL'])
+        app.product_cache = HotProductCache(max_size=app.config['SKU_CACHE_SIZE'], ttl=app.config['SKU_CACHE_TTL'])
+
+    if app.config['QUANTITY_WRITE_BEHIND'] and store_ready:
+        app.quantity_buffer = QuantityWriteBuffer(
+            app.product_store,
+            flush_interval=app.config['QUANTITY_FLUSH_INTERVAL'],
+            max_pending=app.config['QUANTITY_MAX_PENDING'],
+            max_staleness=app.config['QUANTITY_MAX_STALENESS'],
+        )
+
+    if app.config['STOCK_LEDGER'] and store_ready:
+        app.stock_ledger = StockLedger(
+            create_movement_store(app.product_store),
+            app.product_store,
+            flush_interval=app.config['LEDGER_FLUSH_INTERVAL'],
+            batch_size=app.config['LEDGER_BATCH_SIZE'],
+        )
+
+    if app.config['AUDIT_ENABLED'] and store_ready:
+        app.audit_log = AuditLog(
+            create_audit_store(app.product_store, app.config['AUDIT_RETENTION_DAYS'] * 86400),
+            flush_interval=app.config['AUDIT_FLUSH_INTERVAL'],
+            batch_size=app.config['AUDIT_BATCH_SIZE'],
+            max_queue=app.config['AUDIT_MAX_QUEUE'],
+            block_timeout=app.config['AUDIT_BLOCK_TIMEOUT'],
+        )
+
+    app.config['IMAGES_DIR'] = app.config['IMAGES_DIR'] or os.path.join(app.root_path, 'images')
+    app.image_store = ImageStore(app.config['IMAGES_DIR'], app.config['IMAGE_THUMBNAIL_SIZES'], app.config['IMAGE_MAX_PIXELS'])
+
+    if store_ready:
+        app.config['JOBS_DIR'] = app.config['JOBS_DIR'] or os.path.join(app.root_path, 'jobs')
+        app.job_runner = JobRunner(
+            create_job_store(app.product_store),
+            app,
+            max_workers=app.config['JOB_WORKERS'],
+            max_queued=app.config['JOB_MAX_QUEUED'],
+            lease=app.config['JOB_LEASE'],
+        )
+
+    # --- Health Route ---
+    @app.route("/health", methods=["GET"])
+    def health_check():
+        try:
+            # Check MongoDB connection
+            if app.db is not None:
+                db_status = "connected"
+                db_name = app.db.name
+            elif store_ready:
+                db_status = "embedded"
+                db_name = None
+            else:
+                db_status = "disconnected"
+                db_name = None
+
+            return jsonify({
+                "status": "ok",
+                "service": "Inventory Management API",
+                "storage_backend": app.config['STORAGE_BACKEND'],
+                "database": db_status,
+                "database_name": db_name,
+                "deadlines": deadline_stats,
+                "rate_limiter": app.rate_limiter.stats if hasattr(app, 'rate_limiter') else None,
+                "stock_ledger": app.stock_ledger.stats if hasattr(app, 'stock_ledger') else None,
+                "jobs": app.job_runner.stats if hasattr(app, 'job_runner') else None,
+                "audit_log": app.audit_log.stats if hasattr(app, 'audit_log') else None
+            }), 200
+        except Exception as e:
+            return jsonify({
+                "status": "error",
+                "message": str(e)
+            }), 500
+
+    # --- Readiness Route ---
+    @app.route("/ready", methods=["GET"])
+    def readiness_check():
+        state = app.extensions['warmup']
+        if state['ready']:
+            return jsonify({"status": "ready", "warmup_seconds": state['seconds']}), 200
+        start_warmup(app)   # retries a failed warmup; no-op while one is running
+        res = jsonify({"status": "warming_up", "error": state['error']})
+        res.headers['Retry-After'] = '1'
+        return res, 503
+
+    # --- Register Blueprints ---
+    app.register_blueprint(auth_bp, url_prefix='/')
+    app.register_blueprint(product_bp, url_prefix='/products')
+    app.register_blueprint(location_bp, url_prefix='/locations')
+    app.register_blueprint(jobs_bp, url_prefix='/jobs')
+    app.register_blueprint(images_bp, url_prefix='/images')
+
+    # --- Request validation, compiled once from the swag_from body schemas ---
+    app.validators = compile_validators(app)
+
+    init_openapi(app)
+
+    # --- Warmup ---
+    app.extensions['warmup'] = {'ready': False, 'running': False, 'error': None, 'seconds': None}
+    if app.config['WARMUP'] == 'sync':
+        warmup(app)
+    elif app.config['WARMUP'] == 'background':
+        start_warmup(app)
+    else:
+        app.extensions['warmup']['ready'] = True
+
+    return app
+
+
+def warmup(app):
+    """
+    Pre-opens the database connection pool, creates the location, stock
+    ledger and audit indexes, picks up jobs interrupted by a restart and primes the
+    in-process caches (SKU index, OpenAPI spec) so the first requests don't
+    pay for them. Returns True once the app is ready.
+    """
+    state = app.extensions['warmup']
+    started = time.perf_counter()
     try:
-        # Check MongoDB connection
-        if db is not None:
-            db_status = "connected"
-            db_name = db.name
-        else:
-            db_status = "disconnected"
-            db_name = None
-
-        return jsonify({
-            "status": "ok",
-            "service": "Inventory Management API",
-            "database": db_status,
-            "database_name": db_name
-        }), 200
+        if app.db is not None:
+            import pymongo
+            with pymongo.timeout(app.config['WARMUP_TIMEOUT']):
+                app.db.command('ping')
+            print("✅ Connected to MongoDB:", app.db.name)
+        if hasattr(app, 'sku_index'):
+            len(app.sku_index)
+        if hasattr(app, 'location_store'):
+            app.location_store.indexed = app.location_store.ensure_indexes()
+        if hasattr(app, 'stock_ledger'):
+            app.stock_ledger.ensure_indexes()
+        if hasattr(app, 'audit_log'):
+            app.audit_log.ensure_indexes()
+        if hasattr(app, 'job_runner'):
+            app.job_runner.resume()
+        app.openapi_asset()
     except Exception as e:
-        return jsonify({
-            "status": "error",
-            "message": str(e)
-        }), 500
+        state['error'] = str(e)
+        print(f"❌ Warmup failed: {e}")
+        return False
+    finally:
+        state['running'] = False
+
+    state.update(ready=True, error=None, seconds=round(time.perf_counter() - started, 3))
+    print(f"✅ Warmed up in {state['seconds']}s")
+    return True
+
+
+_warmup_lock = threading.Lock()
+
+
+def start_warmup(app):
+    """Runs `warmup` on a background thread unless one is already running."""
+    state = app.extensions['warmup']
+    with _warmup_lock:
+        if state['ready'] or state['running']:
+            return
+        state['running'] = True
+    threading.Thread(target=warmup, args=(app,), name='warmup', daemon=True).start()
 
-# --- Register Blueprints ---
-app.register_blueprint(auth_bp, url_prefix='/')
-app.register_blueprint(product_bp, url_prefix='/products')
 
 # --- Run App ---
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=8080)
+    create_app().run(debug=True, host='0.0.0.0', port=8080)
 
 
 
@@ -0,0 +1,140 @@
+import atexit
+import threading
+from collections import deque
+from datetime import datetime, timezone
+
+from flask import current_app, has_request_context, request
+
+
+class AuditLog:
+    """
+    Batched, asynchronous audit trail in front of an audit store.
+
+    `record` only appends the event to a bounded in-memory queue, so request
+    latency does not include the write. A background thread writes the queue
+    with one `append` (one `insert_many` on Mongo) every `flush_interval`
+    seconds, or as soon as `batch_size` events are waiting. When the queue
+    holds `max_queue` events, `record` waits up to `block_timeout` seconds
+    for the writer to make room (back-pressure) and then drops the event;
+    both are counted in `stats`. Queued events are written on shutdown.
+    """
+
+    def __init__(self, store, flush_interval=1.0, batch_size=200, max_queue=10000, block_timeout=0.005):
+        self.store = store
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_queue = max_queue
+        self.block_timeout = block_timeout
+
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._room = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._closed = False
+        self._indexed = False
+
+        # overflows: records that found the queue full; dropped: events lost
+        # (queue still full after waiting, or a failed write with no room to retry).
+        self.stats = {'recorded': 0, 'written': 0, 'flushes': 0, 'overflows': 0, 'dropped': 0, 'errors': 0}
+
+    def ensure_indexes(self):
+        if not self._indexed:
+            self._indexed = self.store.ensure_indexes()
+
+    # --- Writes ---
+    def record(self, action, user=None, target=None, ip=None, **details):
+        """Queues an event. Returns False if it had to be dropped."""
+        event = {
+            'action': action,
+            'user': user,
+            'target': target,
+            'ip': ip,
+            'details': details,
+            'at': datetime.now(timezone.utc),
+        }
+        self._ensure_worker()
+        with self._room:
+            if len(self._queue) >= self.max_queue and not self._closed:
+                self.stats['overflows'] += 1
+                self._wake.set()
+                self._room.wait_for(lambda: len(self._queue) < self.max_queue or self._closed, self.block_timeout)
+            if self._closed or len(self._queue) >= self.max_queue:
+                self.stats['dropped'] += 1
+                return False
+            self._queue.append(event)
+            self.stats['recorded'] += 1
+            size = len(self._queue)
+
+        if size >= self.batch_size:
+            self._wake.set()
+        return True
+
+    def flush(self):
+        """Writes every queued event, `batch_size` at a time. Returns the number written."""
+        written = 0
+        with self._flush_lock:
+            while True:
+                with self._room:
+                    batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+                    self._room.notify_all()
+                if not batch:
+                    return written
+                try:
+                    self.ensure_indexes()
+                    self.store.append(batch)
+                except Exception:
+                    with self._room:
+                        # Put the batch back in front for the next flush, as far as there is room.
+                        room = max(self.max_queue - len(self._queue), 0)
+                        self._queue.extendleft(reversed(batch[:room]))
+                        self.stats['dropped'] += len(batch) - min(room, len(batch))
+                        self.stats['errors'] += 1
+                    raise
+                written += len(batch)
+                with self._room:
+                    self.stats['flushes'] += 1
+                    self.stats['written'] += len(batch)
+
+    # --- Lifecycle ---
+    def _ensure_worker(self):
+        # Started lazily so that each gunicorn worker gets its own thread.
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._closed or (self._thread is not None and self._thread.is_alive()):
+                return
+            self._thread = threading.Thread(target=self._run, name='audit-log', daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"❌ Audit log flush failed: {e}")
+
+    def close(self):
+        """Stops the background thread and writes anything still queued."""
+        with self._room:
+            if self._closed:
+                return
+            self._closed = True
+            self._room.notify_all()
+        self._wake.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+
+
+def audit(action, user=None, target=None, **details):
+    """Records an audit event for the current request, if the audit trail is enabled."""
+    log = getattr(current_app, 'audit_log', None)
+    if log is None:
+        return
+    ip = request.remote_addr if has_request_context() else None
+    log.record(action, user=user, target=target, ip=ip, **details)
@@ -3,11 +3,18 @@ from werkzeug.security import generate_password_hash, check_password_hash
 import jwt
 import datetime
 from bson import ObjectId
-from flasgger import swag_from
+from audit import audit
+from openapi import swag_from
+from ratelimit import rate_limit
+from utils import with_deadline
+from validation import validate
+from storage import DuplicateError, get_user_store
 from datetime import timezone, datetime, timedelta
 auth_bp = Blueprint('auth', __name__)
 
 @auth_bp.route('/register', methods=['POST'])
+@rate_limit('auth')
+@with_deadline
 @swag_from({
     'tags': ['Authentication'],
     'summary': 'Register a new user',
@@ -39,28 +46,34 @@ auth_bp = Blueprint('auth', __name__)
     }
 })
 def register_user():
-    db = current_app.db
-    users_collection = db.users
+    users = get_user_store()
     data = request.get_json()
 
-    if not data or not data.get('username') or not data.get('password'):
+    if validate('UserRegistration', data) or not data['username'] or not data['password']:
         return make_response('Could not verify', 400, {'WWW-Authenticate': 'Basic realm="Username and password required!"'})
 
-    if users_collection.find_one({'username': data['username']}):
+    if users.get_by_username(data['username']):
         return jsonify({'message': 'User already exists!'}), 409
 
     hashed_password = generate_password_hash(data['password'], method='pbkdf2:sha256')
     
-    users_collection.insert_one({
-        'public_id': str(ObjectId()),
-        'username': data['username'],
-        'password': hashed_password
-    })
+    public_id = str(ObjectId())
+    try:
+        users.insert({
+            'public_id': public_id,
+            'username': data['username'],
+            'password': hashed_password
+        })
+    except DuplicateError:
+        return jsonify({'message': 'User already exists!'}), 409
 
+    audit('auth.register', user=public_id, target=data['username'])
     return jsonify({'message': 'New user created!'}), 201
 
 
 @auth_bp.route('/login', methods=['POST'])
+@rate_limit('auth')
+@with_deadline
 @swag_from({
     'tags': ['Authentication'],
     'summary': 'Log in a user',
@@ -98,15 +111,15 @@ def register_user():
     }
 })
 def login():
-    db = current_app.db
-    users_collection = db.users
+    users = get_user_store()
     auth = request.get_json()
 
-    if not auth or not auth.get('username') or not auth.get('password'):
+    if validate('UserLogin', auth) or not auth['username'] or not auth['password']:
         return make_response('Could not verify', 401, {'WWW-Authenticate': 'Basic realm="Login required!"'})
 
-    user = users_collection.find_one({'username': auth['username']})
+    user = users.get_by_username(auth['username'])
     if not user:
+        audit('auth.login_failed', target=auth['username'], reason='unknown user')
         return make_response('Could not verify', 401, {'WWW-Authenticate': 'Basic realm="User does not exist!"'})
 
     if check_password_hash(user['password'], auth['password']):
@@ -115,6 +128,8 @@ def login():
             'exp': datetime.now(timezone.utc) + timedelta(minutes=60)
         }, current_app.config['SECRET_KEY'], algorithm="HS256")
 
+        audit('auth.login', user=user['public_id'], target=auth['username'])
         return jsonify({'access_token': token})
 
+    audit('auth.login_failed', user=user['public_id'], target=auth['username'], reason='wrong password')
     return make_response('Could not verify', 401, {'WWW-Authenticate': 'Basic realm="Wrong password!"'})
@@ -0,0 +1,492 @@
+"""
+Load and benchmark suite for the Inventory Management API.
+
+Runs scenarios either in-process through Flask's test client (against the
+memory store or a local MongoDB) or over HTTP against a running server, and
+reports throughput and p50/p95/p99 latency per scenario.
+
+    python benchmark.py                                   # every scenario, in-process, memory store
+    python benchmark.py --scenarios login_storm --concurrency 16 --requests 200
+    python benchmark.py --backend mongo --mongo-uri mongodb://localhost:27017
+    python benchmark.py --target http://localhost:8080    # server started with RATE_LIMIT_ENABLED=false
+    python benchmark.py --save run.json --compare baseline.json
+    python benchmark.py --startup 10                      # import-to-first-request time, fresh interpreters
+    python benchmark.py --validation 100000               # compiled request validation, rows per second
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from uuid import uuid4
+
+from app import create_app
+
+PASSWORD = 'benchmark-password'
+IMPORT_JOB_ROWS = 100
+
+
+# --- Clients ---
+class InProcessClient:
+    """Drives the app through Flask's test client, one client per thread."""
+
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def request(self, method, path, json=None, headers=None):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        res = client.open(path, method=method, json=json, headers=headers)
+        return res.status_code, res.get_json(silent=True)
+
+
+class HttpClient:
+    """Drives a running server over HTTP, one keep-alive session per thread."""
+
+    def __init__(self, base_url):
+        import requests
+        self._requests = requests
+        self.base_url = base_url.rstrip('/')
+        self._local = threading.local()
+
+    def request(self, method, path, json=None, headers=None):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = self._requests.Session()
+        res = session.request(method, f'{self.base_url}{path}', json=json, headers=headers)
+        try:
+            body = res.json()
+        except ValueError:
+            body = None
+        return res.status_code, body
+
+
+def build_app(backend, mongo_uri=None):
+    """Builds the API app on the given storage backend, warmed up and without rate limits."""
+    db = None
+    if backend == 'mongo':
+        from pymongo import MongoClient
+        db = MongoClient(mongo_uri).inventory_bench
+        db.products.drop()
+        db.users.drop()
+        db.jobs.drop()
+    return create_app({
+        'SECRET_KEY': os.getenv('SECRET_KEY', 'benchmark-secret-key-of-32-bytes!!'),
+        'STORAGE_BACKEND': backend,
+        'SQLITE_PATH': 'benchmark.db',
+        'RATE_LIMIT_ENABLED': False,
+        'SWAGGER_UI': False,
+        'WARMUP': 'sync',
+    }, db=db)
+
+
+# --- Scenario helpers ---
+def _product(sku, quantity=10):
+    return {'name': f'Bench {sku}', 'type': 'Benchmark', 'sku': sku, 'quantity': quantity, 'price': 9.99}
+
+
+def _parallel(ctx, count, op):
+    """Runs op(i) `count` times on `ctx.concurrency` threads and returns the raw samples."""
+    samples = []
+    lock = threading.Lock()
+
+    def timed(i):
+        start = time.perf_counter()
+        status = op(i)
+        elapsed = time.perf_counter() - start
+        with lock:
+            samples.append((elapsed, status))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=ctx.concurrency) as pool:
+        list(pool.map(timed, range(count)))
+    return samples, time.perf_counter() - started
+
+
+def _seed(ctx, count):
+    """Creates `count` products and returns the ids of those that were added."""
+    prefix = f'SEED-{uuid4().hex[:8]}'
+    ids = [None] * count
+
+    def add(i):
+        status, body = ctx.client.request('POST', '/products', json=_product(f'{prefix}-{i}'), headers=ctx.headers)
+        if status == 201:
+            ids[i] = body['product_id']
+        return status
+
+    _parallel(ctx, count, add)
+    return [i for i in ids if i]
+
+
+def _run_job(ctx, body):
+    """
+    Submits a job with POST /jobs and polls it until it finishes. Returns 200
+    if it succeeded, else the HTTP status of the submit or the job's status.
+    """
+    status, job = ctx.client.request('POST', '/jobs', json=body, headers=ctx.headers)
+    while status == 503:   # the job queue is full: retry as Retry-After asks, just sooner
+        time.sleep(0.05)
+        status, job = ctx.client.request('POST', '/jobs', json=body, headers=ctx.headers)
+    if status != 202:
+        return status
+    while job['status'] in ('queued', 'running'):
+        time.sleep(0.01)
+        status, job = ctx.client.request('GET', f"/jobs/{job['id']}", headers=ctx.headers)
+        if status != 200:
+            return status
+    if job['status'] != 'succeeded':
+        return job['status']
+    if job['kind'] == 'export':
+        return ctx.client.request('GET', f"/jobs/{job['id']}/download", headers=ctx.headers)[0]
+    return 200
+
+
+# --- Scenarios ---
+def scenario_login_storm(ctx):
+    """Concurrent logins; dominated by pbkdf2 password checks."""
+    def op(i):
+        return ctx.client.request('POST', '/login', json={'username': ctx.username, 'password': PASSWORD})[0]
+    return _parallel(ctx, ctx.requests, op)
+
+
+def scenario_deep_pagination(ctx):
+    """Pages from deep in the catalog, where skip/offset cost dominates."""
+    last_page = max(1, ctx.seeded // 10)
+
+    def op(i):
+        page = last_page - (i % max(1, last_page // 2))
+        return ctx.client.request('GET', f'/products?page={page}&per_page=10', headers=ctx.headers)[0]
+    return _parallel(ctx, ctx.requests, op)
+
+
+def scenario_batch_lookup(ctx):
+    """Batch lookups of 50 ids with a field projection (GET /products?ids=...&fields=...)."""
+    ids = ctx.product_ids
+
+    def op(i):
+        chunk = [ids[(i * 50 + k) % len(ids)] for k in range(50)]
+        return ctx.client.request('GET', f"/products?ids={','.join(chunk)}&fields=name,quantity", headers=ctx.headers)[0]
+    return _parallel(ctx, ctx.requests, op)
+
+
+def scenario_quantity_updates(ctx):
+    """Concurrent absolute quantity writes concentrated on a few hot products."""
+    hot = ctx.product_ids[:10]
+
+    def op(i):
+        path = f'/products/{hot[i % len(hot)]}/quantity'
+        return ctx.client.request('PUT', path, json={'quantity': i}, headers=ctx.headers)[0]
+    return _parallel(ctx, ctx.requests, op)
+
+
+def scenario_bulk_import(ctx):
+    """Onboarding burst: concurrent import jobs of 100 new SKUs each, from submit until finished."""
+    prefix = f'IMPORT-{uuid4().hex[:8]}'
+
+    def op(i):
+        rows = [_product(f'{prefix}-{i}-{k}') for k in range(IMPORT_JOB_ROWS)]
+        return _run_job(ctx, {'kind': 'import', 'products': rows})
+    return _parallel(ctx, max(1, ctx.requests // 20), op)
+
+
+def scenario_export(ctx):
+    """Full-catalog export jobs, from submit until the file is downloaded."""
+    def op(i):
+        return _run_job(ctx, {'kind': 'export'})
+    return _parallel(ctx, max(1, ctx.requests // 20), op)
+
+
+SCENARIOS = {
+    'login_storm': scenario_login_storm,
+    'deep_pagination': scenario_deep_pagination,
+    'batch_lookup': scenario_batch_lookup,
+    'quantity_updates': scenario_quantity_updates,
+    'bulk_import': scenario_bulk_import,
+    'export': scenario_export,
+}
+
+
+# --- Startup ---
+# Runs in a fresh interpreter so that module imports are measured cold.
+STARTUP_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import app as module
+imported = time.perf_counter()
+application = module.create_app({
+    'SECRET_KEY': 'startup-benchmark-secret-of-32-bytes!', 'STORAGE_BACKEND': sys.argv[1],
+    'MONGO_URI': sys.argv[2], 'SQLITE_PATH': 'benchmark.db', 'WARMUP': sys.argv[3],
+})
+created = time.perf_counter()
+status = application.test_client().get('/health').status_code
+answered = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - started) * 1000, 'create_ms': (created - imported) * 1000,
+    'first_request_ms': (answered - created) * 1000, 'total_ms': (answered - started) * 1000, 'status': status,
+}))
+"""
+
+STARTUP_PHASES = ('import_ms', 'create_ms', 'first_request_ms', 'total_ms', 'process_ms')
+
+
+def measure_startup(runs, backend, mongo_uri=None, warmup='sync'):
+    """
+    Starts the app `runs` times, each in a new interpreter, and reports the
+    p50/p95/max of every phase from `import app` to the first answered request.
+    `process_ms` also includes interpreter start-up.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        out = subprocess.run(
+            [sys.executable, '-c', STARTUP_SCRIPT, backend, mongo_uri or '', warmup],
+            cwd=here, capture_output=True, text=True, check=True,
+        ).stdout
+        sample = json.loads(next(line for line in reversed(out.splitlines()) if line.startswith('{')))
+        sample['process_ms'] = (time.perf_counter() - started) * 1000
+        samples.append(sample)
+
+    result = {'runs': runs, 'errors': sum(1 for s in samples if s['status'] != 200)}
+    for phase in STARTUP_PHASES:
+        values = sorted(s[phase] for s in samples)
+        result[phase] = {
+            'p50': round(percentile(values, 50), 3),
+            'p95': round(percentile(values, 95), 3),
+            'max': round(values[-1], 3) if values else 0.0,
+        }
+    return result
+
+
+# --- Validation ---
+def _validation_rows(rows, invalid_every):
+    data = []
+    for i in range(rows):
+        row = _product(f'VAL-{i}', quantity=i % 500)
+        if invalid_every and i % invalid_every == 0:
+            row['quantity'] = -1 if i % 2 else 'many'
+            row['name'] = ''
+        data.append(row)
+    return data
+
+
+def measure_validation(rows, invalid_every=10):
+    """
+    Validates `rows` product rows against the compiled "Product" schema, as
+    the add-product route and the import job do, with every `invalid_every`-th
+    row invalid. Reports rows per second and microseconds per row.
+    """
+    app = create_app({
+        'SECRET_KEY': 'validation-benchmark-secret-32-bytes',
+        'STORAGE_BACKEND': 'memory',
+        'SWAGGER_UI': False,
+        'WARMUP': 'off',
+    })
+    validate = app.validators['Product']
+    data = _validation_rows(rows, invalid_every)
+
+    started = time.perf_counter()
+    invalid = sum(1 for row in data if validate(row))
+    elapsed = time.perf_counter() - started
+    return {
+        'rows': rows,
+        'invalid': invalid,
+        'seconds': round(elapsed, 4),
+        'rows_per_s': round(rows / elapsed, 1) if elapsed else 0.0,
+        'us_per_row': round(elapsed / rows * 1e6, 3) if rows else 0.0,
+    }
+
+
+# --- Reporting ---
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(samples, wall_time):
+    latencies = sorted(elapsed * 1000 for elapsed, _ in samples)
+    statuses = {}
+    for _, status in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    errors = sum(n for status, n in statuses.items() if not status.startswith('2'))
+    return {
+        'requests': len(samples),
+        'errors': errors,
+        'statuses': statuses,
+        'throughput_rps': round(len(samples) / wall_time, 2) if wall_time else 0.0,
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'max_ms': round(latencies[-1], 3) if latencies else 0.0,
+    }
+
+
+def compare(current, baseline, threshold):
+    """Returns a list of regressions of `current` against `baseline` beyond `threshold` (a fraction)."""
+    regressions = []
+    base_validation = baseline.get('validation')
+    if current.get('validation') and base_validation:
+        before, after = base_validation['rows_per_s'], current['validation']['rows_per_s']
+        if before and after < before * (1 - threshold):
+            regressions.append(f"validation.rows_per_s: {before} -> {after}")
+    base_startup = baseline.get('startup')
+    if current.get('startup') and base_startup:
+        for phase in STARTUP_PHASES:
+            before, after = base_startup[phase]['p50'], current['startup'][phase]['p50']
+            if before and after > before * (1 + threshold):
+                regressions.append(f"startup.{phase}.p50: {before} -> {after}")
+    for name, result in current.get('scenarios', {}).items():
+        base = baseline.get('scenarios', {}).get(name)
+        if not base:
+            continue
+        for metric in ('p50_ms', 'p95_ms', 'p99_ms'):
+            if base[metric] and result[metric] > base[metric] * (1 + threshold):
+                regressions.append(f"{name}.{metric}: {base[metric]} -> {result[metric]}")
+        if base['throughput_rps'] and result['throughput_rps'] < base['throughput_rps'] * (1 - threshold):
+            regressions.append(f"{name}.throughput_rps: {base['throughput_rps']} -> {result['throughput_rps']}")
+        if result['errors'] > base['errors']:
+            regressions.append(f"{name}.errors: {base['errors']} -> {result['errors']}")
+    return regressions
+
+
+class Context:
+    def __init__(self, client, concurrency, requests):
+        self.client = client
+        self.concurrency = concurrency
+        self.requests = requests
+        self.username = f'bench_{uuid4().hex}'
+        self.headers = {}
+        self.product_ids = []
+        self.seeded = 0
+
+    def setup(self, seed):
+        self.client.request('POST', '/register', json={'username': self.username, 'password': PASSWORD})
+        status, body = self.client.request('POST', '/login', json={'username': self.username, 'password': PASSWORD})
+        if status != 200:
+            raise RuntimeError(f'Benchmark login failed with status {status}: {body}')
+        self.headers = {'Authorization': f"Bearer {body['access_token']}"}
+        self.product_ids = _seed(self, seed)
+        self.seeded = len(self.product_ids)
+        if not self.product_ids:
+            raise RuntimeError('Could not seed any products (is the server rate limiting writes?)')
+
+
+def run(client, scenarios, concurrency, requests, seed):
+    ctx = Context(client, concurrency, requests)
+    ctx.setup(seed)
+    results = {}
+    for name in scenarios:
+        samples, wall_time = SCENARIOS[name](ctx)
+        results[name] = summarize(samples, wall_time)
+        r = results[name]
+        print(f"{name:<18} {r['requests']:>6} req  {r['throughput_rps']:>9.1f} req/s  "
+              f"p50 {r['p50_ms']:>8.2f} ms  p95 {r['p95_ms']:>8.2f} ms  p99 {r['p99_ms']:>8.2f} ms  errors {r['errors']}")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the Inventory Management API.')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='Comma-separated scenarios to run.')
+    parser.add_argument('--target', help='Base URL of a running server. Runs in-process when omitted.')
+    parser.add_argument('--backend', default='memory', choices=['memory', 'mongo', 'sqlite'], help='In-process storage backend.')
+    parser.add_argument('--mongo-uri', default=os.getenv('MONGO_URI', 'mongodb://localhost:27017'))
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=200, help='Requests per scenario.')
+    parser.add_argument('--seed', type=int, default=1000, help='Products created before the scenarios run.')
+    parser.add_argument('--save', help='Write results as JSON to this file.')
+    parser.add_argument('--compare', help='Baseline JSON results to compare against.')
+    parser.add_argument('--threshold', type=float, default=0.10, help='Allowed regression as a fraction (0.10 = 10%%).')
+    parser.add_argument('--startup', type=int, metavar='RUNS', help='Measure import-to-first-request time instead of the scenarios.')
+    parser.add_argument('--warmup', default='sync', choices=['sync', 'background', 'off'], help='WARMUP mode used by --startup.')
+    parser.add_argument('--validation', type=int, metavar='ROWS', help='Measure validation of ROWS product rows instead of the scenarios.')
+    args = parser.parse_args(argv)
+
+    scenarios = [s.strip() for s in args.scenarios.split(',') if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    if args.validation:
+        print(f"--- Validation benchmark: {args.validation} rows ---")
+        validation = measure_validation(args.validation)
+        print(f"{validation['rows']} rows ({validation['invalid']} invalid) in {validation['seconds']:.3f}s: "
+              f"{validation['rows_per_s']:.0f} rows/s, {validation['us_per_row']:.2f} us/row")
+        output = {
+            'meta': {
+                'timestamp': datetime.now(timezone.utc).isoformat(),
+                'mode': 'validation',
+                'python': platform.python_version(),
+            },
+            'validation': validation,
+        }
+        return _finish(output, args)
+
+    if args.startup:
+        print(f"--- Startup benchmark: {args.backend}, warmup {args.warmup}, {args.startup} runs ---")
+        startup = measure_startup(args.startup, args.backend, args.mongo_uri, args.warmup)
+        for phase in STARTUP_PHASES:
+            r = startup[phase]
+            print(f"{phase:<18} p50 {r['p50']:>9.2f} ms  p95 {r['p95']:>9.2f} ms  max {r['max']:>9.2f} ms")
+        output = {
+            'meta': {
+                'timestamp': datetime.now(timezone.utc).isoformat(),
+                'mode': f'startup {args.backend}',
+                'warmup': args.warmup,
+                'python': platform.python_version(),
+            },
+            'startup': startup,
+        }
+        return _finish(output, args)
+
+    if args.target:
+        client, mode = HttpClient(args.target), f'http {args.target}'
+    else:
+        client, mode = InProcessClient(build_app(args.backend, args.mongo_uri)), f'in-process {args.backend}'
+    print(f"--- Benchmark: {mode}, concurrency {args.concurrency}, {args.requests} requests/scenario ---")
+
+    output = {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'mode': mode,
+            'concurrency': args.concurrency,
+            'requests': args.requests,
+            'seed': args.seed,
+            'python': platform.python_version(),
+        },
+        'scenarios': run(client, scenarios, args.concurrency, args.requests, args.seed),
+    }
+    return _finish(output, args)
+
+
+def _finish(output, args):
+    """Saves `output` and compares it against the baseline, as requested on the command line."""
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(output, f, indent=2)
+        print(f"✅ Results saved to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(output, json.load(f), args.threshold)
+        if regressions:
+            print("❌ Regressions:")
+            for line in regressions:
+                print(f"   {line}")
+            return 1
+        print("✅ No regressions against baseline.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,87 @@
+import os
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+import jwt
+import mongomock
+import pytest
+from werkzeug.security import generate_password_hash
+
+from app import create_app
+
+# test_api.py is a smoke script for a live server: run it with `python test_api.py`.
+collect_ignore = ['test_api.py']
+
+# Point at a local mongod to run the suites against real MongoDB instead of
+# mongomock. Every test still gets its own throwaway database.
+TEST_MONGO_URI = os.getenv('TEST_MONGO_URI')
+
+SECRET_KEY = 'test-secret-key-for-jwt-of-32-bytes!'
+PASSWORD = 'password123'
+
+
+@pytest.fixture(scope='session')
+def password_hash():
+    """Hashed once per worker; pbkdf2 is far too slow to pay in every test."""
+    return generate_password_hash(PASSWORD, method='pbkdf2:sha256')
+
+
+@pytest.fixture
+def db():
+    """An isolated database per test, so tests can run in parallel with pytest-xdist."""
+    name = f'test_{uuid4().hex}'
+    if TEST_MONGO_URI:
+        from pymongo import MongoClient
+        client = MongoClient(TEST_MONGO_URI)
+        yield client[name]
+        client.drop_database(name)
+        client.close()
+    else:
+        yield mongomock.MongoClient()[name]
+
+
+@pytest.fixture
+def app_config():
+    """Config passed to `create_app`; override it in a test module to switch features on."""
+    return {
+        'TESTING': True,
+        'SECRET_KEY': SECRET_KEY,
+        'STORAGE_BACKEND': 'mongo',
+        'RATE_LIMIT_ENABLED': False,
+        'QUANTITY_WRITE_BEHIND': False,
+        'SWAGGER_UI': False,
+        'WARMUP': 'off',
+    }
+
+
+@pytest.fixture
+def app(db, app_config):
+    """The API app on top of the isolated test database."""
+    return create_app(app_config, db=db)
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def user(app, password_hash):
+    """A registered user, created directly in the store."""
+    user = {'public_id': uuid4().hex, 'username': f'testuser_{uuid4().hex}', 'password': password_hash}
+    app.user_store.insert(user)
+    return user
+
+
+@pytest.fixture
+def token(app, user):
+    """An access token for `user`, as /login would issue it."""
+    return jwt.encode({
+        'public_id': user['public_id'],
+        'exp': datetime.now(timezone.utc) + timedelta(minutes=60)
+    }, app.config['SECRET_KEY'], algorithm="HS256")
+
+
+@pytest.fixture
+def headers(token):
+    return {'Authorization': f'Bearer {token}'}
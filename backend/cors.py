@@ -0,0 +1,50 @@
+from flask import Response, request
+
+ALLOWED_METHODS = ['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS']
+ALLOWED_HEADERS = ['Content-Type', 'Authorization']
+
+
+def parse_origins(value):
+    """"https://a.example, http://localhost:3000" -> ['https://a.example', 'http://localhost:3000']"""
+    return [origin.strip().rstrip('/') for origin in value.split(',') if origin.strip()]
+
+
+def init_cors(app):
+    """
+    Lets the configured frontends (CORS_ORIGINS) call the API with
+    credentials. Preflight requests are answered by the first
+    `before_request` hook, before routing errors, rate limiting, auth or
+    any database work run, and carry `Access-Control-Max-Age` so browsers
+    reuse them for CORS_MAX_AGE seconds instead of repeating the preflight
+    before every authorized call. `flask_cors` adds the headers to all
+    other responses.
+    """
+    origins = frozenset(app.config['CORS_ORIGINS'])
+    max_age = str(app.config['CORS_MAX_AGE'])
+    methods = ', '.join(ALLOWED_METHODS)
+    headers = ', '.join(ALLOWED_HEADERS)
+
+    @app.before_request
+    def answer_preflight():
+        if request.method != 'OPTIONS' or 'Access-Control-Request-Method' not in request.headers:
+            return None
+        res = Response(status=204)
+        res.headers['Vary'] = 'Origin'
+        origin = request.headers.get('Origin')
+        if origin in origins:
+            res.headers['Access-Control-Allow-Origin'] = origin
+            res.headers['Access-Control-Allow-Credentials'] = 'true'
+            res.headers['Access-Control-Allow-Methods'] = methods
+            res.headers['Access-Control-Allow-Headers'] = headers
+            res.headers['Access-Control-Max-Age'] = max_age
+        return res
+
+    from flask_cors import CORS
+    CORS(app, resources={
+        r"/*": {
+            "origins": sorted(origins),
+            "methods": ALLOWED_METHODS,
+            "allow_headers": ALLOWED_HEADERS,
+            "max_age": app.config['CORS_MAX_AGE'],
+        }
+    }, supports_credentials=True)
@@ -0,0 +1,283 @@
+import hashlib
+import io
+import os
+import re
+import tempfile
+import threading
+from contextlib import contextmanager
+
+from flask import Blueprint, current_app, jsonify, request, send_file
+from werkzeug.exceptions import RequestEntityTooLarge
+from audit import audit
+from openapi import swag_from
+from ratelimit import rate_limit
+from utils import token_required, with_deadline
+
+images_bp = Blueprint('images', __name__)
+
+HASH_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+# Leading bytes of the accepted image formats.
+SIGNATURES = (
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+)
+THUMBNAIL_TYPE = 'image/webp'
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+def sniff(head):
+    """Returns the content type of an image from its first bytes, or None if it is not an accepted format."""
+    for signature, content_type in SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    return None
+
+
+class InvalidImage(Exception):
+    pass
+
+
+class ImageStore:
+    """
+    Content-addressed image blobs on local disk. An image is stored once
+    under the SHA-256 of its bytes, so uploading the same file again only
+    returns the existing hash. Thumbnails are WebP files made once per
+    configured size and kept next to the originals:
+
+        <root>/originals/ab/<hash>
+        <root>/thumbs/<size>/ab/<hash>.webp
+
+    Files are written to a temporary name and renamed into place, so a
+    reader never sees a partial file. An image of more than `max_pixels`
+    pixels is refused from its header, before anything is decoded.
+    """
+
+    def __init__(self, root, thumbnail_sizes=(128, 512), max_pixels=40_000_000):
+        self.root = root
+        self.thumbnail_sizes = tuple(sorted(thumbnail_sizes))
+        self.max_pixels = max_pixels
+        self._lock = threading.Lock()
+        self._resizing = {}   # (digest, size) -> [lock, number of threads using it]
+
+    def _original_path(self, digest):
+        return os.path.join(self.root, 'originals', digest[:2], digest)
+
+    def _thumbnail_path(self, digest, size):
+        return os.path.join(self.root, 'thumbs', str(size), digest[:2], f'{digest}.webp')
+
+    def _write(self, path, write):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), delete=False) as f:
+            try:
+                write(f)
+            except BaseException:
+                f.close()
+                os.unlink(f.name)
+                raise
+        os.replace(f.name, path)
+
+    def exists(self, digest):
+        return bool(HASH_PATTERN.match(digest or '')) and os.path.exists(self._original_path(digest))
+
+    def put(self, data):
+        """
+        Stores an image and makes its thumbnails. Returns (hash, content_type,
+        created). Raises InvalidImage if `data` is not an image that can be decoded.
+        """
+        content_type = sniff(data[:16])
+        if content_type is None:
+            raise InvalidImage('Only JPEG, PNG, GIF and WebP images are accepted.')
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._original_path(digest)
+        if os.path.exists(path):
+            return digest, content_type, False
+
+        self._check_pixels(io.BytesIO(data))
+        self._write(path, lambda f: f.write(data))
+        try:
+            for size in self.thumbnail_sizes:
+                self.thumbnail(digest, size)
+        except InvalidImage:
+            os.unlink(path)
+            raise
+        return digest, content_type, True
+
+    def original(self, digest):
+        """Returns (path, content_type) of a stored image, or None."""
+        if not self.exists(digest):
+            return None
+        path = self._original_path(digest)
+        with open(path, 'rb') as f:
+            return path, sniff(f.read(16))
+
+    def thumbnail(self, digest, size):
+        """Returns (path, content_type) of a thumbnail, making it on first use, or None."""
+        if size not in self.thumbnail_sizes or not self.exists(digest):
+            return None
+        path = self._thumbnail_path(digest, size)
+        if not os.path.exists(path):
+            # Resize each image once, even when requested concurrently; other thumbnails are made meanwhile.
+            with self._resize_lock((digest, size)):
+                if not os.path.exists(path):
+                    self._write(path, lambda f: self._resize(self._original_path(digest), size, f))
+        return path, THUMBNAIL_TYPE
+
+    @contextmanager
+    def _resize_lock(self, key):
+        with self._lock:
+            entry = self._resizing.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._resizing[key]
+
+    def _check_pixels(self, source):
+        """Raises InvalidImage if the image header declares more than `max_pixels` pixels."""
+        from PIL import Image
+
+        try:
+            with Image.open(source) as image:   # reads the header only
+                width, height = image.size
+        except (OSError, SyntaxError, ValueError, Image.DecompressionBombError) as e:
+            raise InvalidImage(f'The image could not be decoded: {e}')
+        if width * height > self.max_pixels:
+            raise InvalidImage(f'Images may be at most {self.max_pixels} pixels; this one has {width}x{height}.')
+
+    def _resize(self, source, size, output):
+        from PIL import Image, ImageOps
+
+        try:
+            with Image.open(source) as image:
+                if image.size[0] * image.size[1] > self.max_pixels:
+                    raise InvalidImage(f'Images may be at most {self.max_pixels} pixels.')
+                image.draft('RGB', (size, size))   # lets the JPEG decoder downscale while decoding
+                image = ImageOps.exif_transpose(image)
+                image.thumbnail((size, size))
+                if image.mode not in ('RGB', 'RGBA'):
+                    image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+                image.save(output, 'WEBP', quality=80, method=4)
+        except (OSError, SyntaxError, ValueError, Image.DecompressionBombError) as e:
+            raise InvalidImage(f'The image could not be decoded: {e}')
+
+
+def image_urls(digest):
+    """The URLs a product with an uploaded image is served with: the original and the smallest thumbnail."""
+    base = current_app.config.get('IMAGE_BASE_URL', '')
+    sizes = current_app.config.get('IMAGE_THUMBNAIL_SIZES') or (128,)
+    return {
+        'image_url': f'{base}/images/{digest}',
+        'thumbnail_url': f'{base}/images/{digest}/thumb/{min(sizes)}',
+    }
+
+
+def _serve(found, etag):
+    if found is None:
+        return jsonify({'message': 'Image not found!'}), 404
+    path, content_type = found
+    # conditional=True answers If-None-Match with 304 and Range with 206.
+    res = send_file(path, mimetype=content_type, conditional=True, etag=etag, max_age=31536000)
+    res.headers['Cache-Control'] = IMMUTABLE
+    return res
+
+
+@images_bp.route('', methods=['POST'])
+@rate_limit('write')
+@with_deadline
+@token_required
+@swag_from({
+    'tags': ['Images'],
+    'summary': 'Upload a product image',
+    'description': 'Send the image as the `file` field of a multipart form, or as the raw request body. '
+                   'Use the returned hash as `image_hash` of a product.',
+    'consumes': ['multipart/form-data', 'image/jpeg', 'image/png', 'image/gif', 'image/webp'],
+    'security': [{'bearerAuth': []}],
+    'parameters': [
+        {'name': 'file', 'in': 'formData', 'type': 'file', 'required': False, 'description': 'JPEG, PNG, GIF or WebP image.'}
+    ],
+    'responses': {
+        '200': {'description': 'The same image was already stored; its hash and URLs are returned.'},
+        '201': {'description': 'Image stored and thumbnails made.'},
+        '400': {'description': 'No image, the image could not be decoded, or it has more pixels than IMAGE_MAX_PIXELS.'},
+        '401': {'description': 'Authorization token is missing or invalid.'},
+        '413': {'description': 'The image is too large.'},
+        '415': {'description': 'Not a JPEG, PNG, GIF or WebP image.'}
+    }
+})
+def upload_image(current_user):
+    max_bytes = current_app.config['IMAGE_MAX_BYTES']
+    too_large = jsonify({'message': f'Images may be at most {max_bytes} bytes.'}), 413
+
+    # Werkzeug stops reading the body past this limit, with or without a
+    # Content-Length and while parsing a multipart form; the headroom is for
+    # the multipart envelope around the file.
+    request.max_content_length = max_bytes + 16 * 1024
+    try:
+        upload = request.files.get('file')
+        data = upload.read(max_bytes + 1) if upload is not None else request.get_data()
+    except RequestEntityTooLarge:
+        return too_large
+    if not data:
+        return jsonify({'message': 'No image uploaded!'}), 400
+    if len(data) > max_bytes:
+        return too_large
+    if sniff(data[:16]) is None:
+        return jsonify({'message': 'Only JPEG, PNG, GIF and WebP images are accepted.'}), 415
+
+    try:
+        digest, content_type, created = current_app.image_store.put(data)
+    except InvalidImage as e:
+        return jsonify({'message': str(e)}), 400
+
+    if created:
+        audit('image.upload', user=current_user['public_id'], target=digest, size=len(data))
+    return jsonify(dict(
+        image_urls(digest), image_hash=digest, content_type=content_type, size=len(data)
+    )), 201 if created else 200
+
+
+@images_bp.route('/<digest>', methods=['GET'])
+@swag_from({
+    'tags': ['Images'],
+    'summary': 'Get an uploaded image',
+    'description': 'Served with an immutable Cache-Control header; supports Range and If-None-Match.',
+    'parameters': [
+        {'name': 'digest', 'in': 'path', 'type': 'string', 'required': True, 'description': 'The image hash.'}
+    ],
+    'responses': {
+        '200': {'description': 'The image.'},
+        '206': {'description': 'The requested byte range of the image.'},
+        '304': {'description': 'Not modified.'},
+        '404': {'description': 'Image not found.'}
+    }
+})
+def get_image(digest):
+    return _serve(current_app.image_store.original(digest), digest)
+
+
+@images_bp.route('/<digest>/thumb/<int:size>', methods=['GET'])
+@swag_from({
+    'tags': ['Images'],
+    'summary': 'Get a thumbnail of an uploaded image',
+    'description': 'A WebP image at most `size` pixels wide and high. Only the configured sizes are available.',
+    'parameters': [
+        {'name': 'digest', 'in': 'path', 'type': 'string', 'required': True, 'description': 'The image hash.'},
+        {'name': 'size', 'in': 'path', 'type': 'integer', 'required': True, 'description': 'Thumbnail size in pixels.'}
+    ],
+    'responses': {
+        '200': {'description': 'The thumbnail.'},
+        '304': {'description': 'Not modified.'},
+        '404': {'description': 'Image not found, or not a thumbnail size.'}
+    }
+})
+def get_thumbnail(digest, size):
+    return _serve(current_app.image_store.thumbnail(digest, size), f'{digest}-{size}')
@@ -0,0 +1,245 @@
+import atexit
+import os
+import queue
+import socket
+import threading
+import time
+from uuid import uuid4
+
+# kind -> handler(ctx, params). Filled in by @job_handler.
+JOB_HANDLERS = {}
+
+
+def job_handler(kind):
+    """Registers a function as the handler of a job kind."""
+    def decorator(function):
+        JOB_HANDLERS[kind] = function
+        return function
+    return decorator
+
+
+class QueueFull(Exception):
+    """Raised by `submit` when the runner already holds its maximum of queued jobs."""
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobLost(Exception):
+    """The job's lease was taken over by another runner."""
+
+
+class JobContext:
+    """
+    Handed to a job handler. `offset` is where a resumed job left off; the
+    handler calls `checkpoint` after every chunk, which persists progress,
+    renews the lease and raises JobCancelled once a cancel was requested.
+    """
+
+    def __init__(self, runner, job):
+        self.runner = runner
+        self.app = runner.app
+        self.job_id = job['_id']
+        self.offset = job.get('offset') or 0
+        self.state = dict(job.get('state') or {})
+
+    def checkpoint(self, offset, done=None, total=None):
+        self.offset = offset
+        now = time.time()
+        fields = {'offset': offset, 'state': self.state, 'lease_until': now + self.runner.lease, 'updated_at': now}
+        if done is not None:
+            fields['progress'] = {'done': done, 'total': total}
+        job = self.runner.store.update(self.job_id, fields, owner=self.runner.owner)
+        if job is None:
+            raise JobLost(self.job_id)
+        if job.get('cancel_requested'):
+            raise JobCancelled(self.job_id)
+        # Give request threads a turn between chunks.
+        time.sleep(self.runner.pause)
+
+
+class JobRunner:
+    """
+    Runs background jobs on a small pool of daemon threads inside the web
+    process.
+
+    At most `max_workers` jobs run at once and at most `max_queued` wait, so
+    background work stays a bounded share of the process. Each job is leased
+    to one runner; the lease is renewed at every checkpoint. A job whose
+    runner died (its lease ran out) is claimed by any other runner and
+    resumed from its last checkpointed offset. Handlers must therefore be
+    safe to repeat from the last checkpoint.
+    """
+
+    def __init__(self, store, app, max_workers=2, max_queued=100, lease=30.0, pause=0.01):
+        self.store = store
+        self.app = app
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.lease = lease
+        self.pause = pause
+        self.owner = f'{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}'
+
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._threads = []
+        self._queued = set()     # ids waiting in _queue; a job is never queued twice
+        self._running = set()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._indexed = False
+
+        self.stats = {'submitted': 0, 'resumed': 0, 'succeeded': 0, 'failed': 0, 'cancelled': 0, 'rejected': 0}
+
+    # --- API ---
+    def submit(self, kind, params, user=None):
+        """Persists a new job and queues it. Raises QueueFull when the runner is saturated."""
+        if kind not in JOB_HANDLERS:
+            raise ValueError(f"Unknown job kind '{kind}'")
+        if self._queue.full():
+            with self._lock:
+                self.stats['rejected'] += 1
+            raise QueueFull()
+
+        self._ensure_started()
+        now = time.time()
+        job = {
+            'kind': kind, 'params': params, 'status': 'queued', 'progress': {'done': 0, 'total': None},
+            'offset': 0, 'state': {}, 'result': None, 'error': None, 'cancel_requested': False,
+            'owner': self.owner, 'lease_until': now + self.lease, 'created_by': user,
+            'created_at': now, 'updated_at': now, 'finished_at': None,
+        }
+        job['_id'] = self.store.insert(job)
+        with self._lock:
+            self.stats['submitted'] += 1
+        # On a race to a full queue the job stays persisted and is resumed once its lease runs out.
+        self._enqueue(job['_id'])
+        return job
+
+    def cancel(self, job_id):
+        """Requests cancellation. Returns the job, or None if it does not exist."""
+        return self.store.update(job_id, {'cancel_requested': True, 'updated_at': time.time()})
+
+    def resume(self):
+        """Queues jobs whose runner died. Returns the number picked up."""
+        self._ensure_started()
+        with self._lock:
+            # Jobs of this runner that are still waiting or running may have an
+            # expired lease too; look past them.
+            limit = self.max_workers + len(self._queued) + len(self._running)
+        resumed = 0
+        for job_id in self.store.find_resumable(time.time(), limit=limit):
+            if self._queue.full():
+                break
+            if self._enqueue(job_id):
+                resumed += 1
+        with self._lock:
+            self.stats['resumed'] += resumed
+        return resumed
+
+    def _enqueue(self, job_id):
+        """Queues a job unless this runner already has it queued or running. Returns True if queued."""
+        with self._lock:
+            if job_id in self._queued or job_id in self._running:
+                return False
+            try:
+                self._queue.put_nowait(job_id)
+            except queue.Full:
+                return False
+            self._queued.add(job_id)
+        return True
+
+    # --- Execution ---
+    def _work(self):
+        while not self._closed:
+            job_id = self._queue.get()
+            if job_id is None:
+                break
+            with self._lock:
+                self._queued.discard(job_id)
+                if job_id in self._running:
+                    continue   # The store would accept our own claim again; never run a job twice.
+                self._running.add(job_id)
+            try:
+                now = time.time()
+                job = self.store.claim(job_id, self.owner, now + self.lease, now)
+                if job is not None:   # None: finished, or running under another live runner.
+                    self._execute(job)
+            except Exception as e:
+                print(f"❌ Job {job_id} could not be run: {e}")
+            finally:
+                with self._lock:
+                    self._running.discard(job_id)
+
+    def _execute(self, job):
+        outcome, fields = 'succeeded', {}
+        try:
+            if job.get('cancel_requested'):
+                raise JobCancelled(job['_id'])
+            ctx = JobContext(self, job)
+            with self.app.app_context():
+                result = JOB_HANDLERS[job['kind']](ctx, job['params'])
+            fields = {'status': 'succeeded', 'result': result, 'state': ctx.state}
+        except JobLost:
+            return
+        except JobCancelled:
+            outcome, fields = 'cancelled', {'status': 'cancelled'}
+        except Exception as e:
+            outcome, fields = 'failed', {'status': 'failed', 'error': str(e)}
+
+        now = time.time()
+        fields.update(owner=None, lease_until=None, updated_at=now, finished_at=now)
+        self.store.update(job['_id'], fields, owner=self.owner)
+        with self._lock:
+            self.stats[outcome] += 1
+
+    # --- Lifecycle ---
+    def _ensure_started(self):
+        # Started lazily so that each gunicorn worker gets its own threads after the fork.
+        if self._threads and all(t.is_alive() for t in self._threads):
+            return
+        with self._lock:
+            if self._threads and all(t.is_alive() for t in self._threads):
+                return
+            if not self._indexed:
+                self._indexed = self.store.ensure_indexes()
+            self._threads = [
+                threading.Thread(target=self._work, name=f'job-worker-{i}', daemon=True)
+                for i in range(self.max_workers)
+            ]
+            self._threads.append(threading.Thread(target=self._watch, name='job-watch', daemon=True))
+            for t in self._threads:
+                t.start()
+            atexit.register(self.close)
+
+    def _watch(self):
+        while not self._closed:
+            time.sleep(self.lease / 2)
+            if self._closed:
+                break
+            try:
+                self.resume()
+            except Exception as e:
+                print(f"❌ Could not look for interrupted jobs: {e}")
+
+    def close(self):
+        """
+        Stops taking work and hands the jobs that are still running back, by
+        expiring their leases, so another runner resumes them from their last
+        checkpoint right away instead of after the lease.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            running = list(self._running)
+        for job_id in running:
+            try:
+                self.store.update(job_id, {'owner': None, 'lease_until': 0}, owner=self.owner)
+            except Exception as e:
+                print(f"❌ Could not release job {job_id}: {e}")
+        for _ in range(self.max_workers):
+            try:
+                self._queue.put_nowait(None)
+            except queue.Full:
+                break
@@ -0,0 +1,283 @@
+import json
+import os
+from datetime import datetime, timezone
+from flask import Blueprint, request, jsonify, current_app, send_file
+from audit import audit
+from job_runner import QueueFull, job_handler
+from openapi import swag_from
+from products import _overlay_pending, new_product, serialize_product
+from ratelimit import rate_limit
+from storage import DuplicateError, get_product_store
+from utils import token_required, with_deadline
+from validation import get_validators, invalid, validate
+
+jobs_bp = Blueprint('jobs', __name__)
+
+MAX_REPORTED_ERRORS = 100
+
+
+def _iso(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat() if timestamp else None
+
+
+def serialize_job(job):
+    return {
+        'id': job['_id'],
+        'kind': job['kind'],
+        'status': job['status'],
+        'progress': job.get('progress'),
+        'offset': job.get('offset'),
+        'result': job.get('result'),
+        'error': job.get('error'),
+        'cancel_requested': job.get('cancel_requested', False),
+        'created_at': _iso(job.get('created_at')),
+        'updated_at': _iso(job.get('updated_at')),
+        'finished_at': _iso(job.get('finished_at')),
+    }
+
+
+def export_path(job_id):
+    return os.path.join(current_app.config['JOBS_DIR'], f'{job_id}.jsonl')
+
+# --- Job Handlers ---
+# A handler may be run again from its last checkpoint after a restart, so
+# each chunk is written in a way that is safe to repeat.
+
+def _import_source(job_id, row):
+    return f'{job_id}:{row}'
+
+
+@job_handler('import')
+def import_products(ctx, params):
+    """
+    Inserts `params['products']`. Each product keeps the job and row it came
+    from, so a row that is run again after a resume and finds its own
+    product still counts as imported; other duplicates are skipped.
+    """
+    store = get_product_store()
+    sku_index = getattr(current_app, 'sku_index', None)
+    validate_product = get_validators()['Product']
+    rows = params['products']
+    chunk = current_app.config['JOB_CHUNK_SIZE']
+    state = ctx.state
+    state.setdefault('imported', 0)
+    state.setdefault('skipped', 0)
+    state.setdefault('errors', [])
+    state.setdefault('failed', 0)
+
+    for start in range(ctx.offset, len(rows), chunk):
+        for i, row in enumerate(rows[start:start + chunk], start):
+            errors = validate_product(row)
+            if errors:
+                state['failed'] += 1
+                if len(state['errors']) < MAX_REPORTED_ERRORS:
+                    state['errors'].append({'row': i, 'errors': errors})
+                continue
+            source = _import_source(ctx.job_id, i)
+            try:
+                store.insert(dict(new_product(row, params.get('added_by')), import_source=source))
+                state['imported'] += 1
+            except DuplicateError:
+                existing = store.get_by_sku(row['sku'], ['import_source'])
+                if existing is not None and existing.get('import_source') == source:
+                    state['imported'] += 1
+                else:
+                    state['skipped'] += 1
+            if sku_index is not None:
+                sku_index.add(row['sku'])
+        done = min(start + chunk, len(rows))
+        ctx.checkpoint(done, done, len(rows))
+
+    audit('product.import', user=params.get('added_by'), target=ctx.job_id,
+          imported=state['imported'], skipped=state['skipped'], failed=state['failed'])
+    return {k: state[k] for k in ('imported', 'skipped', 'failed', 'errors')}
+
+
+@job_handler('export')
+def export_products(ctx, params):
+    """
+    Writes every product as one JSON line to the job's export file, in id
+    order. Each page starts after the last id written, which is checkpointed
+    with the file size, so no page costs more than the first and a resumed
+    export neither repeats nor misses a product.
+    """
+    store = get_product_store()
+    chunk = current_app.config['JOB_CHUNK_SIZE']
+    path = export_path(ctx.job_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    # Resume right after the last checkpointed line; without the file, start over.
+    if ctx.offset and ctx.state.get('last_id') and os.path.exists(path):
+        mode = 'r+'
+    else:
+        ctx.offset, ctx.state['bytes'], ctx.state['last_id'] = 0, 0, None
+        mode = 'w'
+
+    offset, last_id = ctx.offset, ctx.state['last_id']
+    with open(path, mode, encoding='utf-8') as f:
+        f.seek(ctx.state.get('bytes', 0))
+        f.truncate()
+        while True:
+            products = list(_overlay_pending(store.list_after(last_id, chunk)))
+            for p in products:
+                f.write(json.dumps(serialize_product(p)) + '\n')
+                last_id = str(p['_id'])
+            f.flush()
+            offset += len(products)
+            ctx.state['bytes'], ctx.state['last_id'] = f.tell(), last_id
+            ctx.checkpoint(offset, offset)
+            if len(products) < chunk:
+                break
+
+    return {'exported': offset, 'bytes': ctx.state['bytes']}
+
+# --- Job Routes ---
+
+def _own_job(job_id, current_user):
+    job = current_app.job_runner.store.get(job_id)
+    if job is None or job.get('created_by') != current_user['public_id']:
+        return None
+    return job
+
+
+@jobs_bp.route('', methods=['POST'])
+@rate_limit('write')
+@with_deadline
+@token_required
+@swag_from({
+    'tags': ['Jobs'],
+    'summary': 'Start a background job',
+    'description': "Kinds: `import` (body also holds `products`, a list of Product objects) and `export` (all products as JSON lines).",
+    'security': [{'bearerAuth': []}],
+    'parameters': [
+        {
+            'in': 'body',
+            'name': 'body',
+            'required': True,
+            'schema': {
+                'id': 'JobRequest',
+                'required': ['kind'],
+                'properties': {
+                    'kind': {'type': 'string', 'enum': ['import', 'export']},
+                    'products': {'type': 'array', 'items': {'$ref': '#/definitions/Product'}}
+                }
+            }
+        }
+    ],
+    'responses': {
+        '202': {'description': 'Job queued. Poll GET /jobs/{id} for its progress.'},
+        '400': {'description': 'Unknown kind or invalid parameters.'},
+        '401': {'description': 'Authorization token is missing or invalid.'},
+        '503': {'description': 'Too many jobs are queued; retry later.'}
+    }
+})
+def submit_job(current_user):
+    data = request.get_json(silent=True)
+    errors = validate('JobRequest', data)
+    if errors:
+        return invalid(errors, 'job')
+    kind = data['kind']
+
+    params = {}
+    if kind == 'import':
+        rows = data.get('products')
+        max_rows = current_app.config['JOB_MAX_ROWS']
+        if not rows:
+            return jsonify({'message': "'products' must be a non-empty list."}), 400
+        if len(rows) > max_rows:
+            return jsonify({'message': f"At most {max_rows} products can be imported by one job."}), 400
+        params = {'products': rows, 'added_by': current_user['public_id']}
+
+    try:
+        job = current_app.job_runner.submit(kind, params, user=current_user['public_id'])
+    except QueueFull:
+        res = jsonify({'message': 'Too many jobs are queued. Try again later.'})
+        res.headers['Retry-After'] = '5'
+        return res, 503
+
+    res = jsonify(serialize_job(job))
+    res.headers['Location'] = f"/jobs/{job['_id']}"
+    return res, 202
+
+
+@jobs_bp.route('/<job_id>', methods=['GET'])
+@rate_limit('read')
+@with_deadline
+@token_required
+@swag_from({
+    'tags': ['Jobs'],
+    'summary': 'Get the status and progress of a job',
+    'security': [{'bearerAuth': []}],
+    'parameters': [
+        {'name': 'job_id', 'in': 'path', 'type': 'string', 'required': True, 'description': 'The job ID.'}
+    ],
+    'responses': {
+        '200': {'description': 'Status (queued, running, succeeded, failed, cancelled), progress and result.'},
+        '401': {'description': 'Authorization token is missing or invalid.'},
+        '404': {'description': 'Job not found.'}
+    }
+})
+def get_job(current_user, job_id):
+    job = _own_job(job_id, current_user)
+    if job is None:
+        return jsonify({'message': 'Job not found!'}), 404
+    return jsonify(serialize_job(job)), 200
+
+
+@jobs_bp.route('/<job_id>/cancel', methods=['POST'])
+@rate_limit('write')
+@with_deadline
+@token_required
+@swag_from({
+    'tags': ['Jobs'],
+    'summary': 'Cancel a job',
+    'description': 'A running job stops at its next checkpoint; work done until then is kept.',
+    'security': [{'bearerAuth': []}],
+    'parameters': [
+        {'name': 'job_id', 'in': 'path', 'type': 'string', 'required': True, 'description': 'The job ID.'}
+    ],
+    'responses': {
+        '202': {'description': 'Cancellation requested.'},
+        '401': {'description': 'Authorization token is missing or invalid.'},
+        '404': {'description': 'Job not found.'},
+        '409': {'description': 'The job has already finished.'}
+    }
+})
+def cancel_job(current_user, job_id):
+    job = _own_job(job_id, current_user)
+    if job is None:
+        return jsonify({'message': 'Job not found!'}), 404
+    if job['status'] not in ('queued', 'running'):
+        return jsonify({'message': f"Job is already {job['status']}."}), 409
+    return jsonify(serialize_job(current_app.job_runner.cancel(job_id))), 202
+
+
+@jobs_bp.route('/<job_id>/download', methods=['GET'])
+@rate_limit('read')
+@with_deadline
+@token_required
+@swag_from({
+    'tags': ['Jobs'],
+    'summary': 'Download the file written by an export job',
+    'security': [{'bearerAuth': []}],
+    'produces': ['application/x-ndjson'],
+    'parameters': [
+        {'name': 'job_id', 'in': 'path', 'type': 'string', 'required': True, 'description': 'The job ID.'}
+    ],
+    'responses': {
+        '200': {'description': 'One JSON product per line.'},
+        '401': {'description': 'Authorization token is missing or invalid.'},
+        '404': {'description': 'Job or export file not found.'},
+        '409': {'description': 'The export has not succeeded (yet).'}
+    }
+})
+def download_job(current_user, job_id):
+    job = _own_job(job_id, current_user)
+    if job is None or job['kind'] != 'export':
+        return jsonify({'message': 'Job not found!'}), 404
+    if job['status'] != 'succeeded':
+        return jsonify({'message': f"Export is {job['status']}."}), 409
+    path = export_path(job_id)
+    if not os.path.exists(path):
+        return jsonify({'message': 'Export file not found.'}), 404
+    return send_file(path, mimetype='application/x-ndjson', as_attachment=True, download_name=f'products-{job_id}.jsonl')
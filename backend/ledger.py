@@ -0,0 +1,143 @@
+import atexit
+import threading
+from datetime import datetime, timezone
+
+
+class StockLedger:
+    """
+    Append-only stock movements recorded together with the stock changes.
+
+    Every change of a product's `quantity` made through the ledger is
+    written with its movement in one atomic step of the store: one
+    document update on Mongo, one transaction on SQLite. A movement is
+    therefore never lost, and concurrent writers in any process act on the
+    stored value, so stock cannot go negative. Each movement is numbered
+    per product (`seq`) and keeps the quantity it left, a snapshot that
+    makes the quantity as of any time a single indexed read.
+
+    On Mongo a movement first waits on the product document; the background
+    thread moves waiting movements of up to `batch_size` products into
+    `stock_movements` with one insert every `flush_interval` seconds, and
+    reads include them either way.
+    """
+
+    def __init__(self, store, products, flush_interval=0.2, batch_size=500):
+        self.store = store
+        self.products = products
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._closed = False
+        self._indexed = False
+
+        self.stats = {'recorded': 0, 'flushed': 0, 'flushes': 0, 'errors': 0}
+
+    def ensure_indexes(self):
+        if not self._indexed:
+            self._indexed = self.store.ensure_indexes()
+
+    # --- Writes ---
+    def movement(self, product_id, reason=None, user=None):
+        """A new movement for a store write to record; the store fills in seq, delta and quantity."""
+        if self._closed:
+            raise RuntimeError('Stock ledger is closed.')
+        return {'product_id': product_id, 'reason': reason, 'user': user, 'at': datetime.now(timezone.utc)}
+
+    def adjust(self, product_id, delta, reason=None, user=None):
+        """
+        Adds `delta` to the quantity of a product and records the movement.
+        Returns (quantity, movement), or None if the product does not exist
+        or the quantity would become negative.
+        """
+        movement = self.movement(product_id, reason, user)
+        quantity = self.products.add_quantity(product_id, delta, movement)
+        if quantity is None:
+            return None
+        self.recorded()
+        return quantity, dict(movement, delta=delta, quantity=quantity)
+
+    def set_quantity(self, product_id, quantity, reason=None, user=None):
+        """
+        Sets the quantity of a product and records the difference to the
+        value it replaced. Returns that previous quantity, or None if the
+        product does not exist.
+        """
+        previous = self.products.swap_quantity(product_id, quantity, self.movement(product_id, reason, user))
+        if previous is not None and quantity != previous:
+            self.recorded()
+        return previous
+
+    def recorded(self):
+        """Counts a movement a store has written, and makes sure a waiting one gets flushed."""
+        with self._lock:
+            self.stats['recorded'] += 1
+        if self.store.deferred:
+            self._ensure_worker()
+
+    def flush(self):
+        """Moves waiting movements to the movement store (Mongo only). Returns the number moved."""
+        with self._flush_lock:
+            try:
+                self.ensure_indexes()
+                moved = self.store.flush(self.batch_size)
+            except Exception:
+                with self._lock:
+                    self.stats['errors'] += 1
+                raise
+            with self._lock:
+                self.stats['flushes'] += 1
+                self.stats['flushed'] += moved
+            return moved
+
+    # --- Reads ---
+    def quantity(self, product_id, as_of=None):
+        """Returns the quantity of a product now or at `as_of`, or None if it does not exist."""
+        if as_of is not None:
+            return self.store.quantity_at(product_id, as_of)
+        product = self.products.get(product_id, ['quantity'])
+        return None if product is None else product.get('quantity') or 0
+
+    def history(self, product_id, limit=50):
+        """Returns up to `limit` movements of a product, newest first."""
+        return self.store.history(product_id, limit)
+
+    # --- Lifecycle ---
+    def _ensure_worker(self):
+        # Started lazily so that each gunicorn worker gets its own thread.
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._closed or (self._thread is not None and self._thread.is_alive()):
+                return
+            self._thread = threading.Thread(target=self._run, name='stock-ledger', daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                # A full batch means more are waiting.
+                while self.flush() >= self.batch_size and not self._closed:
+                    pass
+            except Exception as e:
+                print(f"❌ Stock ledger flush failed: {e}")
+
+    def close(self):
+        """Stops the background thread and moves what is still waiting."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._wake.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=self.flush_interval + 5)
+        if self.store.deferred:
+            # Nothing is lost if this fails: the movements stay on their products for the next flush.
+            while self.flush():
+                pass
@@ -0,0 +1,261 @@
+from flask import Blueprint, request, jsonify, current_app
+from audit import audit
+from openapi import swag_from
+from ratelimit import rate_limit
+from storage import get_location_store, get_product_store
+from utils import token_required, with_deadline
+from validation import invalid, validate
+
+location_bp = Blueprint('locations', __name__)
+
+MAX_LOCATION_LENGTH = 64
+
+
+def serialize_record(r):
+    return {'sku': r['sku'], 'location': r['location'], 'quantity': r['quantity'], 'updated_at': r['updated_at'].isoformat()}
+
+
+def _location_store():
+    store = get_location_store()
+    # The unique (sku, location) index is what keeps concurrent upserts from
+    # creating duplicate records, so make sure it exists before the first write.
+    if not getattr(store, 'indexed', False):
+        store.indexed = store.ensure_indexes()
+    return store
+
+
+def _invalid_location(location):
+    if not isinstance(location, str) or not location.strip() or len(location) > MAX_LOCATION_LENGTH:
+        return jsonify({'message': f'Location must be a non-empty string of at most {MAX_LOCATION_LENGTH} characters.'}), 400
+    return None
+
+
+def _stock_changed(sku):
+    cache = getattr(current_app, 'product_cache', None)
+    if cache is not None:
+        cache.invalidate(sku)
+
+
+@location_bp.route('', methods=['GET'])
+@rate_limit('read')
+@with_deadline
+@token_required
+@swag_from({
+    'tags': ['Locations'],
+    'summary': 'Get the stock of a SKU in every location',
+    'security': [{'bearerAuth': []}],
+    'parameters': [
+        {'name': 'sku', 'in': 'query', 'type': 'string', 'required': True, 'description': 'The SKU to break down.'}
+    ],
+    'responses': {
+        '200': {'description': 'The rolled-up product quantity and one record per location.'},
+        '400': {'description': 'The sku parameter is missing.'},
+        '401': {'description': 'Authorization token is missing or invalid.'},
+        '404': {'description': 'Product not found.'}
+    }
+})
+def get_sku_locations(current_user):
+    sku = request.args.get('sku')
+    if not sku:
+        return jsonify({'message': "The 'sku' parameter is required."}), 400
+
+    product = get_product_store().get_by_sku(sku, ['quantity'])
+    if product is None:
+        return jsonify({'message': 'Product not found!'}), 404
+    return jsonify({
+        'sku': sku,
+        'quantity': product.get('quantity'),
+        'locations': [serialize_record(r) for r in _location_store().list_for_sku(sku)]
+    }), 200
+
+
+@location_bp.route('/<location>', methods=['GET'])
+@rate_limit('read')
+@with_deadline
+@token_required
+@swag_from({
+    'tags': ['Locations'],
+    'summary': 'Get a paginated list of the stock held at a location',
+    'security': [{'bearerAuth': []}],
+    'parameters': [
+        {'name': 'location', 'in': 'path', 'type': 'string', 'required': True, 'description': 'Location name, e.g. a warehouse code.'},
+        {'name': 'page', 'in': 'query', 'type': 'integer', 'default': 1, 'description': 'The page number for pagination.'},
+        {'name': 'per_page', 'in': 'query', 'type': 'integer', 'default': 10, 'description': 'Records per page.'}
+    ],
+    'responses': {
+        '200': {'description': 'Stock records at the location, ordered by SKU.'},
+        '400': {'description': 'Invalid location or pagination parameters.'},
+        '401': {'description': 'Authorization token is missing or invalid.'}
+    }
+})
+def get_location_stock(current_user, location):
+    error = _invalid_location(location)
+    if error:
+        return error
+    try:
+        page = int(request.args.get('page', 1))
+        per_page = int(request.args.get('per_page', 10))
+    except ValueError:
+        return jsonify({'message': 'Invalid page or per_page parameter.'}), 400
+    if page <= 0 or per_page <= 0:
+        return jsonify({'message': 'Page and per_page parameters must be positive integers.'}), 400
+
+    records = _location_store().list_for_location(location, (page - 1) * per_page, per_page)
+    return jsonify([serialize_record(r) for r in records]), 200
+
+
+@location_bp.route('/<location>/<sku>', methods=['GET'])
+@rate_limit('read')
+@with_deadline
+@token_required
+@swag_from({
+    'tags': ['Locations'],
+    'summary': 'Get the stock of one SKU at one location',
+    'security': [{'bearerAuth': []}],
+    'parameters': [
+        {'name': 'location', 'in': 'path', 'type': 'string', 'required': True, 'description': 'Location name.'},
+        {'name': 'sku', 'in': 'path', 'type': 'string', 'required': True, 'description': 'The SKU.'}
+    ],
+    'responses': {
+        '200': {'description': 'The stock record.'},
+        '401': {'description': 'Authorization token is missing or invalid.'},
+        '404': {'description': 'No stock record for this SKU at this location.'}
+    }
+})
+def get_location_record(current_user, location, sku):
+    record = _location_store().get(sku, location)
+    if record is None:
+        return jsonify({'message': 'No stock for this SKU at this location.'}), 404
+    return jsonify(serialize_record(record)), 200
+
+
+@location_bp.route('/<location>/<sku>', methods=['PUT'])
+@rate_limit('write')
+@with_deadline
+@token_required
+@swag_from({
+    'tags': ['Locations'],
+    'summary': 'Set the stock of a SKU at a location',
+    'security': [{'bearerAuth': []}],
+    'parameters': [
+        {'name': 'location', 'in': 'path', 'type': 'string', 'required': True, 'description': 'Location name.'},
+        {'name': 'sku', 'in': 'path', 'type': 'string', 'required': True, 'description': 'The SKU.'},
+        {
+            'in': 'body',
+            'name': 'body',
+            'required': True,
+            'schema': {
+                'id': 'LocationQuantity',
+                'required': ['quantity'],
+                'properties': {
+                    'quantity': {'type': 'integer', 'minimum': 0, 'description': 'The new quantity at this location.'}
+                }
+            }
+        }
+    ],
+    'responses': {
+        '200': {'description': 'Stock updated; the product total moved by the same amount.'},
+        '400': {'description': 'Invalid location or quantity.'},
+        '401': {'description': 'Authorization token is missing or invalid.'},
+        '404': {'description': 'Product not found.'},
+        '409': {'description': 'The change would make the product total negative.'}
+    }
+})
+def set_location_quantity(current_user, location, sku):
+    error = _invalid_location(location)
+    if error:
+        return error
+    data = request.get_json(silent=True)
+    errors = validate('LocationQuantity', data)
+    if errors:
+        return invalid(errors, 'quantity')
+    quantity = data['quantity']
+
+    product = get_product_store().get_by_sku(sku, ['sku'])
+    if product is None:
+        return jsonify({'message': 'Product not found!'}), 404
+    product_id = str(product['_id'])
+
+    # The store moves the product total itself, and writes the ledger's
+    # movement in the same step; a buffered quantity must not overwrite it.
+    ledger = getattr(current_app, 'stock_ledger', None)
+    movement = ledger.movement(product_id, f'location:{location}', current_user['public_id']) if ledger is not None else None
+
+    def write():
+        return _location_store().set_quantity(sku, location, quantity, movement)
+
+    buffer = getattr(current_app, 'quantity_buffer', None)
+    change = buffer.apply_change(product_id, write) if buffer is not None else write()
+    if change is None:
+        return jsonify({'message': f"The total stock of '{sku}' cannot become negative."}), 409
+    if ledger is not None and change:
+        ledger.recorded()
+    _stock_changed(sku)
+    audit('location.quantity', user=current_user['public_id'], target=sku,
+          location=location, quantity=quantity, change=change)
+    return jsonify({
+        'sku': sku,
+        'location': location,
+        'quantity': quantity,
+        'change': change,
+        'message': 'Location stock updated successfully'
+    }), 200
+
+
+@location_bp.route('/transfer', methods=['POST'])
+@rate_limit('write')
+@with_deadline
+@token_required
+@swag_from({
+    'tags': ['Locations'],
+    'summary': 'Move stock of a SKU from one location to another',
+    'security': [{'bearerAuth': []}],
+    'parameters': [
+        {
+            'in': 'body',
+            'name': 'body',
+            'required': True,
+            'schema': {
+                'id': 'StockTransfer',
+                'required': ['sku', 'from', 'to', 'quantity'],
+                'properties': {
+                    'sku': {'type': 'string', 'minLength': 1},
+                    'from': {'type': 'string', 'minLength': 1, 'maxLength': MAX_LOCATION_LENGTH, 'description': 'Source location.'},
+                    'to': {'type': 'string', 'minLength': 1, 'maxLength': MAX_LOCATION_LENGTH, 'description': 'Destination location.'},
+                    'quantity': {'type': 'integer', 'minimum': 1, 'description': 'Units to move.'}
+                }
+            }
+        }
+    ],
+    'responses': {
+        '200': {'description': 'Stock moved. The product total is unchanged.'},
+        '400': {'description': 'Invalid transfer data.'},
+        '401': {'description': 'Authorization token is missing or invalid.'},
+        '409': {'description': 'The source location does not hold enough stock.'}
+    }
+})
+def transfer_stock(current_user):
+    data = request.get_json(silent=True)
+    errors = validate('StockTransfer', data)
+    if errors:
+        return invalid(errors, 'transfer data')
+    for key in ('from', 'to'):
+        error = _invalid_location(data[key])
+        if error:
+            return error
+    if data['from'] == data['to']:
+        return jsonify({'message': "'from' and 'to' must be different locations."}), 400
+    quantity = data['quantity']
+
+    store = _location_store()
+    if not store.transfer(data['sku'], data['from'], data['to'], quantity):
+        return jsonify({'message': f"Not enough stock of '{data['sku']}' at '{data['from']}'."}), 409
+    audit('location.transfer', user=current_user['public_id'], target=data['sku'],
+          source=data['from'], destination=data['to'], quantity=quantity)
+
+    return jsonify({
+        'sku': data['sku'],
+        'from': serialize_record(store.get(data['sku'], data['from'])),
+        'to': serialize_record(store.get(data['sku'], data['to'])),
+        'message': 'Stock transferred successfully'
+    }), 200
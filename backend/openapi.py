@@ -0,0 +1,169 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+
+import click
+from flask import Response, request
+
+SPEC_ENDPOINT = 'apispec_1'
+SPEC_ROUTE = '/apispec_1.json'
+SPEC_FILE = 'apispec.json'
+
+# --- Swagger Configuration ---
+SWAGGER_TEMPLATE = {
+    "swagger": "2.0",
+    "info": {
+        "title": "📦 Inventory Management API",
+        "description": """
+Welcome to the **Inventory Management API**! 🚀
+
+This API provides endpoints for managing products and authenticating users.
+
+---
+
+### 🔐 Authentication Steps
+
+1. Register a new user via the **POST /register** endpoint.  
+2. Log in with your credentials using **POST /login** to receive a **JWT access token**.  
+3. Click the green **Authorize** button and enter your token in this format: **Bearer <your_token>**
+4. You can now access all **protected product endpoints**.
+
+---
+
+### 📘 General Rules
+
+- All request and response bodies use **JSON format**.  
+- Refer to the **Models section** below for required schema formats.
+""",
+        "version": "1.0.0"
+    },
+    "host": "localhost:8080",
+    "basePath": "/",
+    "schemes": [
+        "http"
+    ],
+    "securityDefinitions": {
+        "bearerAuth": {
+            "type": "apiKey",
+            "name": "Authorization",
+            "in": "header",
+            "description": "Enter your bearer token in the format: `Bearer <token>`"
+        }
+    }
+}
+
+
+def swag_from(specs):
+    """
+    Attaches an operation spec dict to a view the same way `flasgger.swag_from`
+    does, so the spec can still be generated by flasgger, but without
+    importing flasgger (and jsonschema) in every worker.
+    """
+    def decorator(function):
+        function.specs_dict = specs
+        return function
+    return decorator
+
+
+def generate_spec(app):
+    """Builds the Swagger spec for every documented route of `app`."""
+    from flasgger import Swagger
+
+    swagger = Swagger(template=SWAGGER_TEMPLATE)
+    swagger.app = app
+    swagger.load_config(app)
+    with app.app_context():
+        return swagger.get_apispecs(SPEC_ENDPOINT)
+
+
+class SpecAsset:
+    """A serialized spec with its precompressed gzip form and ETag."""
+
+    def __init__(self, body):
+        self.body = body
+        self.gzipped = gzip.compress(body, compresslevel=9, mtime=0)
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+
+    @classmethod
+    def from_spec(cls, spec):
+        return cls(json.dumps(spec, sort_keys=True, separators=(',', ':')).encode('utf-8'))
+
+    @classmethod
+    def load(cls, directory):
+        """Loads a previously exported spec, or returns None if there is none."""
+        path = os.path.join(directory, SPEC_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as f:
+            return cls(f.read())
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, SPEC_FILE), 'wb') as f:
+            f.write(self.body)
+        with open(os.path.join(directory, SPEC_FILE + '.gz'), 'wb') as f:
+            f.write(self.gzipped)
+
+    def response(self, max_age, immutable=False):
+        if request.if_none_match.contains(self.etag):
+            res = Response(status=304)
+        elif 'gzip' in request.accept_encodings:
+            res = Response(self.gzipped, mimetype='application/json')
+            res.headers['Content-Encoding'] = 'gzip'
+        else:
+            res = Response(self.body, mimetype='application/json')
+        res.set_etag(self.etag)
+        res.vary.add('Accept-Encoding')
+        res.headers['Cache-Control'] = f'public, max-age={max_age}' + (', immutable' if immutable else '')
+        return res
+
+
+def init_openapi(app):
+    """
+    Serves the spec from a precomputed asset instead of letting flasgger
+    rebuild and re-serialize it per request. The asset is loaded from
+    OPENAPI_SPEC_DIR when it was exported at build time (`flask export-openapi`),
+    otherwise generated once on first use. The Swagger UI is only set up when
+    SWAGGER_UI is enabled. Call after every blueprint has been registered.
+    """
+    spec_dir = app.config.get('OPENAPI_SPEC_DIR') or os.path.join(app.root_path, 'openapi')
+    lock = threading.Lock()
+    state = {'asset': None}
+
+    def get_asset():
+        if state['asset'] is None:
+            with lock:
+                if state['asset'] is None:
+                    state['asset'] = SpecAsset.load(spec_dir) or SpecAsset.from_spec(generate_spec(app))
+        return state['asset']
+
+    def serve_spec():
+        return get_asset().response(app.config.get('OPENAPI_MAX_AGE', 3600))
+
+    def serve_versioned_spec(version):
+        asset = get_asset()
+        if version != asset.etag:
+            return Response(status=404)
+        return asset.response(31536000, immutable=True)
+
+    if app.config.get('SWAGGER_UI'):
+        from flasgger import Swagger
+        Swagger(app, template=SWAGGER_TEMPLATE)
+        # Keep the UI pointed at the usual URL, but answer it from the asset.
+        app.view_functions[f'flasgger.{SPEC_ENDPOINT}'] = serve_spec
+    else:
+        app.add_url_rule(SPEC_ROUTE, SPEC_ENDPOINT, serve_spec)
+    app.add_url_rule('/apispec/<version>.json', 'apispec_versioned', serve_versioned_spec)
+
+    @app.cli.command('export-openapi')
+    @click.argument('directory', default=spec_dir)
+    def export_openapi(directory):
+        """Generates the OpenAPI spec and writes apispec.json(.gz) to DIRECTORY."""
+        asset = SpecAsset.from_spec(generate_spec(app))
+        asset.save(directory)
+        click.echo(f"✅ OpenAPI spec written to {directory} (ETag {asset.etag})")
+
+    app.openapi_asset = get_asset
+    return get_asset
@@ -1,11 +1,114 @@
+from datetime import datetime, timezone
 from flask import Blueprint, request, jsonify, current_app
 from bson import ObjectId
-from flasgger import swag_from
-from utils import token_required
+from audit import audit
+from images import image_urls
+from openapi import swag_from
+from ratelimit import rate_limit
+from storage import DuplicateError, get_location_store, get_product_store
+from utils import token_required, with_deadline
+from validation import invalid, validate
 
 product_bp = Blueprint('products', __name__)
 
+PRODUCT_FIELDS = ['name', 'type', 'sku', 'image_url', 'image_hash', 'description', 'quantity', 'price']
+
+
+def serialize_product(p, fields=None):
+    """Converts a product document into its API representation, optionally limited to `fields`."""
+    output = {'id': str(p['_id'])}
+    for field in fields or PRODUCT_FIELDS:
+        output[field] = p.get(field)
+    if 'image_url' in output:
+        # An uploaded image replaces the free-text URL, and lists load its thumbnail.
+        output['thumbnail_url'] = None
+        if p.get('image_hash'):
+            output.update(image_urls(p['image_hash']))
+    return output
+
+
+def _store_fields(fields):
+    """The fields to read from the store to serialize `fields`."""
+    if fields and 'image_url' in fields and 'image_hash' not in fields:
+        return fields + ['image_hash']
+    return fields
+
+
+def validate_product(data):
+    """Returns {field: message} for every invalid field of a new product (the "Product" schema)."""
+    return validate('Product', data)
+
+
+def new_product(data, added_by):
+    """Builds the document stored for a validated new product."""
+    product = {
+        "name": data["name"],
+        "type": data["type"],
+        "sku": data["sku"],
+        "image_url": data.get("image_url", ""),
+        "description": data.get("description", ""),
+        "quantity": data["quantity"],
+        "price": data["price"],
+        "added_by": added_by
+    }
+    if data.get("image_hash"):
+        product["image_hash"] = data["image_hash"]
+    return product
+
+
+def _image_exists(image_hash):
+    store = getattr(current_app, 'image_store', None)
+    return store is not None and store.exists(image_hash)
+
+
+def _overlay_pending(products):
+    """Shows buffered quantity writes that are not in the stored quantity yet."""
+    buffer = getattr(current_app, 'quantity_buffer', None)
+    if buffer is None:
+        return products
+    return (buffer.overlay(p) for p in products)
+
+
+def _lookup_products(store, key, values, fields=None):
+    """
+    Resolves many products by id or `sku` with a single store query.
+    Results follow the order of `values` and unresolved values are reported
+    as explicit misses.
+    """
+    max_items = current_app.config.get('LOOKUP_MAX_ITEMS', 100)
+    if not isinstance(values, list) or not values:
+        return None, (jsonify({'message': f"'{key}s' must be a non-empty list."}), 400)
+    if len(values) > max_items:
+        return None, (jsonify({'message': f"At most {max_items} {key}s can be looked up at once."}), 400)
+    if fields is not None:
+        if not isinstance(fields, list) or not fields or not set(fields) <= set(PRODUCT_FIELDS):
+            return None, (jsonify({'message': f"'fields' must be a list of: {', '.join(PRODUCT_FIELDS)}."}), 400)
+
+    values = [str(v) for v in values]
+    # An invalid id can never match, so it is reported as a miss.
+    if key == 'id':
+        products = store.get_many(values, _store_fields(fields))
+    else:
+        products = store.get_many_by_sku(values, _store_fields(fields) + ['sku'] if fields else None)
+
+    found = {}
+    for p in _overlay_pending(products):
+        found[str(p['_id']) if key == 'id' else p['sku']] = p
+
+    results = []
+    for value in values:
+        p = found.get(value)
+        if p is None:
+            results.append({key: value, 'found': False})
+        else:
+            results.append({key: value, 'found': True, 'product': serialize_product(p, fields)})
+
+    hits = sum(1 for r in results if r['found'])
+    return {'results': results, 'found': hits, 'missing': len(results) - hits}, None
+
 @product_bp.route('', methods=['POST'])
+@rate_limit('write')
+@with_deadline
 @token_required
 @swag_from({
     'tags': ['Products'],
@@ -20,13 +123,14 @@ product_bp = Blueprint('products', __name__)
                 'id': 'Product',
                 'required': ['name', 'type', 'sku', 'quantity', 'price'],
                 'properties': {
-                    'name': {'type': 'string', 'description': 'Name of the product.'},
+                    'name': {'type': 'string', 'minLength': 1, 'description': 'Name of the product.'},
                     'type': {'type': 'string', 'description': 'Type or category of the product.'},
-                    'sku': {'type': 'string', 'description': 'Unique Stock Keeping Unit.'},
+                    'sku': {'type': 'string', 'minLength': 1, 'description': 'Unique Stock Keeping Unit.'},
                     'image_url': {'type': 'string', 'description': 'URL for the product image.'},
+                    'image_hash': {'type': 'string', 'minLength': 64, 'maxLength': 64, 'description': 'Hash of an image uploaded with POST /images. Takes the place of image_url.'},
                     'description': {'type': 'string', 'description': 'Detailed description of the product.'},
-                    'quantity': {'type': 'integer', 'description': 'Available quantity of the product.'},
-                    'price': {'type': 'number', 'description': 'Price of the product.'}
+                    'quantity': {'type': 'integer', 'minimum': 0, 'description': 'Available quantity of the product.'},
+                    'price': {'type': 'number', 'minimum': 0, 'description': 'Price of the product.'}
                 }
             }
         }
@@ -39,45 +143,39 @@ product_bp = Blueprint('products', __name__)
     }
 })
 def add_product(current_user):
-    db = current_app.db
+    store = get_product_store()
     data = request.get_json()
 
-    # --- FIX: Expanded validation ---
-    required_fields = ['name', 'type', 'sku', 'quantity', 'price']
-    if not all(k in data for k in required_fields):
-        return jsonify({'message': 'Missing product data!'}), 400
-
-    # Validate data values
-    if not data['name'] or not data['sku']:
-        return jsonify({'message': 'Name and SKU cannot be empty.'}), 400
-    
-    if not isinstance(data.get('quantity'), int) or data['quantity'] < 0:
-        return jsonify({'message': 'Quantity must be a non-negative integer.'}), 400
-
-    if not isinstance(data.get('price'), (int, float)) or data['price'] < 0:
-        return jsonify({'message': 'Price must be a non-negative number.'}), 400
+    errors = validate_product(data)
+    if not errors and data.get('image_hash') and not _image_exists(data['image_hash']):
+        errors = {'image_hash': 'is not an uploaded image'}
+    if errors:
+        return invalid(errors, 'product data')
 
-    # Check for duplicate SKU
-    if db.products.find_one({"sku": data['sku']}):
-        return jsonify({'message': f"Product with SKU '{data['sku']}' already exists."}), 409 # 409 Conflict
+    # Check for duplicate SKU. A definite miss in the SKU index skips the
+    # pre-read; the unique index on `sku` still rejects a concurrent insert.
+    sku_index = getattr(current_app, 'sku_index', None)
+    if sku_index is None or sku_index.might_contain(data['sku']):
+        if store.get_by_sku(data['sku'], ['sku']):
+            return jsonify({'message': f"Product with SKU '{data['sku']}' already exists."}), 409 # 409 Conflict
 
-    # --- End of FIX ---
+    try:
+        product_id = store.insert(new_product(data, current_user['public_id']))
+    except DuplicateError:
+        if sku_index is not None:
+            sku_index.add(data['sku'])
+        return jsonify({'message': f"Product with SKU '{data['sku']}' already exists."}), 409
 
-    result = db.products.insert_one({
-        "name": data["name"],
-        "type": data["type"],
-        "sku": data["sku"],
-        "image_url": data.get("image_url", ""),
-        "description": data.get("description", ""),
-        "quantity": data["quantity"],
-        "price": data["price"],
-        "added_by": current_user['public_id']
-    })
+    if sku_index is not None:
+        sku_index.add(data['sku'])
 
-    return jsonify({'message': 'Product added successfully!', 'product_id': str(result.inserted_id)}), 201
+    audit('product.create', user=current_user['public_id'], target=product_id, sku=data['sku'])
+    return jsonify({'message': 'Product added successfully!', 'product_id': product_id}), 201
 
 
 @product_bp.route('', methods=['GET'])
+@rate_limit('read')
+@with_deadline
 @token_required
 @swag_from({
     'tags': ['Products'],
@@ -97,6 +195,24 @@ def add_product(current_user):
             'type': 'integer',
             'default': 10,
             'description': 'The number of products to return per page.'
+        },
+        {
+            'name': 'ids',
+            'in': 'query',
+            'type': 'string',
+            'description': 'Comma-separated product ids. Switches to batch lookup (see POST /products/lookup).'
+        },
+        {
+            'name': 'skus',
+            'in': 'query',
+            'type': 'string',
+            'description': 'Comma-separated SKUs. Switches to batch lookup (see POST /products/lookup).'
+        },
+        {
+            'name': 'fields',
+            'in': 'query',
+            'type': 'string',
+            'description': 'Comma-separated product fields to return in batch lookup mode.'
         }
     ],
     'responses': {
@@ -123,7 +239,18 @@ def add_product(current_user):
     }
 })
 def get_products(current_user):
-    db = current_app.db
+    store = get_product_store()
+
+    # Batch lookup mode: /products?ids=a,b or /products?skus=a,b
+    for key in ('id', 'sku'):
+        if f'{key}s' in request.args:
+            values = [v for v in request.args[f'{key}s'].split(',') if v]
+            fields = request.args['fields'].split(',') if 'fields' in request.args else None
+            output, error = _lookup_products(store, key, values, fields)
+            if error:
+                return error
+            return jsonify(output)
+
     try:
         page = int(request.args.get('page', 1))
         per_page = int(request.args.get('per_page', 10))
@@ -136,19 +263,94 @@ def get_products(current_user):
     # --- End of FIX ---
 
     skip = (page - 1) * per_page
-    products_cursor = db.products.find({}).skip(skip).limit(per_page)
-    
-    output = [
+    products = store.list(skip, per_page)
+
+    output = [serialize_product(p) for p in _overlay_pending(products)]
+    return jsonify(output)
+
+
+@product_bp.route('/lookup', methods=['POST'])
+@rate_limit('read')
+@with_deadline
+@token_required
+@swag_from({
+    'tags': ['Products'],
+    'summary': 'Look up many products by id or SKU in one request',
+    'security': [{'bearerAuth': []}],
+    'parameters': [
         {
-            'id': str(p['_id']), 'name': p['name'], 'type': p['type'], 'sku': p['sku'],
-            'image_url': p.get('image_url'), 'description': p.get('description'),
-            'quantity': p['quantity'], 'price': p['price']
-        } for p in products_cursor
-    ]
+            'in': 'body',
+            'name': 'body',
+            'required': True,
+            'schema': {
+                'id': 'ProductLookup',
+                'properties': {
+                    'ids': {'type': 'array', 'items': {'type': 'string'}, 'description': 'Product ids to resolve.'},
+                    'skus': {'type': 'array', 'items': {'type': 'string'}, 'description': 'SKUs to resolve (used when ids is absent).'},
+                    'fields': {'type': 'array', 'items': {'type': 'string'}, 'description': 'Optional subset of product fields to return.'}
+                }
+            }
+        }
+    ],
+    'responses': {
+        '200': {'description': 'One result per requested id or SKU, in request order. Misses have found=false.'},
+        '400': {'description': 'Missing, empty or too many ids/SKUs, or unknown fields.'},
+        '401': {'description': 'Authorization token is missing or invalid.'}
+    }
+})
+def lookup_products(current_user):
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({'message': 'Request body must be a JSON object.'}), 400
+
+    key = 'id' if 'ids' in data else 'sku'
+    output, error = _lookup_products(get_product_store(), key, data.get(f'{key}s'), data.get('fields'))
+    if error:
+        return error
     return jsonify(output)
 
 
+@product_bp.route('/sku/<sku>', methods=['GET'])
+@rate_limit('read')
+@with_deadline
+@token_required
+@swag_from({
+    'tags': ['Products'],
+    'summary': 'Get a single product by SKU',
+    'security': [{'bearerAuth': []}],
+    'parameters': [
+        {
+            'name': 'sku',
+            'in': 'path',
+            'type': 'string',
+            'required': True,
+            'description': 'The Stock Keeping Unit of the product.'
+        }
+    ],
+    'responses': {
+        '200': {'description': 'The product with this SKU.'},
+        '401': {'description': 'Authorization token is missing or invalid.'},
+        '404': {'description': 'Product not found.'}
+    }
+})
+def get_product_by_sku(current_user, sku):
+    cache = getattr(current_app, 'product_cache', None)
+
+    product = cache.get(sku) if cache is not None else None
+    if product is None:
+        product = get_product_store().get_by_sku(sku)
+        if product is None:
+            return jsonify({'message': 'Product not found!'}), 404
+        if cache is not None:
+            cache.put(sku, product)
+
+    product = next(iter(_overlay_pending([product])))
+    return jsonify(serialize_product(product)), 200
+
+
 @product_bp.route('/<id>/quantity', methods=['PUT'])
+@rate_limit('write')
+@with_deadline
 @token_required
 @swag_from({
     'tags': ['Products'],
@@ -172,6 +374,7 @@ def get_products(current_user):
                 'properties': {
                     'quantity': {
                         'type': 'integer',
+                        'minimum': 0,
                         'description': 'The new quantity for the product.'
                     }
                 }
@@ -182,38 +385,302 @@ def get_products(current_user):
         '200': {'description': 'Product quantity updated successfully.'},
         '400': {'description': 'Invalid product ID or quantity provided.'},
         '401': {'description': 'Authorization token is missing or invalid.'},
-        '404': {'description': 'Product not found.'}
+        '404': {'description': 'Product not found.'},
+        '409': {'description': 'The stock of the product is kept per location; set it with PUT /locations/{location}/{sku}.'}
     }
 })
 def update_product_quantity(current_user, id):
-    db = current_app.db
-    try:
-        product_id = ObjectId(id)
-    except Exception:
+    store = get_product_store()
+    # Every storage backend hands out ObjectId-formatted ids.
+    if not ObjectId.is_valid(id):
         return jsonify({'message': 'Invalid product ID format!'}), 400
+    product_id = id
 
     data = request.get_json()
 
-    # --- FIX: Expanded validation for quantity ---
-    if 'quantity' not in data or not isinstance(data['quantity'], int):
-        return jsonify({'message': 'Quantity is required and must be an integer!'}), 400
+    errors = validate('ProductQuantity', data)
+    if errors:
+        return invalid(errors, 'quantity')
 
-    if data['quantity'] < 0:
-        return jsonify({'message': 'Quantity cannot be negative.'}), 400
-    # --- End of FIX ---
+    product = store.get(product_id, ['name', 'sku'])
+    if product is None:
+        return jsonify({'message': 'Product not found!'}), 404
+    # Once a SKU has location records its total is their sum plus any
+    # unassigned stock; overwriting it would break that and could take the
+    # total below what the locations hold.
+    if get_location_store().has_records(product['sku']):
+        return jsonify({
+            'message': f"Stock of '{product['sku']}' is kept per location; set it with PUT /locations/<location>/{product['sku']}."
+        }), 409
 
-    result = db.products.update_one(
-        {'_id': product_id},
-        {'$set': {'quantity': data['quantity']}}
-    )
+    cache = getattr(current_app, 'product_cache', None)
+    if cache is not None:
+        cache.invalidate_id(product_id)
 
-    if result.matched_count == 0:
+    # Ledger mode: set the quantity atomically and record the difference
+    # to the value it replaced as a stock movement.
+    ledger = getattr(current_app, 'stock_ledger', None)
+    if ledger is not None:
+        previous = ledger.set_quantity(product_id, data['quantity'], data.get('reason', 'adjustment'), current_user['public_id'])
+        if previous is None:
+            return jsonify({'message': 'Product not found!'}), 404
+
+        audit('product.quantity', user=current_user['public_id'], target=product_id,
+              quantity=data['quantity'], previous=previous)
+        return jsonify({
+            'id': str(product['_id']),
+            'name': product['name'],
+            'quantity': data['quantity'],
+            'message': 'Quantity updated successfully'
+        }), 200
+
+    # Write-behind mode: coalesce the write in memory, flushed in bulk later.
+    buffer = getattr(current_app, 'quantity_buffer', None)
+    if buffer is not None:
+        buffer.put(product_id, data['quantity'])
+        audit('product.quantity', user=current_user['public_id'], target=product_id, quantity=data['quantity'])
+        return jsonify({
+            'id': str(product['_id']),
+            'name': product['name'],
+            'quantity': data['quantity'],
+            'message': 'Quantity updated successfully'
+        }), 200
+
+    if not store.set_quantity(product_id, data['quantity']):
         return jsonify({'message': 'Product not found!'}), 404
+    audit('product.quantity', user=current_user['public_id'], target=product_id, quantity=data['quantity'])
 
-    updated_product = db.products.find_one({'_id': product_id})
+    updated_product = store.get(product_id)
     return jsonify({
         'id': str(updated_product['_id']),
         'name': updated_product['name'],
         'quantity': updated_product['quantity'],
         'message': 'Quantity updated successfully'
-    }), 200
\ No newline at end of file
+    }), 200
+
+
+@product_bp.route('/<id>/image', methods=['PUT'])
+@rate_limit('write')
+@with_deadline
+@token_required
+@swag_from({
+    'tags': ['Products'],
+    'summary': 'Set or remove the uploaded image of a product',
+    'security': [{'bearerAuth': []}],
+    'parameters': [
+        {'name': 'id', 'in': 'path', 'type': 'string', 'required': True, 'description': 'The id of the product.'},
+        {
+            'in': 'body',
+            'name': 'body',
+            'required': True,
+            'schema': {
+                'id': 'ProductImage',
+                'required': ['image_hash'],
+                'properties': {
+                    'image_hash': {'type': 'string', 'description': 'Hash returned by POST /images, or null to remove the image.'}
+                }
+            }
+        }
+    ],
+    'responses': {
+        '200': {'description': 'Image updated; returns the new image URLs.'},
+        '400': {'description': 'Invalid product ID, or not an uploaded image.'},
+        '401': {'description': 'Authorization token is missing or invalid.'},
+        '404': {'description': 'Product not found.'}
+    }
+})
+def set_product_image(current_user, id):
+    if not ObjectId.is_valid(id):
+        return jsonify({'message': 'Invalid product ID format!'}), 400
+    data = request.get_json(silent=True)
+    if isinstance(data, dict) and 'image_hash' in data and data['image_hash'] is None:
+        image_hash = None   # removes the image
+    else:
+        errors = validate('ProductImage', data)
+        if not errors and not _image_exists(data['image_hash']):
+            errors = {'image_hash': 'is not an uploaded image'}
+        if errors:
+            return invalid(errors, 'image')
+        image_hash = data['image_hash']
+
+    if not get_product_store().set_image(id, image_hash):
+        return jsonify({'message': 'Product not found!'}), 404
+
+    cache = getattr(current_app, 'product_cache', None)
+    if cache is not None:
+        cache.invalidate_id(id)
+    audit('product.image', user=current_user['public_id'], target=id, image_hash=image_hash)
+    urls = image_urls(image_hash) if image_hash else {'image_url': None, 'thumbnail_url': None}
+    return jsonify(dict(urls, id=id, image_hash=image_hash, message='Product image updated')), 200
+
+
+def _serialize_movement(m):
+    return {'delta': m['delta'], 'quantity': m.get('quantity'), 'reason': m.get('reason'), 'user': m.get('user'),
+            'at': m['at'].isoformat()}
+
+
+def _ledger_or_404():
+    ledger = getattr(current_app, 'stock_ledger', None)
+    if ledger is None:
+        return None, (jsonify({'message': 'The stock ledger is not enabled.'}), 404)
+    return ledger, None
+
+
+@product_bp.route('/<id>/movements', methods=['POST'])
+@rate_limit('write')
+@with_deadline
+@token_required
+@swag_from({
+    'tags': ['Stock Ledger'],
+    'summary': 'Record a stock movement (a signed change in quantity) for a product',
+    'security': [{'bearerAuth': []}],
+    'parameters': [
+        {
+            'name': 'id',
+            'in': 'path',
+            'type': 'string',
+            'required': True,
+            'description': 'The id of the product.'
+        },
+        {
+            'in': 'body',
+            'name': 'body',
+            'required': True,
+            'schema': {
+                'id': 'StockMovement',
+                'required': ['delta'],
+                'properties': {
+                    'delta': {'type': 'integer', 'description': 'Change in quantity, negative for stock leaving.'},
+                    'reason': {'type': 'string', 'description': 'Why the stock changed, e.g. "sale" or "delivery".'}
+                }
+            }
+        }
+    ],
+    'responses': {
+        '201': {'description': 'Movement recorded. Returns the new quantity.'},
+        '400': {'description': 'Invalid product ID, delta or reason, or the quantity would become negative.'},
+        '401': {'description': 'Authorization token is missing or invalid.'},
+        '404': {'description': 'Product not found, or the stock ledger is not enabled.'}
+    }
+})
+def record_movement(current_user, id):
+    ledger, error = _ledger_or_404()
+    if error:
+        return error
+    if not ObjectId.is_valid(id):
+        return jsonify({'message': 'Invalid product ID format!'}), 400
+
+    data = request.get_json(silent=True)
+    errors = validate('StockMovement', data)
+    if not errors and data['delta'] == 0:
+        errors = {'delta': 'must not be 0'}
+    if errors:
+        return invalid(errors, 'movement')
+    delta, reason = data['delta'], data.get('reason')
+
+    cache = getattr(current_app, 'product_cache', None)
+    if cache is not None:
+        cache.invalidate_id(id)
+
+    # The store refuses a delta that would make the quantity negative.
+    result = ledger.adjust(id, delta, reason, current_user['public_id'])
+    if result is None:
+        if get_product_store().get(id, ['_id']) is None:
+            return jsonify({'message': 'Product not found!'}), 404
+        return jsonify({'message': 'Quantity cannot be negative.'}), 400
+
+    quantity, movement = result
+    return jsonify({
+        'id': id,
+        'quantity': quantity,
+        'movement': _serialize_movement(movement),
+        'message': 'Stock movement recorded'
+    }), 201
+
+
+@product_bp.route('/<id>/movements', methods=['GET'])
+@rate_limit('read')
+@with_deadline
+@token_required
+@swag_from({
+    'tags': ['Stock Ledger'],
+    'summary': 'List the most recent stock movements of a product',
+    'security': [{'bearerAuth': []}],
+    'parameters': [
+        {'name': 'id', 'in': 'path', 'type': 'string', 'required': True, 'description': 'The id of the product.'},
+        {'name': 'limit', 'in': 'query', 'type': 'integer', 'default': 50, 'description': 'Movements to return (max 500).'}
+    ],
+    'responses': {
+        '200': {'description': 'The current quantity and the movements, newest first.'},
+        '400': {'description': 'Invalid product ID or limit.'},
+        '401': {'description': 'Authorization token is missing or invalid.'},
+        '404': {'description': 'Product not found, or the stock ledger is not enabled.'}
+    }
+})
+def get_movements(current_user, id):
+    ledger, error = _ledger_or_404()
+    if error:
+        return error
+    if not ObjectId.is_valid(id):
+        return jsonify({'message': 'Invalid product ID format!'}), 400
+    try:
+        limit = int(request.args.get('limit', 50))
+    except ValueError:
+        return jsonify({'message': 'Invalid limit parameter.'}), 400
+    if not 0 < limit <= 500:
+        return jsonify({'message': 'Limit must be between 1 and 500.'}), 400
+
+    current = ledger.quantity(id)
+    if current is None:
+        return jsonify({'message': 'Product not found!'}), 404
+    return jsonify({
+        'id': id,
+        'quantity': current,
+        'movements': [_serialize_movement(m) for m in ledger.history(id, limit)]
+    }), 200
+
+
+@product_bp.route('/<id>/quantity', methods=['GET'])
+@rate_limit('read')
+@with_deadline
+@token_required
+@swag_from({
+    'tags': ['Stock Ledger'],
+    'summary': 'Get the quantity of a product, now or as of a point in time',
+    'security': [{'bearerAuth': []}],
+    'parameters': [
+        {'name': 'id', 'in': 'path', 'type': 'string', 'required': True, 'description': 'The id of the product.'},
+        {'name': 'as_of', 'in': 'query', 'type': 'string', 'format': 'date-time',
+         'description': 'ISO 8601 timestamp; UTC when no offset is given. Defaults to now.'}
+    ],
+    'responses': {
+        '200': {'description': 'The quantity at the requested time.'},
+        '400': {'description': 'Invalid product ID or timestamp.'},
+        '401': {'description': 'Authorization token is missing or invalid.'},
+        '404': {'description': 'Product not found, or the stock ledger is not enabled.'}
+    }
+})
+def get_quantity(current_user, id):
+    ledger, error = _ledger_or_404()
+    if error:
+        return error
+    if not ObjectId.is_valid(id):
+        return jsonify({'message': 'Invalid product ID format!'}), 400
+
+    as_of = None
+    if 'as_of' in request.args:
+        try:
+            as_of = datetime.fromisoformat(request.args['as_of'].replace('Z', '+00:00'))
+        except ValueError:
+            return jsonify({'message': 'as_of must be an ISO 8601 timestamp.'}), 400
+        if as_of.tzinfo is None:
+            as_of = as_of.replace(tzinfo=timezone.utc)
+
+    quantity = ledger.quantity(id, as_of)
+    if quantity is None:
+        return jsonify({'message': 'Product not found!'}), 404
+    return jsonify({
+        'id': id,
+        'quantity': quantity,
+        'as_of': (as_of or datetime.now(timezone.utc)).isoformat()
+    }), 200
@@ -0,0 +1,134 @@
+import math
+import threading
+import time
+from functools import wraps
+
+import jwt
+from flask import request, jsonify, current_app
+
+
+class BucketStore:
+    """
+    Storage for token buckets. The in-memory store below is per process; a
+    deployment running several gunicorn workers can share limits by passing
+    a store backed by Redis, Mongo, etc. that implements `consume` atomically.
+    """
+
+    def consume(self, key, rate, burst, cost=1):
+        """
+        Takes `cost` tokens from the bucket `key`, refilled at `rate` tokens per
+        second up to `burst`. Returns 0 if allowed, otherwise the number of
+        seconds until enough tokens are available.
+        """
+        raise NotImplementedError
+
+
+class InMemoryBucketStore(BucketStore):
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = {}   # key -> (tokens, updated_at, full_at)
+        self._lock = threading.Lock()
+
+    def consume(self, key, rate, burst, cost=1):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at, _ = self._buckets.get(key, (burst, now, now))
+            tokens = min(burst, tokens + (now - updated_at) * rate)
+            if tokens >= cost:
+                tokens -= cost
+                retry_after = 0
+            else:
+                retry_after = (cost - tokens) / rate
+            self._buckets[key] = (tokens, now, now + (burst - tokens) / rate)
+            if len(self._buckets) > self.max_keys:
+                self._prune(now)
+        return retry_after
+
+    def _prune(self, now):
+        # Buckets that have refilled completely carry no state worth keeping.
+        for key in [k for k, (_, _, full_at) in self._buckets.items() if full_at <= now]:
+            del self._buckets[key]
+
+
+class RateLimiter:
+    """
+    Token-bucket rate limiting per client IP and per user, plus load shedding
+    with a separate concurrency budget for each route class ('auth', 'write',
+    'read') so that a burst on one class cannot take capacity from the others.
+    """
+
+    def __init__(self, rates, concurrency, store=None):
+        self.rates = rates              # route_class -> (tokens_per_second, burst)
+        self.store = store or InMemoryBucketStore()
+        self._slots = {name: threading.BoundedSemaphore(limit) for name, limit in concurrency.items()}
+        self.stats = {'rate_limited': 0, 'shed': 0}
+
+    def check(self, route_class, keys):
+        """Returns 0 if every key has a token left, otherwise the longest wait in seconds."""
+        if route_class not in self.rates:
+            return 0
+        rate, burst = self.rates[route_class]
+        retry_after = max(self.store.consume(f'{route_class}:{key}', rate, burst) for key in keys)
+        if retry_after:
+            self.stats['rate_limited'] += 1
+        return retry_after
+
+    def acquire(self, route_class):
+        slots = self._slots.get(route_class)
+        if slots is None or slots.acquire(blocking=False):
+            return True
+        self.stats['shed'] += 1
+        return False
+
+    def release(self, route_class):
+        slots = self._slots.get(route_class)
+        if slots is not None:
+            slots.release()
+
+
+def parse_limits(value, parse):
+    """Parses "auth=5/10,write=20/40" style settings into a dict."""
+    limits = {}
+    for item in value.split(','):
+        if '=' in item:
+            name, setting = item.split('=', 1)
+            limits[name.strip()] = parse(setting.strip())
+    return limits
+
+
+def _client_keys():
+    keys = [f'ip:{request.remote_addr}']
+
+    # The user is identified from the signed token alone so that throttling
+    # never costs a database round trip.
+    auth_header = request.headers.get('Authorization', '')
+    if auth_header.startswith('Bearer '):
+        try:
+            data = jwt.decode(auth_header[7:], current_app.config['SECRET_KEY'], algorithms=["HS256"])
+            keys.append(f"user:{data['public_id']}")
+        except (jwt.InvalidTokenError, KeyError):
+            pass
+    return keys
+
+
+def rate_limit(route_class):
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            limiter = getattr(current_app, 'rate_limiter', None)
+            if limiter is None:
+                return f(*args, **kwargs)
+
+            retry_after = limiter.check(route_class, _client_keys())
+            if retry_after:
+                return jsonify({'message': 'Too many requests, slow down.'}), 429, {'Retry-After': str(math.ceil(retry_after))}
+
+            if not limiter.acquire(route_class):
+                return jsonify({'message': 'Server is busy, please retry.'}), 503, {'Retry-After': '1'}
+            try:
+                return f(*args, **kwargs)
+            finally:
+                limiter.release(route_class)
+
+        return decorated
+    return decorator
@@ -0,0 +1,155 @@
+import bisect
+import hashlib
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from itertools import chain
+
+
+def _fingerprint(sku):
+    # 64-bit fingerprints keep the index compact; a collision only costs an
+    # extra pre-read, never a missed duplicate.
+    return int.from_bytes(hashlib.blake2b(sku.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+class SkuIndex:
+    """
+    In-process membership index of known SKUs.
+
+    The index is loaded lazily from a `sku`-only scan of the product store
+    into a sorted array of 64-bit fingerprints (8 bytes per SKU, searched by
+    bisection). SKUs added later go to a small set that is merged into the
+    array once it holds `merge_size` of them. Every `ttl` seconds the store
+    is rescanned on a background thread while the old index keeps answering,
+    so a request never waits for the scan. It has no false negatives for
+    SKUs inserted through this process, so a miss means the duplicate
+    pre-read can be skipped and the store's unique `sku` index (ensured on
+    first load) is left to reject writes from other workers.
+    """
+
+    def __init__(self, store, ttl=300, merge_size=4096):
+        self.store = store
+        self.ttl = ttl
+        self.merge_size = merge_size
+        self._sorted = None     # array('Q') of fingerprints, ascending
+        self._recent = set()    # fingerprints added since the array was built
+        self._loaded_at = 0.0
+        self._unique = False
+        self._added = None      # fingerprints added while a refresh is scanning
+        self._lock = threading.Lock()
+
+    def _scan(self):
+        return array('Q', sorted(_fingerprint(sku) for sku in self.store.iter_skus()))
+
+    def _ensure_loaded(self):
+        if self._sorted is None:
+            with self._lock:
+                if self._sorted is None:
+                    # Skipping the pre-read is only safe with a unique index behind it.
+                    self._unique = self.store.ensure_indexes()
+                    self._sorted = self._scan()
+                    self._loaded_at = time.monotonic()
+            return
+        if time.monotonic() - self._loaded_at >= self.ttl:
+            self._start_refresh()
+
+    def _start_refresh(self):
+        with self._lock:
+            if self._added is not None:
+                return
+            self._added = set()
+        threading.Thread(target=self._refresh, name='sku-index-refresh', daemon=True).start()
+
+    def _refresh(self):
+        try:
+            fingerprints = self._scan()
+            with self._lock:
+                self._sorted, self._recent = fingerprints, set(self._added)
+        except Exception as e:
+            print(f"❌ SKU index refresh failed: {e}")
+        finally:
+            with self._lock:
+                self._loaded_at = time.monotonic()
+                self._added = None
+
+    def _contains(self, fingerprint):
+        if fingerprint in self._recent:
+            return True
+        fingerprints = self._sorted
+        i = bisect.bisect_left(fingerprints, fingerprint)
+        return i < len(fingerprints) and fingerprints[i] == fingerprint
+
+    def might_contain(self, sku):
+        """False means the SKU is definitely unknown; True means it probably exists."""
+        self._ensure_loaded()
+        return not self._unique or self._contains(_fingerprint(sku))
+
+    def add(self, sku):
+        self._ensure_loaded()
+        fingerprint = _fingerprint(sku)
+        with self._lock:
+            if self._added is not None:
+                self._added.add(fingerprint)
+            if self._contains(fingerprint):
+                return
+            self._recent.add(fingerprint)
+            if len(self._recent) >= self.merge_size:
+                self._sorted = array('Q', sorted(chain(self._sorted, self._recent)))
+                self._recent = set()
+
+    def __len__(self):
+        self._ensure_loaded()
+        with self._lock:
+            return len(self._sorted) + len(self._recent)
+
+
+class HotProductCache:
+    """Small LRU cache of product documents keyed by SKU with a short TTL."""
+
+    def __init__(self, max_size=1024, ttl=10):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()   # sku -> (product, cached_at)
+        self._sku_by_id = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def get(self, sku):
+        """Returns a copy of the cached product document, or None."""
+        with self._lock:
+            entry = self._entries.get(sku)
+            if entry is None or time.monotonic() - entry[1] >= self.ttl:
+                if entry is not None:
+                    self._remove(sku)
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(sku)
+            self.stats['hits'] += 1
+            return dict(entry[0])
+
+    def put(self, sku, product):
+        with self._lock:
+            if sku in self._entries:
+                self._remove(sku)
+            self._entries[sku] = (dict(product), time.monotonic())
+            self._sku_by_id[str(product['_id'])] = sku
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_id(self, product_id):
+        """Drops the cached entry for a product after it has been modified."""
+        with self._lock:
+            sku = self._sku_by_id.get(product_id)
+            if sku is not None:
+                self._remove(sku)
+
+    def invalidate(self, sku):
+        """Drops the cached entry for a SKU after its stock has changed."""
+        with self._lock:
+            if sku in self._entries:
+                self._remove(sku)
+
+    def _remove(self, sku):
+        product, _ = self._entries.pop(sku)
+        self._sku_by_id.pop(str(product['_id']), None)
@@ -0,0 +1,98 @@
+from flask import current_app
+
+from storage.base import AuditStore, DuplicateError, JobStore, LocationStore, MovementStore, ProductStore, UserStore
+from storage.memory import (
+    MemoryAuditStore, MemoryJobStore, MemoryLocationStore, MemoryMovementStore, MemoryProductStore, MemoryUserStore
+)
+from storage.mongo import (
+    MongoAuditStore, MongoJobStore, MongoLocationStore, MongoMovementStore, MongoProductStore, MongoUserStore
+)
+from storage.sqlite import (
+    SQLiteAuditStore, SQLiteDatabase, SQLiteJobStore, SQLiteLocationStore, SQLiteMovementStore, SQLiteProductStore,
+    SQLiteUserStore
+)
+
+BACKENDS = ('mongo', 'memory', 'sqlite')
+
+
+def create_stores(backend, db=None, sqlite_path=None):
+    """Builds the (product_store, user_store) pair for the configured backend."""
+    if backend == 'mongo':
+        return MongoProductStore(db), MongoUserStore(db)
+    if backend == 'memory':
+        return MemoryProductStore(), MemoryUserStore()
+    if backend == 'sqlite':
+        database = SQLiteDatabase(sqlite_path)
+        return SQLiteProductStore(database), SQLiteUserStore(database)
+    raise ValueError(f"Unknown storage backend '{backend}', expected one of: {', '.join(BACKENDS)}")
+
+
+def create_movement_store(product_store):
+    """Builds the stock movement ledger on the same engine (and database) as `product_store`."""
+    if isinstance(product_store, MongoProductStore):
+        return MongoMovementStore(product_store.collection.database)
+    if isinstance(product_store, MemoryProductStore):
+        return MemoryMovementStore(product_store)
+    if isinstance(product_store, SQLiteProductStore):
+        return SQLiteMovementStore(product_store.database)
+    raise ValueError(f"No stock movement store for {type(product_store).__name__}")
+
+
+def create_location_store(product_store):
+    """Builds the per-location stock store on the same engine (and database) as `product_store`."""
+    if isinstance(product_store, MongoProductStore):
+        return MongoLocationStore(product_store.collection.database)
+    if isinstance(product_store, MemoryProductStore):
+        return MemoryLocationStore(product_store)
+    if isinstance(product_store, SQLiteProductStore):
+        return SQLiteLocationStore(product_store.database)
+    raise ValueError(f"No location store for {type(product_store).__name__}")
+
+
+def create_job_store(product_store):
+    """Builds the background job store on the same engine (and database) as `product_store`."""
+    if isinstance(product_store, MongoProductStore):
+        return MongoJobStore(product_store.collection.database)
+    if isinstance(product_store, MemoryProductStore):
+        return MemoryJobStore()
+    if isinstance(product_store, SQLiteProductStore):
+        return SQLiteJobStore(product_store.database)
+    raise ValueError(f"No job store for {type(product_store).__name__}")
+
+
+def create_audit_store(product_store, retention):
+    """
+    Builds the audit trail on the same engine (and database) as `product_store`.
+    Events are removed `retention` seconds after they were recorded.
+    """
+    if isinstance(product_store, MongoProductStore):
+        return MongoAuditStore(product_store.collection.database, retention)
+    if isinstance(product_store, MemoryProductStore):
+        return MemoryAuditStore(retention)
+    if isinstance(product_store, SQLiteProductStore):
+        return SQLiteAuditStore(product_store.database, retention)
+    raise ValueError(f"No audit store for {type(product_store).__name__}")
+
+
+def get_product_store():
+    """Returns the app's product store, defaulting to Mongo on `current_app.db`."""
+    store = getattr(current_app, 'product_store', None)
+    if store is None:
+        store = current_app.product_store = MongoProductStore(current_app.db)
+    return store
+
+
+def get_user_store():
+    """Returns the app's user store, defaulting to Mongo on `current_app.db`."""
+    store = getattr(current_app, 'user_store', None)
+    if store is None:
+        store = current_app.user_store = MongoUserStore(current_app.db)
+    return store
+
+
+def get_location_store():
+    """Returns the app's location store, defaulting to the engine of the product store."""
+    store = getattr(current_app, 'location_store', None)
+    if store is None:
+        store = current_app.location_store = create_location_store(get_product_store())
+    return store
@@ -0,0 +1,249 @@
+class DuplicateError(Exception):
+    """Raised when an insert violates a unique key (product SKU, username or public_id)."""
+
+
+def project(doc, fields=None):
+    """Returns a copy of `doc` limited to `_id` and `fields` (all fields when None)."""
+    if doc is None:
+        return None
+    if fields is None:
+        return dict(doc)
+    output = {'_id': doc['_id']}
+    for field in fields:
+        if field in doc:
+            output[field] = doc[field]
+    return output
+
+
+class ProductStore:
+    """
+    Interface implemented by every product storage engine.
+
+    Products are plain dicts with an `_id` key plus the product fields. Ids
+    are passed in as the strings the API hands out; a malformed or unknown
+    id simply does not match anything.
+    """
+
+    def ensure_indexes(self):
+        """Makes sure `sku` is unique. Returns False if that cannot be guaranteed."""
+        raise NotImplementedError
+
+    def insert(self, product):
+        """Inserts a product and returns its id as a string. Raises DuplicateError on a known SKU."""
+        raise NotImplementedError
+
+    def get(self, product_id, fields=None):
+        raise NotImplementedError
+
+    def get_by_sku(self, sku, fields=None):
+        raise NotImplementedError
+
+    def get_many(self, product_ids, fields=None):
+        """Returns the products matching any of `product_ids`, in no particular order."""
+        raise NotImplementedError
+
+    def get_many_by_sku(self, skus, fields=None):
+        """Returns the products matching any of `skus`, in no particular order."""
+        raise NotImplementedError
+
+    def list(self, skip, limit):
+        """Returns an iterable over one page of products in insertion order."""
+        raise NotImplementedError
+
+    def list_after(self, after_id, limit):
+        """
+        Returns up to `limit` products ordered by id, starting after `after_id`
+        (from the first with None). Unlike `list`, every page is one indexed
+        range read, however far in it starts.
+        """
+        raise NotImplementedError
+
+    def set_quantity(self, product_id, quantity):
+        """Sets the quantity of one product. Returns False if the product does not exist."""
+        raise NotImplementedError
+
+    def set_quantities(self, quantities):
+        """Sets many quantities at once from a {product_id: quantity} mapping."""
+        raise NotImplementedError
+
+    def add_quantity(self, product_id, delta, movement=None):
+        """
+        Atomically adds `delta` to the quantity of one product unless the result
+        would be negative. Returns the new quantity, or None if the product does
+        not exist or holds too little stock. A `movement` (see MovementStore)
+        is recorded in the same atomic step.
+        """
+        raise NotImplementedError
+
+    def swap_quantity(self, product_id, quantity, movement=None):
+        """
+        Atomically sets the quantity of one product. Returns the previous
+        quantity, or None if it does not exist. A `movement` records the
+        difference in the same atomic step, unless there is none.
+        """
+        raise NotImplementedError
+
+    def set_image(self, product_id, image_hash):
+        """Sets (or with None, removes) the uploaded image of a product. Returns False if it does not exist."""
+        raise NotImplementedError
+
+    def iter_skus(self):
+        """Yields every stored SKU."""
+        raise NotImplementedError
+
+
+class UserStore:
+    """Interface implemented by every user storage engine."""
+
+    def get_by_username(self, username):
+        raise NotImplementedError
+
+    def get_by_public_id(self, public_id):
+        raise NotImplementedError
+
+    def insert(self, user):
+        """Inserts a user. Raises DuplicateError if the username or public_id is taken."""
+        raise NotImplementedError
+
+
+class MovementStore:
+    """
+    Interface of the append-only stock movement ledger.
+
+    A movement is a dict with `product_id`, `seq` (1, 2, ... per product),
+    `delta`, `quantity` (the quantity it left), `reason`, `user` and `at`
+    (an aware UTC datetime). Movements are never changed or deleted. They
+    are written by the product and location stores in the same atomic step
+    as the change of `quantity` they record: the caller passes a movement
+    with `product_id`, `reason`, `user` and `at`, and the store fills in
+    the rest. Since every movement keeps the quantity it left, the quantity
+    at any time is read from one movement.
+    """
+
+    # True if recorded movements wait for `flush` to reach their own table or collection.
+    deferred = False
+
+    def ensure_indexes(self):
+        raise NotImplementedError
+
+    def flush(self, limit):
+        """Moves the waiting movements of up to `limit` products to their place. Returns the number moved."""
+        return 0
+
+    def quantity_at(self, product_id, at):
+        """
+        Returns the quantity a product had at `at`: the one left by its last
+        movement until then, before its first movement if all are later, or
+        its current quantity if it has none. None if it does not exist.
+        """
+        raise NotImplementedError
+
+    def history(self, product_id, limit):
+        """Returns up to `limit` movements of a product, newest first."""
+        raise NotImplementedError
+
+
+class LocationStore:
+    """
+    Interface of per-location stock records: one record with a `quantity`
+    per (`sku`, `location`). Every write also moves the product's `quantity`
+    by the same amount, so the product keeps a rolled-up total that list
+    reads can use as is. Stock never assigned to a location (such as the
+    quantity given when the product was added) stays in that total. Like
+    every other stock write, a location write never takes the total below 0.
+    """
+
+    def ensure_indexes(self):
+        """Makes sure (sku, location) is unique and locations can be listed. Returns False on failure."""
+        raise NotImplementedError
+
+    def get(self, sku, location):
+        raise NotImplementedError
+
+    def list_for_sku(self, sku):
+        """Returns every record of a SKU, ordered by location."""
+        raise NotImplementedError
+
+    def list_for_location(self, location, skip, limit):
+        """Returns one page of the records at a location, ordered by SKU."""
+        raise NotImplementedError
+
+    def has_records(self, sku):
+        """Returns True if any location holds a record of the SKU."""
+        raise NotImplementedError
+
+    def set_quantity(self, sku, location, quantity, movement=None):
+        """
+        Sets the stock of a SKU at a location and returns the change applied
+        to the product total, or None (and changes nothing) if that change
+        would make the total negative. A `movement` (see MovementStore) of
+        the product records the change together with the total.
+        """
+        raise NotImplementedError
+
+    def transfer(self, sku, source, destination, quantity):
+        """Moves stock between locations. Returns False if `source` holds less than `quantity`."""
+        raise NotImplementedError
+
+
+JOB_ACTIVE = ('queued', 'running')
+
+
+class JobStore:
+    """
+    Interface of the persisted background jobs.
+
+    A job is a dict with `_id` (a string), `kind`, `params`, `status`
+    (queued, running, succeeded, failed or cancelled), `progress`, `offset`,
+    `state`, `result`, `error`, `cancel_requested`, `owner`, `lease_until`
+    and timestamps. Times are UNIX epoch seconds. A job is run by the runner
+    that holds its lease; a lease that ran out lets another runner resume it.
+    """
+
+    def ensure_indexes(self):
+        raise NotImplementedError
+
+    def insert(self, job):
+        """Inserts a job and returns its id as a string."""
+        raise NotImplementedError
+
+    def get(self, job_id):
+        raise NotImplementedError
+
+    def update(self, job_id, fields, owner=None):
+        """
+        Sets `fields` on a job and returns the updated job. Returns None if
+        the job does not exist or, when `owner` is given, is held by another runner.
+        """
+        raise NotImplementedError
+
+    def claim(self, job_id, owner, lease_until, now):
+        """
+        Marks an active job as running under `owner` if it is unowned, already
+        owned by `owner`, or its lease ran out. Returns the job, or None.
+        """
+        raise NotImplementedError
+
+    def find_resumable(self, now, limit=10):
+        """Returns the ids of active jobs whose lease ran out before `now`."""
+        raise NotImplementedError
+
+
+class AuditStore:
+    """
+    Interface of the audit trail. An event is a dict with `action`, `user`,
+    `target`, `ip`, `details` and `at` (an aware UTC datetime). Events are
+    only ever appended; each engine removes them once they are older than
+    `retention` seconds (a TTL index on Mongo).
+    """
+
+    def ensure_indexes(self):
+        raise NotImplementedError
+
+    def append(self, events):
+        """Writes a batch of events."""
+        raise NotImplementedError
+
+    def recent(self, limit=50, target=None, action=None):
+        """Returns up to `limit` events, newest first, optionally only of one `target` or `action`."""
+        raise NotImplementedError
@@ -0,0 +1,284 @@
+import bisect
+import threading
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+
+from storage.base import JOB_ACTIVE, AuditStore, DuplicateError, JobStore, LocationStore, MovementStore, ProductStore, UserStore, project
+
+
+class MemoryProductStore(ProductStore):
+    """
+    Products kept in process memory with hash indexes on `_id` and `sku` and
+    an insertion-order list for pagination. Data is lost on restart.
+    """
+
+    def __init__(self):
+        self._docs = {}      # id -> product
+        self._by_sku = {}    # sku -> id
+        self._order = []     # ids in insertion order
+        self._movements = {} # id -> stock movements in seq order, read by MemoryMovementStore
+        self._lock = threading.Lock()
+
+    def ensure_indexes(self):
+        return True
+
+    def insert(self, product):
+        with self._lock:
+            if product['sku'] in self._by_sku:
+                raise DuplicateError(f"Product with SKU '{product['sku']}' already exists.")
+            product_id = str(ObjectId())
+            self._docs[product_id] = dict(product, _id=product_id)
+            self._by_sku[product['sku']] = product_id
+            self._order.append(product_id)
+        return product_id
+
+    def get(self, product_id, fields=None):
+        return project(self._docs.get(product_id), fields)
+
+    def get_by_sku(self, sku, fields=None):
+        return self.get(self._by_sku.get(sku), fields)
+
+    def get_many(self, product_ids, fields=None):
+        return [project(self._docs[i], fields) for i in set(product_ids) if i in self._docs]
+
+    def get_many_by_sku(self, skus, fields=None):
+        return [project(self._docs[self._by_sku[s]], fields) for s in set(skus) if s in self._by_sku]
+
+    def list(self, skip, limit):
+        return [dict(self._docs[i]) for i in self._order[skip:skip + limit]]
+
+    def list_after(self, after_id, limit):
+        # Ids are ObjectIds made by this process, so insertion order is id order.
+        start = 0 if after_id is None else bisect.bisect_right(self._order, after_id)
+        return [dict(self._docs[i]) for i in self._order[start:start + limit]]
+
+    def set_quantity(self, product_id, quantity):
+        with self._lock:
+            product = self._docs.get(product_id)
+            if product is None:
+                return False
+            product['quantity'] = quantity
+        return True
+
+    def set_quantities(self, quantities):
+        with self._lock:
+            for product_id, quantity in quantities.items():
+                if product_id in self._docs:
+                    self._docs[product_id]['quantity'] = quantity
+
+    def _record(self, movement, delta, quantity):
+        """Appends a movement; the caller holds the lock."""
+        movements = self._movements.setdefault(movement['product_id'], [])
+        movements.append(dict(movement, seq=len(movements) + 1, delta=delta, quantity=quantity))
+
+    def add_quantity(self, product_id, delta, movement=None):
+        with self._lock:
+            product = self._docs.get(product_id)
+            if product is None or (product.get('quantity') or 0) + delta < 0:
+                return None
+            product['quantity'] = (product.get('quantity') or 0) + delta
+            if movement is not None:
+                self._record(movement, delta, product['quantity'])
+            return product['quantity']
+
+    def swap_quantity(self, product_id, quantity, movement=None):
+        with self._lock:
+            product = self._docs.get(product_id)
+            if product is None:
+                return None
+            previous, product['quantity'] = product.get('quantity') or 0, quantity
+            if movement is not None and quantity != previous:
+                self._record(movement, quantity - previous, quantity)
+        return previous
+
+    def set_image(self, product_id, image_hash):
+        with self._lock:
+            product = self._docs.get(product_id)
+            if product is None:
+                return False
+            if image_hash:
+                product['image_hash'] = image_hash
+            else:
+                product.pop('image_hash', None)
+        return True
+
+    def iter_skus(self):
+        return iter(list(self._by_sku))
+
+
+class MemoryMovementStore(MovementStore):
+    """Reads the movements a MemoryProductStore records next to its products."""
+
+    def __init__(self, products):
+        self.products = products
+
+    def ensure_indexes(self):
+        return True
+
+    def quantity_at(self, product_id, at):
+        with self.products._lock:
+            product = self.products._docs.get(product_id)
+            if product is None:
+                return None
+            movements = list(self.products._movements.get(product_id, ()))
+            current = product.get('quantity') or 0
+        until = [m for m in movements if m['at'] <= at]
+        if until:
+            return until[-1]['quantity']
+        return movements[0]['quantity'] - movements[0]['delta'] if movements else current
+
+    def history(self, product_id, limit):
+        with self.products._lock:
+            movements = self.products._movements.get(product_id, [])[-limit:]
+        return [dict(m) for m in reversed(movements)]
+
+
+class MemoryLocationStore(LocationStore):
+    """Location records kept in process memory next to a MemoryProductStore."""
+
+    def __init__(self, products):
+        self.products = products
+        self._records = {}        # (sku, location) -> record
+        self._by_location = {}    # location -> set of SKUs
+        self._lock = threading.Lock()
+
+    def ensure_indexes(self):
+        return True
+
+    def get(self, sku, location):
+        return project(self._records.get((sku, location)))
+
+    def list_for_sku(self, sku):
+        with self._lock:
+            records = [dict(r) for (s, _), r in self._records.items() if s == sku]
+        return sorted(records, key=lambda r: r['location'])
+
+    def list_for_location(self, location, skip, limit):
+        with self._lock:
+            skus = sorted(self._by_location.get(location, ()))[skip:skip + limit]
+            return [dict(self._records[(sku, location)]) for sku in skus]
+
+    def has_records(self, sku):
+        with self._lock:
+            return any(s == sku for s, _ in self._records)
+
+    def _write(self, sku, location, quantity):
+        self._records[(sku, location)] = {'sku': sku, 'location': location, 'quantity': quantity,
+                                          'updated_at': datetime.now(timezone.utc)}
+        self._by_location.setdefault(location, set()).add(sku)
+
+    def set_quantity(self, sku, location, quantity, movement=None):
+        with self._lock:
+            previous = self._records.get((sku, location))
+            change = quantity - (previous['quantity'] if previous else 0)
+            with self.products._lock:
+                product = self.products._docs.get(self.products._by_sku.get(sku))
+                if product is not None and change:
+                    total = (product.get('quantity') or 0) + change
+                    if total < 0:
+                        return None
+                    product['quantity'] = total
+                    if movement is not None:
+                        self.products._record(movement, change, total)
+            self._write(sku, location, quantity)
+        return change
+
+    def transfer(self, sku, source, destination, quantity):
+        with self._lock:
+            taken = self._records.get((sku, source))
+            if taken is None or taken['quantity'] < quantity:
+                return False
+            given = self._records.get((sku, destination))
+            self._write(sku, source, taken['quantity'] - quantity)
+            self._write(sku, destination, (given['quantity'] if given else 0) + quantity)
+        return True
+
+
+class MemoryJobStore(JobStore):
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def ensure_indexes(self):
+        return True
+
+    def insert(self, job):
+        job_id = str(ObjectId())
+        with self._lock:
+            self._jobs[job_id] = dict(job, _id=job_id)
+        return job_id
+
+    def get(self, job_id):
+        with self._lock:
+            return project(self._jobs.get(job_id))
+
+    def update(self, job_id, fields, owner=None):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or (owner is not None and job.get('owner') != owner):
+                return None
+            job.update(fields)
+            return dict(job)
+
+    def claim(self, job_id, owner, lease_until, now):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job['status'] not in JOB_ACTIVE:
+                return None
+            if job.get('owner') not in (None, owner) and (job.get('lease_until') or 0) >= now:
+                return None
+            job.update(status='running', owner=owner, lease_until=lease_until, updated_at=now)
+            return dict(job)
+
+    def find_resumable(self, now, limit=10):
+        with self._lock:
+            expired = [j for j in self._jobs.values() if j['status'] in JOB_ACTIVE and (j.get('lease_until') or 0) < now]
+        return [j['_id'] for j in sorted(expired, key=lambda j: j.get('lease_until') or 0)[:limit]]
+
+
+class MemoryAuditStore(AuditStore):
+    """Events in process memory; expired events are dropped on every append."""
+
+    def __init__(self, retention):
+        self.retention = timedelta(seconds=retention)
+        self._events = []
+        self._lock = threading.Lock()
+
+    def ensure_indexes(self):
+        return True
+
+    def append(self, events):
+        cutoff = datetime.now(timezone.utc) - self.retention
+        with self._lock:
+            self._events = [e for e in self._events if e['at'] >= cutoff]
+            self._events.extend(dict(e) for e in events)
+
+    def recent(self, limit=50, target=None, action=None):
+        with self._lock:
+            events = [
+                e for e in self._events
+                if (target is None or e['target'] == target) and (action is None or e['action'] == action)
+            ]
+        return [dict(e) for e in reversed(events[-limit:])]
+
+
+class MemoryUserStore(UserStore):
+    def __init__(self):
+        self._by_username = {}
+        self._by_public_id = {}
+        self._lock = threading.Lock()
+
+    def get_by_username(self, username):
+        return project(self._by_username.get(username))
+
+    def get_by_public_id(self, public_id):
+        return project(self._by_public_id.get(public_id))
+
+    def insert(self, user):
+        with self._lock:
+            if user['username'] in self._by_username or user['public_id'] in self._by_public_id:
+                raise DuplicateError('User already exists!')
+            user = dict(user, _id=str(ObjectId()))
+            self._by_username[user['username']] = user
+            self._by_public_id[user['public_id']] = user
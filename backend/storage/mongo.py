@@ -0,0 +1,482 @@
+from datetime import datetime, timezone
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure, PyMongoError
+
+from storage.base import JOB_ACTIVE, AuditStore, DuplicateError, JobStore, LocationStore, MovementStore, ProductStore, UserStore
+
+def _object_id(value):
+    try:
+        return ObjectId(value)
+    except Exception:
+        return None
+
+
+def _projection(fields):
+    return None if fields is None else dict.fromkeys(fields, 1)
+
+
+def _naive_utc(at):
+    # BSON dates are UTC without a zone; keep every stored and queried value naive.
+    return at.astimezone(timezone.utc).replace(tzinfo=None) if at.tzinfo else at
+
+
+def _with_movement(update, movement, delta):
+    """
+    Extends a quantity update of a product document so that the same atomic
+    update records the stock movement: it waits on the document in
+    `ledger_pending`, numbered by `ledger_seq`, until MongoMovementStore
+    moves it to `stock_movements`.
+    """
+    pending = dict(movement, _id=movement.get('_id') or ObjectId(), delta=delta, at=_naive_utc(movement['at']))
+    return dict(update, **{'$inc': dict(update.get('$inc', {}), ledger_seq=1), '$push': {'ledger_pending': pending}})
+
+
+class MongoProductStore(ProductStore):
+    def __init__(self, db):
+        self.collection = db.products
+
+    def ensure_indexes(self):
+        try:
+            self.collection.create_index('sku', unique=True)
+            return True
+        except PyMongoError as e:
+            print(f"❌ Could not create unique index on products.sku: {e}")
+            return False
+
+    def insert(self, product):
+        try:
+            result = self.collection.insert_one(dict(product))
+        except DuplicateKeyError:
+            raise DuplicateError(f"Product with SKU '{product['sku']}' already exists.")
+        return str(result.inserted_id)
+
+    def get(self, product_id, fields=None):
+        oid = _object_id(product_id)
+        if oid is None:
+            return None
+        return self.collection.find_one({'_id': oid}, _projection(fields))
+
+    def get_by_sku(self, sku, fields=None):
+        return self.collection.find_one({'sku': sku}, _projection(fields))
+
+    def get_many(self, product_ids, fields=None):
+        oids = {oid for oid in map(_object_id, product_ids) if oid is not None}
+        if not oids:
+            return []
+        return list(self.collection.find({'_id': {'$in': list(oids)}}, _projection(fields)))
+
+    def get_many_by_sku(self, skus, fields=None):
+        return list(self.collection.find({'sku': {'$in': list(set(skus))}}, _projection(fields)))
+
+    def list(self, skip, limit):
+        return self.collection.find({}).skip(skip).limit(limit)
+
+    def list_after(self, after_id, limit):
+        query = {} if after_id is None else {'_id': {'$gt': ObjectId(after_id)}}
+        return self.collection.find(query).sort('_id', ASCENDING).limit(limit)
+
+    def set_quantity(self, product_id, quantity):
+        oid = _object_id(product_id)
+        if oid is None:
+            return False
+        result = self.collection.update_one({'_id': oid}, {'$set': {'quantity': quantity}})
+        return result.matched_count > 0
+
+    def set_quantities(self, quantities):
+        operations = [
+            UpdateOne({'_id': oid}, {'$set': {'quantity': quantity}})
+            for oid, quantity in ((_object_id(pid), q) for pid, q in quantities.items())
+            if oid is not None
+        ]
+        if operations:
+            self.collection.bulk_write(operations, ordered=False)
+
+    def add_quantity(self, product_id, delta, movement=None):
+        oid = _object_id(product_id)
+        if oid is None:
+            return None
+        # The condition makes the check and the increment one atomic update.
+        query = {'_id': oid, 'quantity': {'$gte': -delta}} if delta < 0 else {'_id': oid}
+        update = {'$inc': {'quantity': delta}}
+        if movement is not None:
+            update = _with_movement(update, movement, delta)
+        product = self.collection.find_one_and_update(query, update, {'quantity': 1}, return_document=ReturnDocument.AFTER)
+        return None if product is None else product['quantity']
+
+    def swap_quantity(self, product_id, quantity, movement=None):
+        oid = _object_id(product_id)
+        if oid is None:
+            return None
+        if movement is None:
+            previous = self.collection.find_one_and_update(
+                {'_id': oid}, {'$set': {'quantity': quantity}}, {'quantity': 1}, return_document=ReturnDocument.BEFORE
+            )
+            return None if previous is None else previous.get('quantity') or 0
+        # The movement needs the difference, so only replace the quantity it was worked out from.
+        while True:
+            current = self.collection.find_one({'_id': oid}, {'quantity': 1})
+            if current is None:
+                return None
+            previous = current.get('quantity') or 0
+            update = {'$set': {'quantity': quantity}}
+            if quantity != previous:
+                update = _with_movement(update, movement, quantity - previous)
+            if self.collection.update_one({'_id': oid, 'quantity': current.get('quantity')}, update).matched_count:
+                return previous
+
+    def set_image(self, product_id, image_hash):
+        oid = _object_id(product_id)
+        if oid is None:
+            return False
+        update = {'$set': {'image_hash': image_hash}} if image_hash else {'$unset': {'image_hash': ''}}
+        return self.collection.update_one({'_id': oid}, update).matched_count > 0
+
+    def iter_skus(self):
+        for p in self.collection.find({}, {'sku': 1, '_id': 0}):
+            if p.get('sku'):
+                yield p['sku']
+
+
+def _location_record(doc):
+    if doc is None:
+        return None
+    return {'sku': doc['sku'], 'location': doc['location'], 'quantity': doc['quantity'],
+            'updated_at': doc['updated_at'].replace(tzinfo=timezone.utc)}
+
+
+class MongoLocationStore(LocationStore):
+    """
+    Records live in `stock_locations`. A write changes two documents, the
+    record and the product total, without a transaction (standalone
+    servers have none), so the record carries the change as `pending`
+    until the total has taken it:
+
+    1. the record is set, its `version` raised and `pending: {version,
+       change}` added, on the condition that it still holds the quantity
+       and version the change was worked out from and has nothing pending,
+       so one change per record is in flight;
+    2. the product applies the change if its total stays non-negative, or
+       refuses it, and either way stores the version under
+       `location_versions.<record id>` so that no version is decided twice;
+    3. the record drops `pending`, and takes the change back if it was refused.
+
+    A stock movement given to `set_quantity` waits in `pending` as well and
+    is recorded by the product update of step 2.
+
+    Every step can be repeated, so a write that stopped half way (a
+    deadline, a lost connection, a killed process) is finished on the next
+    read or write of the record.
+    """
+
+    def __init__(self, db):
+        self.products = db.products
+        self.locations = db.stock_locations
+
+    def ensure_indexes(self):
+        try:
+            self.locations.create_index([('sku', ASCENDING), ('location', ASCENDING)], unique=True)
+            self.locations.create_index([('location', ASCENDING), ('sku', ASCENDING)])
+            return True
+        except PyMongoError as e:
+            print(f"❌ Could not create indexes on stock_locations: {e}")
+            return False
+
+    def get(self, sku, location):
+        doc = self.locations.find_one({'sku': sku, 'location': location})
+        if doc is not None and doc.get('pending'):
+            self._settle(doc)
+            doc = self.locations.find_one({'sku': sku, 'location': location})
+        return _location_record(doc)
+
+    def list_for_sku(self, sku):
+        docs = list(self.locations.find({'sku': sku}).sort('location', ASCENDING))
+        if any(doc.get('pending') for doc in docs):
+            for doc in docs:
+                if doc.get('pending'):
+                    self._settle(doc)
+            docs = list(self.locations.find({'sku': sku}).sort('location', ASCENDING))
+        return [_location_record(d) for d in docs]
+
+    def list_for_location(self, location, skip, limit):
+        cursor = self.locations.find({'location': location}).sort('sku', ASCENDING).skip(skip).limit(limit)
+        return [_location_record(d) for d in cursor]
+
+    def has_records(self, sku):
+        return self.locations.find_one({'sku': sku}, {'_id': 1}) is not None
+
+    def _settle(self, doc):
+        """Finishes the pending change of a record document (steps 2 and 3). Returns True if it was applied."""
+        version, change = doc['pending']['version'], doc['pending']['change']
+        key = f"location_versions.{doc['_id']}"
+        undecided = {'sku': doc['sku'], key: {'$not': {'$gte': version}}}
+        update = {'$inc': {'quantity': change}, '$set': {key: version}}
+        if doc['pending'].get('movement'):
+            update = _with_movement(update, doc['pending']['movement'], change)
+        applied = self.products.update_one(dict(undecided, quantity={'$gte': -change}), update).modified_count > 0
+        if not applied:
+            refused_key = f"location_refused.{doc['_id']}"
+            refused = self.products.update_one(undecided, {'$set': {key: version, refused_key: version}}).modified_count > 0
+            if not refused:
+                # Decided before, by this call repeated or by another caller.
+                product = self.products.find_one({'sku': doc['sku']}, {'location_refused': 1})
+                applied = product is None or (product.get('location_refused') or {}).get(str(doc['_id'])) != version
+
+        undo = {} if applied else {'$inc': {'quantity': -change}}
+        self.locations.update_one({'_id': doc['_id'], 'pending.version': version}, {'$unset': {'pending': ''}, **undo})
+        return applied
+
+    def set_quantity(self, sku, location, quantity, movement=None):
+        while True:
+            doc = self.locations.find_one({'sku': sku, 'location': location})
+            if doc is not None and doc.get('pending'):
+                self._settle(doc)
+                continue
+
+            change = quantity - (doc['quantity'] if doc is not None else 0)
+            now = _naive_utc(datetime.now(timezone.utc))
+            version = (doc.get('version') or 0) + 1 if doc is not None else 1
+            fields = {'quantity': quantity, 'updated_at': now, 'version': version}
+            if change:
+                fields['pending'] = {'version': version, 'change': change}
+                if movement is not None:
+                    fields['pending']['movement'] = dict(movement, _id=ObjectId(), at=_naive_utc(movement['at']))
+            if doc is None:
+                doc = dict(fields, _id=ObjectId(), sku=sku, location=location)
+                try:
+                    self.locations.insert_one(doc)
+                except DuplicateKeyError:
+                    continue
+            else:
+                written = self.locations.update_one(
+                    {'_id': doc['_id'], 'quantity': doc['quantity'], 'version': doc.get('version'), 'pending': None},
+                    {'$set': fields}
+                )
+                if written.matched_count == 0:
+                    continue   # Changed since it was read; work the change out again.
+                doc.update(fields)
+
+            if not change:
+                return 0
+            return change if self._settle(doc) else None
+
+    def transfer(self, sku, source, destination, quantity):
+        now = _naive_utc(datetime.now(timezone.utc))
+        doc = self.locations.find_one({'sku': sku, 'location': source})
+        if doc is not None and doc.get('pending'):
+            self._settle(doc)
+        # Never from a record whose pending change may still be taken back.
+        taken = self.locations.find_one_and_update(
+            {'sku': sku, 'location': source, 'quantity': {'$gte': quantity}, 'pending': None},
+            {'$inc': {'quantity': -quantity}, '$set': {'updated_at': now}}
+        )
+        if taken is None:
+            return False
+        try:
+            self.locations.update_one(
+                {'sku': sku, 'location': destination},
+                {'$inc': {'quantity': quantity}, '$set': {'updated_at': now}}, upsert=True
+            )
+        except PyMongoError:
+            # Give the stock back so that it is never lost in transit.
+            self.locations.update_one({'sku': sku, 'location': source}, {'$inc': {'quantity': quantity}})
+            raise
+        return True
+
+
+def _job(doc):
+    if doc is not None:
+        doc['_id'] = str(doc['_id'])
+    return doc
+
+
+class MongoJobStore(JobStore):
+    def __init__(self, db):
+        self.collection = db.jobs
+
+    def ensure_indexes(self):
+        try:
+            self.collection.create_index([('status', ASCENDING), ('lease_until', ASCENDING)])
+            return True
+        except PyMongoError as e:
+            print(f"❌ Could not create indexes on jobs: {e}")
+            return False
+
+    def insert(self, job):
+        return str(self.collection.insert_one(dict(job)).inserted_id)
+
+    def get(self, job_id):
+        oid = _object_id(job_id)
+        return _job(self.collection.find_one({'_id': oid})) if oid is not None else None
+
+    def update(self, job_id, fields, owner=None):
+        oid = _object_id(job_id)
+        if oid is None:
+            return None
+        query = {'_id': oid} if owner is None else {'_id': oid, 'owner': owner}
+        return _job(self.collection.find_one_and_update(query, {'$set': fields}, return_document=ReturnDocument.AFTER))
+
+    def claim(self, job_id, owner, lease_until, now):
+        oid = _object_id(job_id)
+        if oid is None:
+            return None
+        return _job(self.collection.find_one_and_update(
+            {'_id': oid, 'status': {'$in': list(JOB_ACTIVE)},
+             '$or': [{'owner': None}, {'owner': owner}, {'lease_until': {'$lt': now}}]},
+            {'$set': {'status': 'running', 'owner': owner, 'lease_until': lease_until, 'updated_at': now}},
+            return_document=ReturnDocument.AFTER
+        ))
+
+    def find_resumable(self, now, limit=10):
+        cursor = self.collection.find(
+            {'status': {'$in': list(JOB_ACTIVE)}, 'lease_until': {'$lt': now}}, {'_id': 1}
+        ).sort('lease_until', ASCENDING).limit(limit)
+        return [str(doc['_id']) for doc in cursor]
+
+
+class MongoUserStore(UserStore):
+    def __init__(self, db):
+        self.collection = db.users
+
+    def get_by_username(self, username):
+        return self.collection.find_one({'username': username})
+
+    def get_by_public_id(self, public_id):
+        return self.collection.find_one({'public_id': public_id})
+
+    def insert(self, user):
+        try:
+            self.collection.insert_one(dict(user))
+        except DuplicateKeyError:
+            raise DuplicateError('User already exists!')
+
+
+def _pending_movements(product):
+    """
+    The movements waiting on a product document, with the `seq` and
+    `quantity` each left. Every change of the quantity since the oldest of
+    them recorded one, so they are worked out back from the document's.
+    """
+    seq, quantity = product.get('ledger_seq') or 0, product.get('quantity') or 0
+    movements = []
+    for m in reversed(product.get('ledger_pending') or ()):
+        movements.append(dict(m, seq=seq, quantity=quantity))
+        seq, quantity = seq - 1, quantity - m['delta']
+    return movements[::-1]
+
+
+def _movement(doc):
+    return {'product_id': doc['product_id'], 'seq': doc['seq'], 'delta': doc['delta'], 'quantity': doc['quantity'],
+            'reason': doc.get('reason'), 'user': doc.get('user'), 'at': doc['at'].replace(tzinfo=timezone.utc)}
+
+
+class MongoMovementStore(MovementStore):
+    """
+    Movements live in `stock_movements`, unique on (product_id, seq). The
+    product store records a movement on the product document itself, in
+    the update that changes the quantity; `flush` moves them from there in
+    batches, and reads look at both.
+    """
+
+    deferred = True
+    _PRODUCT_FIELDS = {'quantity': 1, 'ledger_seq': 1, 'ledger_pending': 1}
+
+    def __init__(self, db):
+        self.products = db.products
+        self.movements = db.stock_movements
+
+    def ensure_indexes(self):
+        try:
+            self.movements.create_index([('product_id', ASCENDING), ('seq', ASCENDING)], unique=True)
+            self.movements.create_index([('product_id', ASCENDING), ('at', DESCENDING), ('seq', DESCENDING)])
+            self.products.create_index('ledger_pending._id', sparse=True)
+            return True
+        except PyMongoError as e:
+            print(f"❌ Could not create indexes on stock_movements: {e}")
+            return False
+
+    def flush(self, limit):
+        docs = list(self.products.find({'ledger_pending._id': {'$exists': True}}, self._PRODUCT_FIELDS).limit(limit))
+        batch = [m for doc in docs for m in _pending_movements(doc)]
+        if not batch:
+            return 0
+        try:
+            # Each keeps its _id, so a batch written again after a failure inserts nothing twice.
+            self.movements.insert_many([dict(m, product_id=str(m['product_id'])) for m in batch], ordered=False)
+        except BulkWriteError as e:
+            if any(error['code'] != 11000 for error in e.details['writeErrors']):
+                raise
+        self.products.bulk_write([
+            UpdateOne({'_id': doc['_id']}, {'$pull': {'ledger_pending': {'_id': {'$in': [m['_id'] for m in doc['ledger_pending']]}}}})
+            for doc in docs
+        ], ordered=False)
+        return len(batch)
+
+    def _product(self, product_id):
+        oid = _object_id(product_id)
+        return None if oid is None else self.products.find_one({'_id': oid}, self._PRODUCT_FIELDS)
+
+    def quantity_at(self, product_id, at):
+        # Read the document first: a movement flushed meanwhile is then seen twice, never missed.
+        product = self._product(product_id)
+        if product is None:
+            return None
+        pending = _pending_movements(product)
+        at = _naive_utc(at)
+        until = [m for m in pending if m['at'] <= at]
+        if until:
+            return until[-1]['quantity']
+        seq = product.get('ledger_seq') or 0
+        last = self.movements.find_one(
+            {'product_id': product_id, 'at': {'$lte': at}, 'seq': {'$lte': seq}}, sort=[('at', DESCENDING), ('seq', DESCENDING)]
+        )
+        if last is not None:
+            return last['quantity']
+        first = self.movements.find_one({'product_id': product_id}, sort=[('seq', ASCENDING)]) or (pending[0] if pending else None)
+        return first['quantity'] - first['delta'] if first is not None else product.get('quantity') or 0
+
+    def history(self, product_id, limit):
+        product = self._product(product_id)
+        if product is None:
+            return []
+        seq = product.get('ledger_seq') or 0
+        stored = self.movements.find({'product_id': product_id, 'seq': {'$lte': seq}}).sort('seq', DESCENDING).limit(limit)
+        movements = {m['seq']: m for m in list(stored) + _pending_movements(product)}
+        return [_movement(movements[s]) for s in sorted(movements, reverse=True)[:limit]]
+
+
+class MongoAuditStore(AuditStore):
+    """Events in `audit_log`; a TTL index on `at` lets the server delete them after the retention."""
+
+    def __init__(self, db, retention):
+        self.collection = db.audit_log
+        self.retention = int(retention)
+
+    def ensure_indexes(self):
+        try:
+            try:
+                self.collection.create_index('at', name='at_ttl', expireAfterSeconds=self.retention)
+            except OperationFailure:
+                # The TTL index exists with another retention: change it in place.
+                self.collection.database.command(
+                    'collMod', self.collection.name, index={'name': 'at_ttl', 'expireAfterSeconds': self.retention}
+                )
+            self.collection.create_index([('target', ASCENDING), ('at', DESCENDING)])
+            return True
+        except PyMongoError as e:
+            print(f"❌ Could not create indexes on audit_log: {e}")
+            return False
+
+    def append(self, events):
+        if events:
+            self.collection.insert_many([dict(e, at=_naive_utc(e['at'])) for e in events], ordered=False)
+
+    def recent(self, limit=50, target=None, action=None):
+        query = {}
+        if target is not None:
+            query['target'] = target
+        if action is not None:
+            query['action'] = action
+        cursor = self.collection.find(query, {'_id': 0}).sort([('at', DESCENDING), ('_id', DESCENDING)]).limit(limit)
+        return [dict(e, at=e['at'].replace(tzinfo=timezone.utc)) for e in cursor]
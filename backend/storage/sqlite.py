@@ -0,0 +1,503 @@
+import json
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+from bson import ObjectId
+
+from storage.base import JOB_ACTIVE, AuditStore, DuplicateError, JobStore, LocationStore, MovementStore, ProductStore, UserStore, project
+
+PRODUCT_COLUMNS = ('name', 'type', 'sku', 'image_url', 'description', 'quantity', 'price', 'added_by')
+USER_COLUMNS = ('public_id', 'username', 'password')
+
+# SQLite caps the number of bound parameters per statement.
+_IN_CHUNK = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    id TEXT PRIMARY KEY,
+    name TEXT,
+    type TEXT,
+    sku TEXT NOT NULL UNIQUE,
+    image_url TEXT,
+    description TEXT,
+    quantity INTEGER,
+    price REAL,
+    added_by TEXT,
+    extra TEXT
+);
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY,
+    public_id TEXT NOT NULL UNIQUE,
+    username TEXT NOT NULL UNIQUE,
+    password TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS stock_movements (
+    product_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    delta INTEGER NOT NULL,
+    quantity INTEGER NOT NULL,
+    reason TEXT,
+    user TEXT,
+    at REAL NOT NULL,
+    PRIMARY KEY (product_id, seq)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS stock_movements_product_at ON stock_movements (product_id, at, seq);
+CREATE TABLE IF NOT EXISTS stock_locations (
+    sku TEXT NOT NULL,
+    location TEXT NOT NULL,
+    quantity INTEGER NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (sku, location)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS stock_locations_location_sku ON stock_locations (location, sku);
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    owner TEXT,
+    lease_until REAL,
+    doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_lease ON jobs (status, lease_until);
+CREATE TABLE IF NOT EXISTS audit_log (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    action TEXT NOT NULL,
+    user TEXT,
+    target TEXT,
+    ip TEXT,
+    details TEXT,
+    at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS audit_log_at ON audit_log (at);
+CREATE INDEX IF NOT EXISTS audit_log_target_at ON audit_log (target, at);
+"""
+
+_INSERT_PRODUCT = (
+    f"INSERT INTO products (id, {', '.join(PRODUCT_COLUMNS)}, extra) "
+    f"VALUES ({', '.join('?' * (len(PRODUCT_COLUMNS) + 2))})"
+)
+_SELECT_PRODUCT = f"SELECT id, {', '.join(PRODUCT_COLUMNS)}, extra FROM products"
+_SELECT_USER = f"SELECT id, {', '.join(USER_COLUMNS)} FROM users"
+
+
+class SQLiteDatabase:
+    """
+    One SQLite file shared by the product and user stores. Every thread gets
+    its own connection in WAL mode so that readers never block the writer.
+    Statements use fixed SQL text with bound parameters, so sqlite3 keeps
+    them prepared in its per-connection statement cache.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self.connection() as conn:
+            conn.executescript(_SCHEMA)
+
+    def connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, cached_statements=256)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA busy_timeout=5000')
+            self._local.conn = conn
+        return conn
+
+
+def _product_from_row(row, fields=None):
+    if row is None:
+        return None
+    product = {'_id': row['id']}
+    for column in PRODUCT_COLUMNS:
+        if row[column] is not None:
+            product[column] = row[column]
+    if row['extra']:
+        product.update(json.loads(row['extra']))
+    return project(product, fields)
+
+
+class SQLiteProductStore(ProductStore):
+    def __init__(self, database):
+        self.database = database
+
+    def ensure_indexes(self):
+        return True   # `sku` is declared UNIQUE in the schema.
+
+    def insert(self, product):
+        product_id = str(ObjectId())
+        extra = {k: v for k, v in product.items() if k not in PRODUCT_COLUMNS and k != '_id'}
+        values = [product_id] + [product.get(c) for c in PRODUCT_COLUMNS] + [json.dumps(extra) if extra else None]
+        try:
+            with self.database.connection() as conn:
+                conn.execute(_INSERT_PRODUCT, values)
+        except sqlite3.IntegrityError:
+            raise DuplicateError(f"Product with SKU '{product['sku']}' already exists.")
+        return product_id
+
+    def get(self, product_id, fields=None):
+        row = self.database.connection().execute(f"{_SELECT_PRODUCT} WHERE id = ?", (product_id,)).fetchone()
+        return _product_from_row(row, fields)
+
+    def get_by_sku(self, sku, fields=None):
+        row = self.database.connection().execute(f"{_SELECT_PRODUCT} WHERE sku = ?", (sku,)).fetchone()
+        return _product_from_row(row, fields)
+
+    def _get_in(self, column, values, fields):
+        values = list(set(values))
+        conn = self.database.connection()
+        products = []
+        for start in range(0, len(values), _IN_CHUNK):
+            chunk = values[start:start + _IN_CHUNK]
+            rows = conn.execute(f"{_SELECT_PRODUCT} WHERE {column} IN ({', '.join('?' * len(chunk))})", chunk)
+            products.extend(_product_from_row(row, fields) for row in rows)
+        return products
+
+    def get_many(self, product_ids, fields=None):
+        return self._get_in('id', product_ids, fields)
+
+    def get_many_by_sku(self, skus, fields=None):
+        return self._get_in('sku', skus, fields)
+
+    def list(self, skip, limit):
+        rows = self.database.connection().execute(f"{_SELECT_PRODUCT} ORDER BY rowid LIMIT ? OFFSET ?", (limit, skip))
+        return [_product_from_row(row) for row in rows]
+
+    def list_after(self, after_id, limit):
+        rows = self.database.connection().execute(
+            f"{_SELECT_PRODUCT} WHERE id > ? ORDER BY id LIMIT ?", ('' if after_id is None else after_id, limit)
+        )
+        return [_product_from_row(row) for row in rows]
+
+    def set_quantity(self, product_id, quantity):
+        with self.database.connection() as conn:
+            cursor = conn.execute("UPDATE products SET quantity = ? WHERE id = ?", (quantity, product_id))
+        return cursor.rowcount > 0
+
+    def set_quantities(self, quantities):
+        with self.database.connection() as conn:
+            conn.executemany(
+                "UPDATE products SET quantity = ? WHERE id = ?",
+                [(quantity, product_id) for product_id, quantity in quantities.items()]
+            )
+
+    def add_quantity(self, product_id, delta, movement=None):
+        with self.database.connection() as conn:
+            row = conn.execute(
+                "UPDATE products SET quantity = COALESCE(quantity, 0) + ? "
+                "WHERE id = ? AND COALESCE(quantity, 0) + ? >= 0 RETURNING quantity", (delta, product_id, delta)
+            ).fetchone()
+            if row is not None and movement is not None:
+                _insert_movement(conn, movement, delta, row['quantity'])
+        return None if row is None else row['quantity']
+
+    def swap_quantity(self, product_id, quantity, movement=None):
+        conn = self.database.connection()
+        with conn:
+            # Take the write lock before reading the previous quantity.
+            cursor = conn.execute("UPDATE products SET quantity = quantity WHERE id = ?", (product_id,))
+            if cursor.rowcount == 0:
+                return None
+            row = conn.execute("SELECT quantity FROM products WHERE id = ?", (product_id,)).fetchone()
+            conn.execute("UPDATE products SET quantity = ? WHERE id = ?", (quantity, product_id))
+            previous = row['quantity'] or 0
+            if movement is not None and quantity != previous:
+                _insert_movement(conn, movement, quantity - previous, quantity)
+        return previous
+
+    def set_image(self, product_id, image_hash):
+        # Fields outside the fixed columns live in the `extra` JSON document.
+        with self.database.connection() as conn:
+            if image_hash:
+                cursor = conn.execute(
+                    "UPDATE products SET extra = json_set(COALESCE(extra, '{}'), '$.image_hash', ?) WHERE id = ?",
+                    (image_hash, product_id)
+                )
+            else:
+                cursor = conn.execute(
+                    "UPDATE products SET extra = json_remove(extra, '$.image_hash') WHERE id = ?", (product_id,)
+                )
+        return cursor.rowcount > 0
+
+    def iter_skus(self):
+        for row in self.database.connection().execute("SELECT sku FROM products"):
+            yield row['sku']
+
+
+def _insert_movement(conn, movement, delta, quantity):
+    """Writes a movement in the caller's transaction, which already holds the write lock, after the product's last one."""
+    conn.execute(
+        "INSERT INTO stock_movements (product_id, seq, delta, quantity, reason, user, at) "
+        "SELECT ?, COALESCE(MAX(seq), 0) + 1, ?, ?, ?, ?, ? FROM stock_movements WHERE product_id = ?",
+        (movement['product_id'], delta, quantity, movement.get('reason'), movement.get('user'),
+         movement['at'].timestamp(), movement['product_id'])
+    )
+
+
+def _movement_from_row(row):
+    return dict(row, at=datetime.fromtimestamp(row['at'], timezone.utc))
+
+
+class SQLiteMovementStore(MovementStore):
+    """
+    Movements in the `stock_movements` table of the shared database file,
+    written in the transaction of the quantity change they record.
+    Timestamps are stored as UTC epoch seconds.
+    """
+
+    def __init__(self, database):
+        self.database = database
+
+    def ensure_indexes(self):
+        return True   # Created with the schema.
+
+    def quantity_at(self, product_id, at):
+        conn = self.database.connection()
+        product = conn.execute("SELECT quantity FROM products WHERE id = ?", (product_id,)).fetchone()
+        if product is None:
+            return None
+        row = conn.execute(
+            "SELECT quantity FROM stock_movements WHERE product_id = ? AND at <= ? ORDER BY at DESC, seq DESC LIMIT 1",
+            (product_id, at.timestamp())
+        ).fetchone()
+        if row is not None:
+            return row['quantity']
+        row = conn.execute(
+            "SELECT quantity - delta AS quantity FROM stock_movements WHERE product_id = ? ORDER BY seq LIMIT 1", (product_id,)
+        ).fetchone()
+        return row['quantity'] if row is not None else product['quantity'] or 0
+
+    def history(self, product_id, limit):
+        rows = self.database.connection().execute(
+            "SELECT product_id, seq, delta, quantity, reason, user, at FROM stock_movements "
+            "WHERE product_id = ? ORDER BY seq DESC LIMIT ?", (product_id, limit)
+        )
+        return [_movement_from_row(row) for row in map(dict, rows)]
+
+
+def _location_from_row(row):
+    if row is None:
+        return None
+    return {'sku': row['sku'], 'location': row['location'], 'quantity': row['quantity'],
+            'updated_at': datetime.fromtimestamp(row['updated_at'], timezone.utc)}
+
+
+class SQLiteLocationStore(LocationStore):
+    """Location records in the `stock_locations` table; each write and its product total update share a transaction."""
+
+    def __init__(self, database):
+        self.database = database
+
+    def ensure_indexes(self):
+        return True   # Created with the schema.
+
+    def get(self, sku, location):
+        row = self.database.connection().execute(
+            "SELECT * FROM stock_locations WHERE sku = ? AND location = ?", (sku, location)
+        ).fetchone()
+        return _location_from_row(row)
+
+    def list_for_sku(self, sku):
+        rows = self.database.connection().execute(
+            "SELECT * FROM stock_locations WHERE sku = ? ORDER BY location", (sku,)
+        )
+        return [_location_from_row(row) for row in rows]
+
+    def list_for_location(self, location, skip, limit):
+        rows = self.database.connection().execute(
+            "SELECT * FROM stock_locations WHERE location = ? ORDER BY sku LIMIT ? OFFSET ?", (location, limit, skip)
+        )
+        return [_location_from_row(row) for row in rows]
+
+    def has_records(self, sku):
+        row = self.database.connection().execute("SELECT 1 FROM stock_locations WHERE sku = ? LIMIT 1", (sku,)).fetchone()
+        return row is not None
+
+    def set_quantity(self, sku, location, quantity, movement=None):
+        now = datetime.now(timezone.utc).timestamp()
+        conn = self.database.connection()
+        with conn:
+            # Take the write lock before reading the previous quantity.
+            conn.execute("UPDATE stock_locations SET updated_at = ? WHERE sku = ? AND location = ?", (now, sku, location))
+            row = conn.execute(
+                "SELECT quantity FROM stock_locations WHERE sku = ? AND location = ?", (sku, location)
+            ).fetchone()
+            change = quantity - (row['quantity'] if row else 0)
+            if change:
+                total = conn.execute(
+                    "UPDATE products SET quantity = COALESCE(quantity, 0) + ? "
+                    "WHERE sku = ? AND COALESCE(quantity, 0) + ? >= 0 RETURNING quantity", (change, sku, change)
+                ).fetchone()
+                if total is None and conn.execute("SELECT 1 FROM products WHERE sku = ?", (sku,)).fetchone():
+                    conn.rollback()
+                    return None
+                if total is not None and movement is not None:
+                    _insert_movement(conn, movement, change, total['quantity'])
+            conn.execute(
+                "INSERT INTO stock_locations (sku, location, quantity, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (sku, location) DO UPDATE SET quantity = excluded.quantity, updated_at = excluded.updated_at",
+                (sku, location, quantity, now)
+            )
+        return change
+
+    def transfer(self, sku, source, destination, quantity):
+        now = datetime.now(timezone.utc).timestamp()
+        conn = self.database.connection()
+        with conn:
+            cursor = conn.execute(
+                "UPDATE stock_locations SET quantity = quantity - ?, updated_at = ? "
+                "WHERE sku = ? AND location = ? AND quantity >= ?", (quantity, now, sku, source, quantity)
+            )
+            if cursor.rowcount == 0:
+                return False
+            conn.execute(
+                "INSERT INTO stock_locations (sku, location, quantity, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (sku, location) DO UPDATE SET quantity = quantity + excluded.quantity, "
+                "updated_at = excluded.updated_at",
+                (sku, destination, quantity, now)
+            )
+        return True
+
+
+def _job_from_row(row):
+    if row is None:
+        return None
+    return dict(json.loads(row['doc']), _id=row['id'], status=row['status'], owner=row['owner'],
+                lease_until=row['lease_until'])
+
+
+class SQLiteJobStore(JobStore):
+    """Jobs with their queryable fields in columns and everything else in a JSON `doc`."""
+
+    def __init__(self, database):
+        self.database = database
+
+    def ensure_indexes(self):
+        return True   # Created with the schema.
+
+    def _write(self, conn, job):
+        doc = {k: v for k, v in job.items() if k not in ('_id', 'status', 'owner', 'lease_until')}
+        conn.execute(
+            "INSERT OR REPLACE INTO jobs (id, status, owner, lease_until, doc) VALUES (?, ?, ?, ?, ?)",
+            (job['_id'], job['status'], job.get('owner'), job.get('lease_until'), json.dumps(doc))
+        )
+
+    def insert(self, job):
+        job = dict(job, _id=str(ObjectId()))
+        with self.database.connection() as conn:
+            self._write(conn, job)
+        return job['_id']
+
+    def get(self, job_id):
+        return _job_from_row(self.database.connection().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def _modify(self, job_id, change):
+        conn = self.database.connection()
+        with conn:
+            # Take the write lock before reading, so the read-modify-write is atomic.
+            conn.execute("UPDATE jobs SET id = id WHERE id = ?", (job_id,))
+            job = _job_from_row(conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+            if job is None or not change(job):
+                return None
+            self._write(conn, job)
+        return job
+
+    def update(self, job_id, fields, owner=None):
+        def change(job):
+            if owner is not None and job.get('owner') != owner:
+                return False
+            job.update(fields)
+            return True
+        return self._modify(job_id, change)
+
+    def claim(self, job_id, owner, lease_until, now):
+        def change(job):
+            if job['status'] not in JOB_ACTIVE:
+                return False
+            if job.get('owner') not in (None, owner) and (job.get('lease_until') or 0) >= now:
+                return False
+            job.update(status='running', owner=owner, lease_until=lease_until, updated_at=now)
+            return True
+        return self._modify(job_id, change)
+
+    def find_resumable(self, now, limit=10):
+        rows = self.database.connection().execute(
+            f"SELECT id FROM jobs WHERE status IN ({', '.join('?' * len(JOB_ACTIVE))}) AND COALESCE(lease_until, 0) < ? "
+            "ORDER BY lease_until LIMIT ?", (*JOB_ACTIVE, now, limit)
+        )
+        return [row['id'] for row in rows]
+
+
+class SQLiteAuditStore(AuditStore):
+    """
+    Events in the `audit_log` table. SQLite has no TTL index, so every
+    append also deletes the events older than the retention (a range
+    delete on the `at` index).
+    """
+
+    def __init__(self, database, retention):
+        self.database = database
+        self.retention = retention
+
+    def ensure_indexes(self):
+        return True   # Created with the schema.
+
+    def append(self, events):
+        with self.database.connection() as conn:
+            conn.executemany(
+                "INSERT INTO audit_log (action, user, target, ip, details, at) VALUES (?, ?, ?, ?, ?, ?)",
+                [(e['action'], e.get('user'), e.get('target'), e.get('ip'), json.dumps(e.get('details') or {}),
+                  e['at'].timestamp()) for e in events]
+            )
+            conn.execute("DELETE FROM audit_log WHERE at < ?", (datetime.now(timezone.utc).timestamp() - self.retention,))
+
+    def recent(self, limit=50, target=None, action=None):
+        clauses, params = [], []
+        if target is not None:
+            clauses.append("target = ?")
+            params.append(target)
+        if action is not None:
+            clauses.append("action = ?")
+            params.append(action)
+        where = f"WHERE {' AND '.join(clauses)} " if clauses else ""
+        rows = self.database.connection().execute(
+            f"SELECT action, user, target, ip, details, at FROM audit_log {where}ORDER BY at DESC, id DESC LIMIT ?",
+            (*params, limit)
+        )
+        return [
+            dict(row, details=json.loads(row['details']), at=datetime.fromtimestamp(row['at'], timezone.utc))
+            for row in map(dict, rows)
+        ]
+
+
+def _user_from_row(row):
+    if row is None:
+        return None
+    user = {'_id': row['id']}
+    for column in USER_COLUMNS:
+        user[column] = row[column]
+    return user
+
+
+class SQLiteUserStore(UserStore):
+    def __init__(self, database):
+        self.database = database
+
+    def get_by_username(self, username):
+        row = self.database.connection().execute(f"{_SELECT_USER} WHERE username = ?", (username,)).fetchone()
+        return _user_from_row(row)
+
+    def get_by_public_id(self, public_id):
+        row = self.database.connection().execute(f"{_SELECT_USER} WHERE public_id = ?", (public_id,)).fetchone()
+        return _user_from_row(row)
+
+    def insert(self, user):
+        try:
+            with self.database.connection() as conn:
+                conn.execute(
+                    "INSERT INTO users (id, public_id, username, password) VALUES (?, ?, ?, ?)",
+                    (str(ObjectId()), user['public_id'], user['username'], user['password'])
+                )
+        except sqlite3.IntegrityError:
+            raise DuplicateError('User already exists!')
@@ -0,0 +1,81 @@
+import sys
+import time
+from app import create_app, load_config, warmup
+
+# --- Test Fixtures ---
+
+CONFIG = {'TESTING': True, 'SECRET_KEY': 'test-secret-key-for-jwt-of-32-bytes!', 'STORAGE_BACKEND': 'memory',
+          'SWAGGER_UI': False, 'CORS_ENABLED': False}
+
+
+def _wait_ready(app, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not app.extensions['warmup']['ready'] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return app.extensions['warmup']['ready']
+
+# --- Factory Tests ---
+
+def test_config_overrides_environment(monkeypatch):
+    monkeypatch.setenv('LOOKUP_MAX_ITEMS', '7')
+    monkeypatch.setenv('SKU_CACHE_SIZE', '9')
+    app = create_app(dict(CONFIG, WARMUP='off', SKU_CACHE_SIZE=3))
+
+    assert app.config['LOOKUP_MAX_ITEMS'] == 7
+    assert app.product_cache.max_size == 3
+    assert app.test_client().get('/health').get_json()['database'] == 'embedded'
+
+
+def test_apps_are_independent():
+    first = create_app(dict(CONFIG, WARMUP='off'))
+    second = create_app(dict(CONFIG, WARMUP='off'))
+    assert first.product_store is not second.product_store
+
+
+def test_swagger_ui_is_off_by_default(monkeypatch):
+    monkeypatch.delenv('SWAGGER_UI', raising=False)
+    assert load_config()['SWAGGER_UI'] is False
+
+
+def test_optional_subsystems_are_not_loaded(monkeypatch):
+    monkeypatch.delitem(sys.modules, 'flasgger', raising=False)
+    app = create_app(dict(CONFIG, WARMUP='off'))
+
+    assert 'flasgger' not in sys.modules
+    assert 'Access-Control-Allow-Origin' not in app.test_client().get('/health').headers
+
+# --- Warmup and readiness Tests ---
+
+def test_sync_warmup_primes_caches():
+    app = create_app(dict(CONFIG, WARMUP='sync'))
+
+    assert app.extensions['warmup']['ready']
+    assert app.sku_index._sorted is not None
+    res = app.test_client().get('/ready')
+    assert res.status_code == 200
+    assert res.get_json()['status'] == 'ready'
+
+
+def test_background_warmup_reports_readiness():
+    app = create_app(dict(CONFIG, WARMUP='background'))
+
+    assert _wait_ready(app)
+    assert app.test_client().get('/ready').status_code == 200
+
+
+def test_failed_warmup_is_not_ready_and_retried(monkeypatch):
+    app = create_app(dict(CONFIG, WARMUP='off'))
+    app.extensions['warmup']['ready'] = False
+    monkeypatch.setattr(app.sku_index, '_ensure_loaded', lambda: (_ for _ in ()).throw(RuntimeError('db down')))
+
+    assert warmup(app) is False
+    res = app.test_client().get('/ready')
+    assert res.status_code == 503
+    assert res.headers['Retry-After'] == '1'
+    assert res.get_json()['error'] == 'db down'
+
+    while app.extensions['warmup']['running']:   # the attempt /ready just started
+        time.sleep(0.01)
+    monkeypatch.undo()
+    app.test_client().get('/ready')
+    assert _wait_ready(app)
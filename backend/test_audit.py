@@ -0,0 +1,111 @@
+import threading
+import time
+import pytest
+from audit import AuditLog
+from storage import MemoryAuditStore, MongoAuditStore
+
+# --- Test Fixtures ---
+
+class BlockingStore(MemoryAuditStore):
+    """An audit store whose writes wait until `release` is set (or fail once when asked to)."""
+
+    def __init__(self):
+        super().__init__(retention=3600)
+        self.release = threading.Event()
+        self.fail_next = False
+
+    def append(self, events):
+        if self.fail_next:
+            self.fail_next = False
+            raise RuntimeError('database unavailable')
+        self.release.wait(5)
+        super().append(events)
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+# --- Audit Log Tests ---
+
+def test_events_are_written_in_batches():
+    store = MemoryAuditStore(retention=3600)
+    log = AuditLog(store, flush_interval=60, batch_size=3)
+
+    log.record('product.create', user='u1', target='p1')
+    log.record('product.create', user='u1', target='p2')
+    time.sleep(0.05)
+    assert store.recent() == []
+
+    log.record('product.create', user='u1', target='p3')   # batch full: wakes the writer
+    assert _wait_for(lambda: len(store.recent()) == 3)
+    assert log.stats['flushes'] == 1 and log.stats['written'] == 3
+    log.close()
+
+
+def test_close_writes_queued_events():
+    store = MemoryAuditStore(retention=3600)
+    log = AuditLog(store, flush_interval=60, batch_size=100)
+    log.record('auth.login', user='u1', target='alice')
+    log.close()
+
+    assert [e['action'] for e in store.recent()] == ['auth.login']
+    assert log.record('auth.login') is False
+
+
+def test_full_queue_applies_back_pressure_then_drops():
+    store = BlockingStore()
+    log = AuditLog(store, flush_interval=60, batch_size=1, max_queue=2, block_timeout=0.01)
+
+    log.record('a')                                      # taken by the writer, which blocks
+    assert _wait_for(lambda: log.stats['recorded'] == 1 and not log._queue)
+    assert log.record('b') and log.record('c')
+    assert log.record('d') is False
+    assert log.stats['overflows'] == 1 and log.stats['dropped'] == 1
+
+    store.release.set()
+    log.close()
+    assert [e['action'] for e in store.recent()] == ['c', 'b', 'a']
+
+
+def test_failed_write_is_retried():
+    store = BlockingStore()
+    store.release.set()
+    store.fail_next = True
+    log = AuditLog(store, flush_interval=60, batch_size=100)
+    log.record('a')
+
+    with pytest.raises(RuntimeError):
+        log.flush()
+    assert log.flush() == 1
+    assert log.stats['errors'] == 1 and log.stats['dropped'] == 0
+    log.close()
+
+
+def test_mongo_retention_uses_a_ttl_index(db):
+    store = MongoAuditStore(db, retention=86400)
+    assert store.ensure_indexes()
+    assert db.audit_log.index_information()['at_ttl']['expireAfterSeconds'] == 86400
+
+# --- Endpoint Tests ---
+
+def test_auth_and_product_events_are_audited(app, client, headers, user):
+    client.post('/register', json={'username': 'bob', 'password': 'secret'})
+    client.post('/login', json={'username': 'bob', 'password': 'secret'})
+    client.post('/login', json={'username': 'bob', 'password': 'wrong'})
+    product = {'name': 'Lamp', 'type': 'Light', 'sku': 'LAMP-1', 'quantity': 1, 'price': 9.5}
+    product_id = client.post('/products', json=product, headers=headers).get_json()['product_id']
+    client.put(f'/products/{product_id}/quantity', json={'quantity': 4}, headers=headers)
+
+    app.audit_log.flush()
+    events = app.audit_log.store.recent()
+    assert [e['action'] for e in events] == [
+        'product.quantity', 'product.create', 'auth.login_failed', 'auth.login', 'auth.register'
+    ]
+    assert events[0]['user'] == user['public_id'] and events[0]['target'] == product_id
+    assert events[0]['details'] == {'quantity': 4}
+    assert events[2]['details'] == {'reason': 'wrong password'}
+    assert 'secret' not in str(events)
+    assert app.audit_log.store.recent(target=product_id, action='product.create')[0]['details'] == {'sku': 'LAMP-1'}
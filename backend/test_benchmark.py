@@ -0,0 +1,66 @@
+import json
+from benchmark import compare, main, percentile, summarize
+
+
+def test_percentile_nearest_rank():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 95) == 95
+    assert percentile(values, 99) == 99
+    assert percentile([], 50) == 0.0
+
+
+def test_summarize_counts_errors_and_throughput():
+    samples = [(0.001, 200)] * 9 + [(0.010, 500)]
+    result = summarize(samples, wall_time=0.5)
+
+    assert result['requests'] == 10
+    assert result['errors'] == 1
+    assert result['statuses'] == {'200': 9, '500': 1}
+    assert result['throughput_rps'] == 20.0
+    assert result['p50_ms'] == 1.0 and result['max_ms'] == 10.0
+
+
+def test_compare_flags_regressions():
+    base = {'scenarios': {'export': {'p50_ms': 10, 'p95_ms': 20, 'p99_ms': 30, 'throughput_rps': 100, 'errors': 0}}}
+    same = {'scenarios': {'export': dict(base['scenarios']['export'])}}
+    slower = {'scenarios': {'export': {'p50_ms': 10, 'p95_ms': 30, 'p99_ms': 30, 'throughput_rps': 50, 'errors': 2}}}
+
+    assert compare(same, base, 0.1) == []
+    assert len(compare(slower, base, 0.1)) == 3
+
+
+def test_in_process_run_saves_results(tmp_path):
+    out = tmp_path / 'run.json'
+    args = ['--scenarios', 'deep_pagination,quantity_updates,bulk_import,batch_lookup,export',
+            '--requests', '10', '--seed', '20', '--concurrency', '2', '--save', str(out)]
+
+    assert main(args) == 0
+    results = json.loads(out.read_text())
+    assert set(results['scenarios']) == {'deep_pagination', 'quantity_updates', 'bulk_import', 'batch_lookup', 'export'}
+    assert all(r['errors'] == 0 for r in results['scenarios'].values())
+
+    assert main(args + ['--compare', str(out), '--threshold', '100']) == 0
+
+
+def test_startup_benchmark(tmp_path):
+    out = tmp_path / 'startup.json'
+    assert main(['--startup', '1', '--warmup', 'off', '--save', str(out)]) == 0
+
+    startup = json.loads(out.read_text())['startup']
+    assert startup['runs'] == 1 and startup['errors'] == 0
+    assert startup['total_ms']['p50'] >= startup['import_ms']['p50'] > 0
+    assert compare({'startup': startup}, {'startup': startup}, 0.1) == []
+
+
+def test_validation_benchmark(tmp_path):
+    out = tmp_path / 'validation.json'
+    assert main(['--validation', '1000', '--save', str(out)]) == 0
+
+    validation = json.loads(out.read_text())['validation']
+    assert validation['rows'] == 1000 and validation['invalid'] == 100
+    assert validation['rows_per_s'] > 0
+    slower = dict(validation, rows_per_s=validation['rows_per_s'] / 2)
+    assert compare({'validation': slower}, {'validation': validation}, 0.1) == [
+        f"validation.rows_per_s: {validation['rows_per_s']} -> {slower['rows_per_s']}"
+    ]
@@ -0,0 +1,71 @@
+import pytest
+from app import create_app
+
+# --- Test Fixtures ---
+
+ORIGIN = 'https://shop.example.com'
+CONFIG = {'TESTING': True, 'SECRET_KEY': 'test-secret-key-for-jwt-of-32-bytes!', 'STORAGE_BACKEND': 'memory',
+          'SWAGGER_UI': False, 'WARMUP': 'off', 'CORS_ORIGINS': [ORIGIN, 'http://localhost:3000'], 'CORS_MAX_AGE': 600}
+
+
+@pytest.fixture
+def client():
+    return create_app(dict(CONFIG, RATE_LIMITS={'auth': (0.001, 1), 'write': (0.001, 1), 'read': (0.001, 1)})).test_client()
+
+
+def _preflight(client, path, origin=ORIGIN, method='GET'):
+    return client.options(path, headers={
+        'Origin': origin,
+        'Access-Control-Request-Method': method,
+        'Access-Control-Request-Headers': 'authorization,content-type',
+    })
+
+# --- Preflight Tests ---
+
+def test_preflight_is_cached(client):
+    res = _preflight(client, '/products', method='POST')
+
+    assert res.status_code == 204 and res.data == b''
+    assert res.headers['Access-Control-Allow-Origin'] == ORIGIN
+    assert res.headers['Access-Control-Allow-Credentials'] == 'true'
+    assert res.headers['Access-Control-Allow-Headers'] == 'Content-Type, Authorization'
+    assert 'PUT' in res.headers['Access-Control-Allow-Methods']
+    assert res.headers['Access-Control-Max-Age'] == '600'
+    assert res.headers['Vary'] == 'Origin'
+
+
+def test_preflight_skips_routing_rate_limits_auth_and_storage(client):
+    client.application.product_store.list = None   # any storage call would fail
+    for _ in range(5):   # far beyond the rate limit burst of 1
+        assert _preflight(client, '/products').status_code == 204
+        assert _preflight(client, '/login', method='POST').status_code == 204
+    assert _preflight(client, '/no-such-route').status_code == 204
+
+
+def test_preflight_from_unknown_origin_is_not_allowed(client):
+    res = _preflight(client, '/products', origin='https://evil.example.com')
+    assert res.status_code == 204
+    assert 'Access-Control-Allow-Origin' not in res.headers
+    assert 'Access-Control-Max-Age' not in res.headers
+
+
+def test_simple_requests_carry_cors_headers(client):
+    res = client.get('/health', headers={'Origin': ORIGIN})
+    assert res.headers['Access-Control-Allow-Origin'] == ORIGIN
+    assert res.headers['Access-Control-Allow-Credentials'] == 'true'
+    assert 'Access-Control-Allow-Origin' not in client.get('/health', headers={'Origin': 'https://evil.example.com'}).headers
+
+    # A plain OPTIONS request is not a preflight and still gets Flask's Allow header.
+    assert 'GET' in client.options('/health').headers['Allow']
+
+
+def test_origins_are_read_from_the_environment(monkeypatch):
+    monkeypatch.setenv('CORS_ORIGINS', 'https://a.example.com/, https://b.example.com')
+    monkeypatch.setenv('CORS_MAX_AGE', '120')
+    config = {k: v for k, v in CONFIG.items() if not k.startswith('CORS_')}
+    client = create_app(config).test_client()
+
+    res = _preflight(client, '/products', origin='https://b.example.com')
+    assert res.headers['Access-Control-Allow-Origin'] == 'https://b.example.com'
+    assert res.headers['Access-Control-Max-Age'] == '120'
+    assert 'Access-Control-Allow-Origin' not in _preflight(client, '/products').headers
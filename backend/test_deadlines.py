@@ -0,0 +1,78 @@
+import pytest
+from pymongo._csot import get_timeout
+from pymongo.errors import ExecutionTimeout, ServerSelectionTimeoutError
+from utils import deadline_stats
+
+# --- Test Fixtures ---
+
+@pytest.fixture
+def app(app):
+    app.config['REQUEST_DEADLINE'] = 2.0
+    app.config['REQUEST_DEADLINES'] = {'products.get_products': 0.5}
+    return app
+
+
+def _patch_products(app, monkeypatch, method, error):
+    collection_class = type(app.db.products)
+    original = getattr(collection_class, method)
+
+    def failing(self, *args, **kwargs):
+        if self.name == 'products':
+            raise error
+        return original(self, *args, **kwargs)
+
+    monkeypatch.setattr(collection_class, method, failing)
+
+# --- Tests ---
+
+def test_route_runs_under_configured_deadline(app, client, headers, monkeypatch):
+    """The per-route override is the remaining pymongo timeout inside the view."""
+    seen = []
+    collection_class = type(app.db.products)
+    original = collection_class.find
+
+    def find(self, *args, **kwargs):
+        seen.append(get_timeout())
+        return original(self, *args, **kwargs)
+
+    monkeypatch.setattr(collection_class, 'find', find)
+    assert client.get('/products', headers=headers).status_code == 200
+    assert seen and seen[0] == 0.5
+
+
+def test_execution_timeout_returns_504_and_counts(app, client, headers, monkeypatch):
+    before = deadline_stats['exceeded']
+    _patch_products(app, monkeypatch, 'find', ExecutionTimeout('operation exceeded time limit', 50))
+
+    res = client.get('/products', headers=headers)
+    assert res.status_code == 504
+    assert deadline_stats['exceeded'] == before + 1
+    assert deadline_stats['by_endpoint']['products.get_products']['exceeded'] >= 1
+
+
+def test_server_selection_timeout_returns_503(app, client, headers, monkeypatch):
+    before = deadline_stats['unavailable']
+    _patch_products(app, monkeypatch, 'find_one', ServerSelectionTimeoutError('no servers'))
+
+    res = client.get('/products/sku/ANY', headers=headers)
+    assert res.status_code == 503
+    assert res.headers['Retry-After'] == '1'
+    assert deadline_stats['unavailable'] == before + 1
+
+
+def test_login_is_covered_by_deadline(app, client, monkeypatch):
+    collection_class = type(app.db.users)
+
+    def find_one(self, *args, **kwargs):
+        raise ExecutionTimeout('operation exceeded time limit', 50)
+
+    monkeypatch.setattr(collection_class, 'find_one', find_one)
+
+    res = client.post('/login', json={'username': 'slow', 'password': 'password123'})
+    assert res.status_code == 504
+
+
+def test_no_deadline_when_unconfigured(app, client, headers):
+    app.config['REQUEST_DEADLINE'] = None
+    app.config['REQUEST_DEADLINES'] = {}
+    assert client.get('/products', headers=headers).status_code == 200
@@ -0,0 +1,138 @@
+import hashlib
+import io
+import os
+import pytest
+from werkzeug.test import EnvironBuilder
+
+Image = pytest.importorskip('PIL.Image')
+
+# --- Test Fixtures ---
+
+@pytest.fixture
+def app_config(app_config, tmp_path):
+    return dict(app_config, IMAGES_DIR=str(tmp_path), IMAGE_THUMBNAIL_SIZES=(64, 256), IMAGE_MAX_BYTES=200_000)
+
+
+def _png(width=400, height=300, color=(200, 30, 30, 255)):
+    out = io.BytesIO()
+    Image.new('RGBA', (width, height), color).save(out, 'PNG')
+    return out.getvalue()
+
+
+@pytest.fixture
+def uploaded(client, headers):
+    data = _png()
+    res = client.post('/images', data={'file': (io.BytesIO(data), 'red.png')}, headers=headers)
+    assert res.status_code == 201
+    return data, res.get_json()
+
+# --- Upload Tests ---
+
+def test_upload_is_content_addressed(client, headers, uploaded, tmp_path):
+    data, body = uploaded
+    digest = hashlib.sha256(data).hexdigest()
+    assert body['image_hash'] == digest and body['content_type'] == 'image/png'
+    assert body['image_url'] == f'/images/{digest}'
+    assert body['thumbnail_url'] == f'/images/{digest}/thumb/64'
+
+    # The same bytes again, sent as the raw body, are not stored twice.
+    res = client.post('/images', data=data, content_type='image/png', headers=headers)
+    assert res.status_code == 200 and res.get_json()['image_hash'] == digest
+    assert os.listdir(tmp_path / 'originals' / digest[:2]) == [digest]
+    assert (tmp_path / 'thumbs' / '256' / digest[:2] / f'{digest}.webp').exists()
+
+
+def test_upload_rejects_bad_input(client, headers, tmp_path):
+    assert client.post('/images', data=b'', content_type='image/png', headers=headers).status_code == 400
+    assert client.post('/images', data=b'%PDF-1.7 ...', content_type='application/pdf', headers=headers).status_code == 415
+    assert client.post('/images', data=b'\x89PNG\r\n\x1a\n' + b'x' * 100, content_type='image/png', headers=headers).status_code == 400
+    noise = Image.effect_noise((600, 600), 100).convert('RGB')
+    out = io.BytesIO()
+    noise.save(out, 'PNG')
+    assert client.post('/images', data=out.getvalue(), content_type='image/png', headers=headers).status_code == 413
+    assert client.post('/images', data=_png()).status_code == 401
+    assert not [p for p in tmp_path.rglob('*') if p.is_file()]
+
+
+def test_upload_over_the_pixel_cap_is_rejected_before_decoding(app, client, headers, tmp_path, monkeypatch):
+    app.image_store.max_pixels = 100 * 100
+    data = _png(101, 100)
+    monkeypatch.setattr(Image.Image, 'load', lambda self: pytest.fail('decoded an image over the cap'))
+    res = client.post('/images', data=data, content_type='image/png', headers=headers)
+    assert res.status_code == 400 and 'pixels' in res.get_json()['message']
+    assert not [p for p in tmp_path.rglob('*') if p.is_file()]
+
+    monkeypatch.undo()
+    assert client.post('/images', data=_png(100, 100), content_type='image/png', headers=headers).status_code == 201
+
+
+def test_upload_without_content_length_is_read_only_up_to_the_limit(client, headers):
+    chunked = dict(headers, **{'Transfer-Encoding': 'chunked'})
+    raw = io.BytesIO(_png() + b'x' * 1_000_000)
+    res = client.post('/images', input_stream=raw, content_type='image/png', headers=chunked,
+                      environ_overrides={'wsgi.input_terminated': True})
+    assert res.status_code == 413
+    assert raw.tell() < 300_000
+
+    form = EnvironBuilder(method='POST', data={'file': (io.BytesIO(_png() + b'x' * 1_000_000), 'big.png')}).get_environ()
+    body = io.BytesIO(form['wsgi.input'].read())
+    res = client.post('/images', input_stream=body, content_type=form['CONTENT_TYPE'], headers=chunked,
+                      environ_overrides={'wsgi.input_terminated': True})
+    assert res.status_code == 413
+    assert body.tell() < 300_000
+
+# --- Serving Tests ---
+
+def test_original_is_served_with_immutable_caching_and_ranges(client, uploaded):
+    data, body = uploaded
+    res = client.get(body['image_url'])
+    assert res.status_code == 200 and res.data == data
+    assert res.mimetype == 'image/png'
+    assert res.headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+
+    etag = res.headers['ETag']
+    assert client.get(body['image_url'], headers={'If-None-Match': etag}).status_code == 304
+
+    res = client.get(body['image_url'], headers={'Range': 'bytes=0-9'})
+    assert res.status_code == 206 and res.data == data[:10]
+    assert res.headers['Content-Range'] == f'bytes 0-9/{len(data)}'
+
+
+def test_thumbnails(client, uploaded):
+    _, body = uploaded
+    res = client.get(body['thumbnail_url'])
+    assert res.status_code == 200 and res.mimetype == 'image/webp'
+    assert res.headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+    with Image.open(io.BytesIO(res.data)) as thumb:
+        assert thumb.size == (64, 48)
+
+    assert client.get(f"/images/{body['image_hash']}/thumb/100").status_code == 404
+    assert client.get(f"/images/{'0' * 64}").status_code == 404
+    assert client.get('/images/..%2F..%2Fapp.py').status_code == 404
+
+# --- Product Tests ---
+
+def test_product_references_uploaded_image(client, headers, uploaded):
+    _, body = uploaded
+    product = {'name': 'Chair', 'type': 'Furniture', 'sku': 'CHAIR-1', 'quantity': 1, 'price': 40.0}
+
+    res = client.post('/products', json=dict(product, image_hash='f' * 64), headers=headers)
+    assert res.get_json()['errors'] == {'image_hash': 'is not an uploaded image'}
+    product_id = client.post('/products', json=dict(product, image_hash=body['image_hash']), headers=headers).get_json()['product_id']
+
+    listed = client.get('/products', headers=headers).get_json()[0]
+    assert listed['image_hash'] == body['image_hash']
+    assert listed['thumbnail_url'] == body['thumbnail_url'] and listed['image_url'] == body['image_url']
+
+    lookup = client.get(f'/products?ids={product_id}&fields=image_url', headers=headers).get_json()
+    assert lookup['results'][0]['product']['thumbnail_url'] == body['thumbnail_url']
+
+    res = client.put(f'/products/{product_id}/image', json={'image_hash': None}, headers=headers)
+    assert res.status_code == 200
+    listed = client.get('/products', headers=headers).get_json()[0]
+    assert listed['image_hash'] is None and listed['thumbnail_url'] is None
+
+    res = client.put(f'/products/{product_id}/image', json={'image_hash': body['image_hash']}, headers=headers)
+    assert res.get_json()['thumbnail_url'] == body['thumbnail_url']
+    assert client.put(f'/products/{product_id}/image', json={'image_hash': 'nope'}, headers=headers).status_code == 400
+    assert client.put(f"/products/{'a' * 24}/image", json={'image_hash': None}, headers=headers).status_code == 404
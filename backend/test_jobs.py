@@ -0,0 +1,201 @@
+import json
+import os
+import time
+import pytest
+import threading
+from job_runner import JOB_HANDLERS, JobRunner
+
+# --- Test Fixtures ---
+
+@pytest.fixture
+def app_config(app_config, tmp_path):
+    return dict(app_config, JOB_CHUNK_SIZE=2, JOBS_DIR=str(tmp_path))
+
+
+@pytest.fixture(autouse=True)
+def close_runner(app):
+    yield
+    app.job_runner.close()
+
+
+def _rows(n, prefix='IMP'):
+    return [{'name': f'Item {i}', 'type': 'Part', 'sku': f'{prefix}-{i}', 'quantity': i, 'price': 1.5} for i in range(n)]
+
+
+def _wait(client, headers, job_id, timeout=5):
+    deadline = time.time() + timeout
+    while True:
+        job = client.get(f'/jobs/{job_id}', headers=headers).get_json()
+        if job['status'] not in ('queued', 'running') or time.time() > deadline:
+            return job
+        time.sleep(0.01)
+
+# --- Job Tests ---
+
+def test_import_job(client, headers):
+    rows = _rows(5) + [{'name': 'Broken', 'type': 'Part', 'sku': 'BAD', 'quantity': -1, 'price': 1}] + _rows(1)
+    res = client.post('/jobs', json={'kind': 'import', 'products': rows}, headers=headers)
+    assert res.status_code == 202
+    assert res.headers['Location'] == f"/jobs/{res.get_json()['id']}"
+
+    job = _wait(client, headers, res.get_json()['id'])
+    assert job['status'] == 'succeeded'
+    assert job['progress'] == {'done': 7, 'total': 7} and job['offset'] == 7
+    assert job['result']['imported'] == 5
+    assert job['result']['skipped'] == 1
+    assert job['result']['errors'] == [{'row': 5, 'errors': {'quantity': 'must be at least 0'}}]
+    assert len(client.get('/products?per_page=50', headers=headers).get_json()) == 5
+
+
+def test_export_job_and_download(app, client, headers):
+    for row in _rows(5, 'EXP'):
+        app.product_store.insert(row)
+
+    job_id = client.post('/jobs', json={'kind': 'export'}, headers=headers).get_json()['id']
+    job = _wait(client, headers, job_id)
+    assert job['status'] == 'succeeded' and job['result']['exported'] == 5
+
+    res = client.get(f'/jobs/{job_id}/download', headers=headers)
+    assert res.status_code == 200
+    assert [json.loads(line)['sku'] for line in res.data.decode().splitlines()] == [f'EXP-{i}' for i in range(5)]
+
+
+def test_cancel_job(app, client, headers):
+    app.job_runner.pause = 0.2   # slow enough to cancel between chunks
+    job_id = client.post('/jobs', json={'kind': 'import', 'products': _rows(10)}, headers=headers).get_json()['id']
+
+    assert client.post(f'/jobs/{job_id}/cancel', headers=headers).status_code == 202
+    job = _wait(client, headers, job_id)
+    assert job['status'] == 'cancelled'
+    assert job['offset'] < 10
+    assert client.post(f'/jobs/{job_id}/cancel', headers=headers).status_code == 409
+
+
+def test_interrupted_job_resumes_from_offset(app, client, headers):
+    # A runner in another process claimed the import, checkpointed 4 rows, then died.
+    dead = JobRunner(app.job_runner.store, app)
+    rows = _rows(7)
+    store = app.job_runner.store
+    job_id = store.insert({
+        'kind': 'import', 'params': {'products': rows}, 'status': 'running', 'offset': 4,
+        'state': {'imported': 4, 'skipped': 0, 'failed': 0, 'errors': []},
+        'owner': dead.owner, 'lease_until': time.time() - 1, 'cancel_requested': False,
+        'created_by': None, 'created_at': time.time(), 'updated_at': time.time(),
+    })
+    for row in rows[:4]:
+        app.product_store.insert(row)
+
+    assert app.job_runner.resume() == 1
+    deadline = time.time() + 5
+    while store.get(job_id)['status'] == 'running' and time.time() < deadline:
+        time.sleep(0.01)
+
+    finished = store.get(job_id)
+    assert finished['status'] == 'succeeded'
+    assert finished['result']['imported'] == 7 and finished['result']['skipped'] == 0
+    assert finished['owner'] is None
+    assert app.job_runner.stats['resumed'] == 1
+
+
+def test_rows_run_again_after_a_resume_are_not_skipped(app):
+    # The runner died after inserting rows 2 and 3 but before checkpointing them.
+    app.product_store.ensure_indexes()
+    dead = JobRunner(app.job_runner.store, app)
+    rows = _rows(7)
+    store = app.job_runner.store
+    job_id = store.insert({
+        'kind': 'import', 'params': {'products': rows}, 'status': 'running', 'offset': 2,
+        'state': {'imported': 2, 'skipped': 0, 'failed': 0, 'errors': []},
+        'owner': dead.owner, 'lease_until': time.time() - 1, 'cancel_requested': False,
+        'created_by': None, 'created_at': time.time(), 'updated_at': time.time(),
+    })
+    for i, row in enumerate(rows[:4]):
+        app.product_store.insert(dict(row, import_source=f'{job_id}:{i}'))
+    app.product_store.insert(rows[5])   # added by someone else: a real duplicate
+
+    assert app.job_runner.resume() == 1
+    deadline = time.time() + 5
+    while store.get(job_id)['status'] == 'running' and time.time() < deadline:
+        time.sleep(0.01)
+
+    result = store.get(job_id)['result']
+    assert (result['imported'], result['skipped']) == (6, 1)
+
+
+def test_interrupted_export_resumes_after_the_last_id(app):
+    ids = [app.product_store.insert(row) for row in _rows(5, 'EXP')]
+    # The runner died after checkpointing two lines and writing a third.
+    dead = JobRunner(app.job_runner.store, app)
+    store = app.job_runner.store
+    with open(os.path.join(app.config['JOBS_DIR'], 'checkpointed.jsonl'), 'w', encoding='utf-8') as f:
+        f.write('{"sku": "EXP-0"}\n{"sku": "EXP-1"}\n')
+        size = f.tell()
+        f.write('{"sku": "EXP-2"}\n')
+    job_id = store.insert({
+        'kind': 'export', 'params': {}, 'status': 'running', 'offset': 2, 'state': {'bytes': size, 'last_id': ids[1]},
+        'owner': dead.owner, 'lease_until': time.time() - 1, 'cancel_requested': False,
+        'created_by': None, 'created_at': time.time(), 'updated_at': time.time(),
+    })
+    path = os.path.join(app.config['JOBS_DIR'], f'{job_id}.jsonl')
+    os.rename(os.path.join(app.config['JOBS_DIR'], 'checkpointed.jsonl'), path)
+
+    assert app.job_runner.resume() == 1
+    deadline = time.time() + 5
+    while store.get(job_id)['status'] == 'running' and time.time() < deadline:
+        time.sleep(0.01)
+
+    assert store.get(job_id)['result']['exported'] == 5
+    with open(path, encoding='utf-8') as f:
+        assert [json.loads(line)['sku'] for line in f] == [f'EXP-{i}' for i in range(5)]
+
+
+def test_full_queue_is_rejected(app, client, headers):
+    app.job_runner.close()
+    app.job_runner = JobRunner(app.job_runner.store, app, max_workers=1, max_queued=1, pause=0.2)
+    running = client.post('/jobs', json={'kind': 'import', 'products': _rows(6)}, headers=headers).get_json()['id']
+    while client.get(f'/jobs/{running}', headers=headers).get_json()['status'] == 'queued':
+        time.sleep(0.01)
+    assert client.post('/jobs', json={'kind': 'export'}, headers=headers).status_code == 202   # waits
+
+    res = client.post('/jobs', json={'kind': 'export'}, headers=headers)
+    assert res.status_code == 503
+    assert res.headers['Retry-After'] == '5'
+    assert app.job_runner.stats['rejected'] == 1
+
+
+
+def test_job_with_expired_lease_runs_once(app, monkeypatch):
+    runs, lock = {}, threading.Lock()
+
+    def slow(ctx, params):
+        with lock:
+            runs.setdefault(ctx.job_id, []).append(threading.current_thread().name)
+        time.sleep(0.4)   # no checkpoint: the lease runs out while the job waits and runs
+        return {}
+
+    monkeypatch.setitem(JOB_HANDLERS, 'slow', slow)
+    app.job_runner.close()
+    app.job_runner = runner = JobRunner(app.job_runner.store, app, max_workers=2, lease=0.1)
+    ids = [runner.submit('slow', {})['_id'] for _ in range(3)]
+
+    deadline = time.time() + 5
+    while time.time() < deadline and any(runner.store.get(i)['status'] != 'succeeded' for i in ids):
+        time.sleep(0.02)
+    time.sleep(0.3)
+    assert all(runner.store.get(i)['status'] == 'succeeded' for i in ids)
+    assert {job_id: len(names) for job_id, names in runs.items()} == {i: 1 for i in ids}
+
+
+def test_job_validation_and_ownership(client, headers, app):
+    assert client.post('/jobs', json={'kind': 'reindex'}, headers=headers).status_code == 400
+    res = client.post('/jobs', json=[1], headers=headers)
+    assert res.status_code == 400 and res.get_json()['errors'] == {'body': 'must be a JSON object'}
+    assert client.post('/jobs', json={'kind': 'import', 'products': 'x'}, headers=headers).status_code == 400
+    assert client.post('/jobs', json={'kind': 'import', 'products': []}, headers=headers).status_code == 400
+    app.config['JOB_MAX_ROWS'] = 3
+    assert client.post('/jobs', json={'kind': 'import', 'products': _rows(4)}, headers=headers).status_code == 400
+
+    other = app.job_runner.store.insert({'kind': 'export', 'status': 'succeeded', 'created_by': 'someone-else'})
+    assert client.get(f'/jobs/{other}', headers=headers).status_code == 404
+    assert client.get('/jobs/64b7f0c2a1b2c3d4e5f60718', headers=headers).status_code == 404
+    assert client.get('/jobs/64b7f0c2a1b2c3d4e5f60718').status_code == 401
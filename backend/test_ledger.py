@@ -0,0 +1,201 @@
+import time
+from datetime import datetime, timedelta, timezone
+import pytest
+from ledger import StockLedger
+from storage import MongoMovementStore, MongoProductStore
+
+# --- Test Fixtures ---
+
+@pytest.fixture
+def products(db):
+    return MongoProductStore(db)
+
+
+@pytest.fixture
+def ledger(db, products):
+    """A ledger with a long interval so that only explicit calls flush."""
+    led = StockLedger(MongoMovementStore(db), products, flush_interval=60)
+    yield led
+    led.close()
+
+
+@pytest.fixture
+def app_config(app_config):
+    return dict(app_config, STOCK_LEDGER=True, LEDGER_FLUSH_INTERVAL=60)
+
+
+@pytest.fixture
+def product_id(app):
+    return app.product_store.insert({'name': 'Pallet', 'type': 'Device', 'sku': 'PAL-1', 'quantity': 10, 'price': 1.0})
+
+# --- Ledger Tests ---
+
+def test_movements_are_written_with_the_quantity(ledger, products, db):
+    a = products.insert({'name': 'A', 'sku': 'A', 'quantity': 10})
+
+    assert ledger.adjust(a, -4, 'sale', 'u1')[0] == 6
+    assert ledger.adjust(a, 2, 'return', 'u1')[0] == 8
+    assert products.get(a)['quantity'] == 8
+    assert len(db.products.find_one()['ledger_pending']) == 2   # in the same update as the quantity
+    assert db.stock_movements.count_documents({}) == 0
+    assert [(m['delta'], m['quantity']) for m in ledger.history(a)] == [(2, 8), (-4, 6)]
+
+    assert ledger.flush() == 2
+    assert db.stock_movements.count_documents({}) == 2
+    assert db.products.find_one()['ledger_pending'] == []
+    assert ledger.quantity(a) == 8
+    assert [(m['seq'], m['delta'], m['reason'], m['user']) for m in ledger.history(a)] == [
+        (2, 2, 'return', 'u1'), (1, -4, 'sale', 'u1')
+    ]
+
+
+def test_adjust_never_goes_negative(ledger, products):
+    a = products.insert({'name': 'A', 'sku': 'A', 'quantity': 3})
+
+    assert ledger.adjust(a, -4) is None
+    assert ledger.adjust(a, -3)[0] == 0
+    assert ledger.adjust('64b7f0c2a1b2c3d4e5f60718', 1) is None
+    assert products.get(a)['quantity'] == 0
+    assert [m['delta'] for m in ledger.history(a)] == [-3]
+
+
+def test_set_quantity_records_the_replaced_difference(ledger, products):
+    a = products.insert({'name': 'A', 'sku': 'A', 'quantity': 10})
+
+    assert ledger.set_quantity(a, 4, 'count') == 10
+    assert ledger.set_quantity(a, 4, 'count') == 4      # unchanged: no movement
+    assert ledger.set_quantity('64b7f0c2a1b2c3d4e5f60718', 1) is None
+    assert products.get(a)['quantity'] == 4
+    assert [m['delta'] for m in ledger.history(a)] == [-6]
+
+
+def test_writers_in_two_processes_do_not_lose_updates(db, products):
+    """Two ledgers on one database (two workers) each act on the stored value, not on a stale read."""
+    a = products.insert({'name': 'A', 'sku': 'A', 'quantity': 10})
+    first = StockLedger(MongoMovementStore(db), MongoProductStore(db), flush_interval=60)
+    second = StockLedger(MongoMovementStore(db), MongoProductStore(db), flush_interval=60)
+
+    first.set_quantity(a, 5)
+    second.set_quantity(a, 7)
+    assert products.get(a)['quantity'] == 7
+
+    assert first.adjust(a, -6)[0] == 1
+    assert second.adjust(a, -6) is None     # only 1 left, although neither has flushed
+    first.close()
+    second.close()
+    # Ordered by the per-product sequence, not by the time each ledger flushed.
+    assert [(m['seq'], m['delta']) for m in MongoMovementStore(db).history(a, 10)] == [(3, -6), (2, 2), (1, -5)]
+
+
+def test_movements_survive_a_process_that_never_flushed(db, products):
+    a = products.insert({'name': 'A', 'sku': 'A', 'quantity': 0})
+    crashed = StockLedger(MongoMovementStore(db), MongoProductStore(db), flush_interval=60)
+    crashed.adjust(a, 5, 'delivery')    # and the process is killed: no flush, no close
+
+    other = StockLedger(MongoMovementStore(db), products, flush_interval=60)
+    assert [m['delta'] for m in other.history(a)] == [5]
+    assert other.flush() == 1
+    assert db.stock_movements.find_one()['reason'] == 'delivery'
+    other.close()
+
+
+def test_background_thread_moves_movements(db, products):
+    led = StockLedger(MongoMovementStore(db), products, flush_interval=0.01, batch_size=1)
+    a = products.insert({'name': 'A', 'sku': 'A', 'quantity': 0})
+    b = products.insert({'name': 'B', 'sku': 'B', 'quantity': 0})
+    for product_id in (a, a, b):
+        led.adjust(product_id, 1)
+    deadline = time.monotonic() + 2
+    while db.stock_movements.count_documents({}) < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert db.stock_movements.count_documents({}) == 3
+    led.close()
+
+
+def test_failed_flush_loses_and_repeats_nothing(db, products, monkeypatch):
+    store = MongoMovementStore(db)
+    led = StockLedger(store, products, flush_interval=60)
+    a = products.insert({'name': 'A', 'sku': 'A', 'quantity': 0})
+    assert led.adjust(a, 4)[0] == 4
+
+    # The movements are written, but taking them off the product fails.
+    monkeypatch.setattr(store.products, 'bulk_write', lambda *args, **kwargs: (_ for _ in ()).throw(RuntimeError('down')))
+    with pytest.raises(RuntimeError):
+        led.flush()
+    assert led.stats['errors'] == 1 and [m['delta'] for m in led.history(a)] == [4]
+
+    monkeypatch.undo()
+    assert led.flush() == 1
+    assert db.stock_movements.count_documents({}) == 1
+    assert [m['delta'] for m in led.history(a)] == [4]
+    led.close()
+
+
+def test_quantity_as_of(ledger, products):
+    a = products.insert({'name': 'A', 'sku': 'A', 'quantity': 10})
+    ledger.adjust(a, 5)
+    ledger.flush()
+    time.sleep(0.002)   # Mongo keeps milliseconds
+    between = datetime.now(timezone.utc)
+    time.sleep(0.002)
+    ledger.adjust(a, -7)
+
+    assert ledger.quantity(a) == 8
+    assert ledger.quantity(a, as_of=between) == 15
+    assert ledger.quantity(a, as_of=between - timedelta(hours=1)) == 10
+    assert ledger.quantity(a, as_of=between + timedelta(hours=1)) == 8
+    assert [m['delta'] for m in ledger.history(a)] == [-7, 5]
+    ledger.flush()
+    assert ledger.quantity(a, as_of=between) == 15
+
+# --- Endpoint Tests ---
+
+def test_record_movement_endpoint(client, headers, product_id):
+    res = client.post(f'/products/{product_id}/movements', json={'delta': -4, 'reason': 'sale'}, headers=headers)
+    assert res.status_code == 201
+    assert res.get_json()['quantity'] == 6
+
+    res = client.get(f'/products/{product_id}/movements', headers=headers)
+    body = res.get_json()
+    assert body['quantity'] == 6
+    assert [(m['delta'], m['reason']) for m in body['movements']] == [(-4, 'sale')]
+
+    products = client.get('/products', headers=headers).get_json()
+    assert products[0]['quantity'] == 6
+
+
+def test_movement_validation(client, headers, product_id):
+    url = f'/products/{product_id}/movements'
+    assert client.post(url, json={'delta': 0}, headers=headers).status_code == 400
+    assert client.post(url, json={'delta': 'x'}, headers=headers).status_code == 400
+    assert client.post(url, json={'delta': -11}, headers=headers).status_code == 400
+    for body in ([1], 'x', None, {'delta': 1, 'reason': 5}):
+        assert client.post(url, json=body, headers=headers).status_code == 400
+    res = client.post(url, json={'delta': 0}, headers=headers)
+    assert res.get_json()['errors'] == {'delta': 'must not be 0'}
+    assert client.post('/products/64b7f0c2a1b2c3d4e5f60718/movements', json={'delta': 1}, headers=headers).status_code == 404
+
+
+def test_put_quantity_records_the_difference(app, client, headers, product_id):
+    res = client.put(f'/products/{product_id}/quantity', json={'quantity': 25}, headers=headers)
+    assert res.status_code == 200 and res.get_json()['quantity'] == 25
+
+    assert app.product_store.get(product_id)['quantity'] == 25
+    history = client.get(f'/products/{product_id}/movements', headers=headers).get_json()['movements']
+    assert [(m['delta'], m['reason']) for m in history] == [(15, 'adjustment')]
+
+
+def test_quantity_as_of_endpoint(client, headers, product_id):
+    before = datetime.now(timezone.utc).isoformat()
+    client.post(f'/products/{product_id}/movements', json={'delta': 5}, headers=headers)
+
+    assert client.get(f'/products/{product_id}/quantity', headers=headers).get_json()['quantity'] == 15
+    res = client.get(f'/products/{product_id}/quantity', query_string={'as_of': before}, headers=headers)
+    assert res.get_json()['quantity'] == 10
+    res = client.get(f'/products/{product_id}/quantity?as_of=yesterday', headers=headers)
+    assert res.status_code == 400
+
+
+def test_ledger_endpoints_disabled_by_default(app, client, headers, product_id):
+    del app.stock_ledger
+    assert client.get(f'/products/{product_id}/quantity', headers=headers).status_code == 404
@@ -0,0 +1,134 @@
+import time
+from datetime import datetime, timezone
+import pytest
+from ledger import StockLedger
+from storage import create_movement_store
+from write_behind import QuantityWriteBuffer
+
+# --- Test Fixtures ---
+
+@pytest.fixture
+def product(app):
+    product = {'name': 'Crate', 'type': 'Storage', 'sku': 'CRATE-1', 'quantity': 0, 'price': 3.0}
+    product['_id'] = app.product_store.insert(product)
+    return product
+
+# --- Location Tests ---
+
+def test_set_and_read_location_stock(client, headers, product):
+    res = client.put('/locations/WH-1/CRATE-1', json={'quantity': 12}, headers=headers)
+    assert res.status_code == 200
+    assert res.get_json()['change'] == 12
+    client.put('/locations/WH-2/CRATE-1', json={'quantity': 3}, headers=headers)
+
+    res = client.get('/locations/WH-1/CRATE-1', headers=headers)
+    assert res.status_code == 200 and res.get_json()['quantity'] == 12
+    assert client.get('/locations/WH-9/CRATE-1', headers=headers).status_code == 404
+
+    breakdown = client.get('/locations?sku=CRATE-1', headers=headers).get_json()
+    assert breakdown['quantity'] == 15
+    assert [(r['location'], r['quantity']) for r in breakdown['locations']] == [('WH-1', 12), ('WH-2', 3)]
+
+    # The product list reads the rolled-up total directly.
+    listed = client.get('/products', headers=headers).get_json()
+    assert listed[0]['quantity'] == 15
+
+
+def test_location_listing(client, headers, product):
+    client.put('/locations/WH-1/CRATE-1', json={'quantity': 1}, headers=headers)
+
+    res = client.get('/locations/WH-1?page=1&per_page=5', headers=headers)
+    assert [r['sku'] for r in res.get_json()] == ['CRATE-1']
+    assert client.get('/locations/WH-2', headers=headers).get_json() == []
+    assert client.get('/locations/WH-1?page=0', headers=headers).status_code == 400
+
+
+def test_location_write_validation(client, headers, product):
+    assert client.put('/locations/WH-1/CRATE-1', json={'quantity': -1}, headers=headers).status_code == 400
+    assert client.put('/locations/WH-1/CRATE-1', json={}, headers=headers).status_code == 400
+    assert client.put(f"/locations/{'X' * 65}/CRATE-1", json={'quantity': 1}, headers=headers).status_code == 400
+    assert client.put('/locations/WH-1/UNKNOWN', json={'quantity': 1}, headers=headers).status_code == 404
+    res = client.put('/locations/WH-1/CRATE-1', json=[1], headers=headers)
+    assert res.status_code == 400
+    assert res.get_json()['errors'] == {'body': 'must be a JSON object'}
+
+
+def test_transfer(client, headers, product):
+    client.put('/locations/WH-1/CRATE-1', json={'quantity': 10}, headers=headers)
+    transfer = {'sku': 'CRATE-1', 'from': 'WH-1', 'to': 'WH-2', 'quantity': 4}
+
+    res = client.post('/locations/transfer', json=transfer, headers=headers)
+    assert res.status_code == 200
+    body = res.get_json()
+    assert body['from']['quantity'] == 6 and body['to']['quantity'] == 4
+
+    res = client.post('/locations/transfer', json=dict(transfer, quantity=7), headers=headers)
+    assert res.status_code == 409
+    assert client.post('/locations/transfer', json=dict(transfer, to='WH-1'), headers=headers).status_code == 400
+    assert client.get('/locations?sku=CRATE-1', headers=headers).get_json()['quantity'] == 10
+
+
+def test_transfer_validation(client, headers, product):
+    client.put('/locations/WH-1/CRATE-1', json={'quantity': 10}, headers=headers)
+    transfer = {'sku': 'CRATE-1', 'from': 'WH-1', 'to': 'WH-2', 'quantity': 4}
+
+    res = client.post('/locations/transfer', json=dict(transfer, sku={'$ne': None}), headers=headers)
+    assert res.status_code == 400
+    assert res.get_json()['errors'] == {'sku': 'must be a string'}
+    assert client.post('/locations/transfer', json=[transfer], headers=headers).status_code == 400
+    assert client.post('/locations/transfer', json=dict(transfer, quantity=0), headers=headers).status_code == 400
+    assert client.post('/locations/transfer', json=dict(transfer, to=' '), headers=headers).status_code == 400
+    assert client.post('/locations/transfer', json={'sku': 'CRATE-1'}, headers=headers).status_code == 400
+    assert client.get('/locations/WH-1/CRATE-1', headers=headers).get_json()['quantity'] == 10
+
+
+
+def test_total_of_a_located_sku_cannot_be_overwritten(client, headers, product):
+    client.put('/locations/WH-1/CRATE-1', json={'quantity': 100}, headers=headers)
+    res = client.put(f"/products/{product['_id']}/quantity", json={'quantity': 5}, headers=headers)
+    assert res.status_code == 409
+    assert 'per location' in res.get_json()['message']
+
+    assert client.put('/locations/WH-1/CRATE-1', json={'quantity': 0}, headers=headers).status_code == 200
+    assert client.get('/locations?sku=CRATE-1', headers=headers).get_json()['quantity'] == 0
+
+def test_location_write_invalidates_sku_cache(client, headers, product):
+    assert client.get('/products/sku/CRATE-1', headers=headers).get_json()['quantity'] == 0
+    client.put('/locations/WH-1/CRATE-1', json={'quantity': 8}, headers=headers)
+    assert client.get('/products/sku/CRATE-1', headers=headers).get_json()['quantity'] == 8
+
+
+def test_locations_require_token(client):
+    assert client.get('/locations?sku=CRATE-1').status_code == 401
+
+
+def test_location_write_is_a_ledger_movement(app, client, headers, product):
+    app.stock_ledger = StockLedger(create_movement_store(app.product_store), app.product_store, flush_interval=60)
+    try:
+        client.put(f"/products/{product['_id']}/quantity", json={'quantity': 2}, headers=headers)
+        time.sleep(0.002)   # Mongo keeps milliseconds
+        before = datetime.now(timezone.utc).isoformat()
+        time.sleep(0.002)
+        client.put('/locations/WH-1/CRATE-1', json={'quantity': 100}, headers=headers)
+
+        url = f"/products/{product['_id']}/quantity"
+        assert client.get(url, headers=headers).get_json()['quantity'] == 102
+        assert client.get(url, query_string={'as_of': before}, headers=headers).get_json()['quantity'] == 2
+        history = client.get(f"/products/{product['_id']}/movements", headers=headers).get_json()['movements']
+        assert [(m['delta'], m['reason']) for m in history] == [(100, 'location:WH-1'), (2, 'adjustment')]
+    finally:
+        app.stock_ledger.close()
+
+
+def test_location_write_is_kept_by_buffered_quantity(app, client, headers, product):
+    """A buffered PUT flushed after a location write does not overwrite the location's change."""
+    app.quantity_buffer = QuantityWriteBuffer(app.product_store, flush_interval=60, max_pending=100, max_staleness=60)
+    try:
+        client.put(f"/products/{product['_id']}/quantity", json={'quantity': 5}, headers=headers)
+        client.put('/locations/WH-1/CRATE-1', json={'quantity': 7}, headers=headers)
+        assert client.get('/products', headers=headers).get_json()[0]['quantity'] == 12
+
+        app.quantity_buffer.flush()
+        assert app.product_store.get(product['_id'])['quantity'] == 12
+    finally:
+        app.quantity_buffer.close()
@@ -0,0 +1,76 @@
+import pytest
+
+# --- Test Fixtures ---
+
+@pytest.fixture
+def app(app):
+    """The test app seeded with three products and a small lookup limit."""
+    app.config['LOOKUP_MAX_ITEMS'] = 5
+    app.db.products.insert_many([
+        {'name': f'Item {i}', 'type': 'Test', 'sku': f'SKU-{i}', 'image_url': '',
+         'description': '', 'quantity': i, 'price': 1.0 * i}
+        for i in range(3)
+    ])
+    return app
+
+
+def _ids(app):
+    return {p['sku']: str(p['_id']) for p in app.db.products.find()}
+
+# --- Tests ---
+
+def test_lookup_by_id_keeps_request_order_and_reports_misses(app, client, headers):
+    ids = _ids(app)
+    requested = [ids['SKU-2'], '64b7f0c2a1b2c3d4e5f60718', 'not-an-id', ids['SKU-0']]
+
+    res = client.post('/products/lookup', json={'ids': requested}, headers=headers)
+    data = res.get_json()
+
+    assert res.status_code == 200
+    assert [r['id'] for r in data['results']] == requested
+    assert [r['found'] for r in data['results']] == [True, False, False, True]
+    assert data['results'][0]['product']['sku'] == 'SKU-2'
+    assert data['found'] == 2 and data['missing'] == 2
+
+
+def test_lookup_by_sku_with_projection(client, headers):
+    res = client.post('/products/lookup', json={'skus': ['SKU-1', 'NOPE'], 'fields': ['quantity']}, headers=headers)
+    data = res.get_json()
+
+    assert res.status_code == 200
+    assert data['results'][0]['product'] == {'id': data['results'][0]['product']['id'], 'quantity': 1}
+    assert data['results'][1] == {'sku': 'NOPE', 'found': False}
+
+
+def test_get_products_with_skus_query(client, headers):
+    res = client.get('/products?skus=SKU-0,SKU-1&fields=name,sku', headers=headers)
+    data = res.get_json()
+
+    assert res.status_code == 200
+    assert [r['product']['name'] for r in data['results']] == ['Item 0', 'Item 1']
+
+
+def test_get_products_with_ids_query(app, client, headers):
+    ids = _ids(app)
+    res = client.get(f"/products?ids={ids['SKU-1']}", headers=headers)
+
+    assert res.status_code == 200
+    assert res.get_json()['results'][0]['product']['quantity'] == 1
+
+
+def test_lookup_rejects_too_many_items(client, headers):
+    res = client.post('/products/lookup', json={'skus': [f'S{i}' for i in range(6)]}, headers=headers)
+    assert res.status_code == 400
+
+
+def test_lookup_rejects_empty_list_and_unknown_fields(client, headers):
+    assert client.post('/products/lookup', json={'ids': []}, headers=headers).status_code == 400
+    assert client.post('/products/lookup', json={}, headers=headers).status_code == 400
+    assert client.post('/products/lookup', json=[1], headers=headers).status_code == 400
+    assert client.post('/products/lookup', json='SKU-0', headers=headers).status_code == 400
+    res = client.post('/products/lookup', json={'skus': ['SKU-0'], 'fields': ['password']}, headers=headers)
+    assert res.status_code == 400
+
+
+def test_lookup_requires_token(client):
+    assert client.post('/products/lookup', json={'skus': ['SKU-0']}).status_code == 401
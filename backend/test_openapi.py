@@ -0,0 +1,61 @@
+import gzip
+import json
+import pytest
+from openapi import SpecAsset
+
+# --- Test Fixtures ---
+
+@pytest.fixture
+def app_config(app_config, tmp_path):
+    return dict(app_config, OPENAPI_SPEC_DIR=str(tmp_path))
+
+# --- Spec serving Tests ---
+
+def test_spec_documents_every_route(client):
+    res = client.get('/apispec_1.json')
+    assert res.status_code == 200
+    assert res.headers['Cache-Control'] == 'public, max-age=3600'
+    paths = json.loads(res.data)['paths']
+    assert {'/login', '/register', '/products', '/products/{id}/quantity'} <= set(paths)
+
+
+def test_spec_is_generated_once(app, client, monkeypatch):
+    client.get('/apispec_1.json')
+    monkeypatch.setattr('openapi.generate_spec', lambda app: pytest.fail('spec regenerated'))
+    assert client.get('/apispec_1.json').status_code == 200
+
+
+def test_conditional_and_gzip_responses(client):
+    plain = client.get('/apispec_1.json')
+    etag = plain.headers['ETag']
+
+    assert client.get('/apispec_1.json', headers={'If-None-Match': etag}).status_code == 304
+
+    res = client.get('/apispec_1.json', headers={'Accept-Encoding': 'gzip'})
+    assert res.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(res.data) == plain.data
+    assert 'Accept-Encoding' in res.headers['Vary']
+
+
+def test_versioned_spec_is_immutable(client):
+    etag = client.get('/apispec_1.json').headers['ETag'].strip('"')
+
+    res = client.get(f'/apispec/{etag}.json')
+    assert res.status_code == 200
+    assert 'immutable' in res.headers['Cache-Control']
+    assert client.get('/apispec/stale.json').status_code == 404
+
+
+def test_exported_spec_is_served_as_is(app, tmp_path):
+    SpecAsset(b'{"swagger":"2.0","paths":{}}').save(str(tmp_path))
+    assert (tmp_path / 'apispec.json.gz').exists()
+
+    res = app.test_client().get('/apispec_1.json')
+    assert res.get_json() == {'swagger': '2.0', 'paths': {}}
+
+
+def test_export_cli(app, tmp_path):
+    out = tmp_path / 'export'
+    result = app.test_cli_runner().invoke(args=['export-openapi', str(out)])
+    assert result.exit_code == 0, result.output
+    assert '/products' in json.loads((out / 'apispec.json').read_text())['paths']
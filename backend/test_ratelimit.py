@@ -0,0 +1,112 @@
+import threading
+import pytest
+from app import create_app
+from ratelimit import RateLimiter, InMemoryBucketStore, parse_limits
+
+# --- Test Fixtures ---
+
+@pytest.fixture
+def app(app):
+    app.rate_limiter = RateLimiter(
+        {'auth': (0.001, 3), 'write': (0.001, 2), 'read': (1000, 1000)},
+        {'auth': 1, 'write': 1, 'read': 1}
+    )
+    return app
+
+# --- Token bucket Tests ---
+
+def test_bucket_allows_burst_then_reports_wait():
+    store = InMemoryBucketStore()
+    assert store.consume('k', rate=1, burst=2) == 0
+    assert store.consume('k', rate=1, burst=2) == 0
+    assert 0 < store.consume('k', rate=1, burst=2) <= 1
+
+
+def test_bucket_prunes_refilled_keys():
+    store = InMemoryBucketStore(max_keys=2)
+    for key in ('a', 'b', 'c'):
+        store.consume(key, rate=1000000, burst=1)
+    assert len(store._buckets) < 3
+
+
+def test_parse_limits():
+    assert parse_limits('auth=5/10, write=20/40', lambda v: tuple(float(x) for x in v.split('/'))) == {
+        'auth': (5.0, 10.0), 'write': (20.0, 40.0)
+    }
+    assert parse_limits('auth=4,bogus', int) == {'auth': 4}
+
+# --- Endpoint Tests ---
+
+def test_login_storm_gets_429_with_retry_after(client):
+    statuses = [client.post('/login', json={'username': 'x', 'password': 'y'}).status_code for _ in range(4)]
+    assert statuses[:3] == [401, 401, 401]
+    assert statuses[3] == 429
+
+    res = client.post('/login', json={'username': 'x', 'password': 'y'})
+    assert int(res.headers['Retry-After']) >= 1
+
+
+def test_limits_are_per_route_class(app, client):
+    """Exhausting the auth bucket does not block reads."""
+    for _ in range(4):
+        client.post('/login', json={'username': 'x', 'password': 'y'})
+    assert client.get('/products').status_code == 401   # reached the route, no token
+
+
+def test_write_bucket_limits_authenticated_client(client, headers):
+    product = {'name': 'P', 'type': 'T', 'quantity': 1, 'price': 1.0}
+
+    assert client.post('/products', json=dict(product, sku='A'), headers=headers).status_code == 201
+    assert client.post('/products', json=dict(product, sku='B'), headers=headers).status_code == 201
+    res = client.post('/products', json=dict(product, sku='C'), headers=headers)
+    assert res.status_code == 429
+
+
+def test_concurrency_limit_sheds_with_503(app):
+    """While a read holds the only read slot, another read is shed; writes are unaffected."""
+    limiter = app.rate_limiter
+    assert limiter.acquire('read')
+    try:
+        client = app.test_client()
+        res = client.get('/products')
+        assert res.status_code == 503
+        assert res.headers['Retry-After'] == '1'
+        assert limiter.stats['shed'] == 1
+        assert client.post('/products', json={}).status_code == 401
+    finally:
+        limiter.release('read')
+
+    assert app.test_client().get('/products').status_code == 401
+
+
+def test_slots_are_released():
+    limiter = RateLimiter({}, {'read': 1})
+    results = []
+
+    def worker():
+        results.append(limiter.acquire('read'))
+        limiter.release('read')
+
+    threads = [threading.Thread(target=worker) for _ in range(5)]
+    for t in threads:
+        t.start()
+        t.join()
+    assert all(results)
+
+
+@pytest.mark.parametrize('proxies, separate', [(1, True), (0, False)])
+def test_clients_behind_trusted_proxy_get_their_own_buckets(proxies, separate):
+    """With TRUSTED_PROXIES the client address comes from X-Forwarded-For; without, the header is ignored."""
+    client = create_app({
+        'TESTING': True, 'SECRET_KEY': 'test-secret-key-for-jwt-of-32-bytes!', 'STORAGE_BACKEND': 'memory',
+        'SWAGGER_UI': False, 'WARMUP': 'off', 'TRUSTED_PROXIES': proxies,
+        'RATE_LIMITS': {'auth': (0.001, 1), 'write': (0.001, 1), 'read': (0.001, 1)},
+    }).test_client()
+
+    def login(ip):
+        return client.post('/login', json={'username': 'x', 'password': 'y'},
+                           headers={'X-Forwarded-For': ip}).status_code
+
+    assert login('203.0.113.1') == 401
+    assert login('203.0.113.1') == 429
+    assert login('203.0.113.2') == (401 if separate else 429)
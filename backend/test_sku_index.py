@@ -0,0 +1,151 @@
+import threading
+import time
+import pytest
+from mongomock import MongoClient
+from sku_index import SkuIndex, HotProductCache
+from storage import MongoProductStore
+
+# --- Test Fixtures ---
+
+@pytest.fixture
+def app(app):
+    """The test app with the SKU index and hot lookup cache enabled."""
+    app.db.products.insert_one({'name': 'Existing', 'type': 'Test', 'sku': 'OLD-1', 'quantity': 1, 'price': 1.0})
+    app.sku_index = SkuIndex(app.product_store)
+    app.product_cache = HotProductCache(max_size=2, ttl=60)
+    return app
+
+
+def _product(sku):
+    return {'name': 'New', 'type': 'Test', 'sku': sku, 'quantity': 5, 'price': 2.5}
+
+# --- SkuIndex Tests ---
+
+def test_index_loads_lazily_and_tracks_inserts():
+    coll = MongoClient().testdb.products
+    coll.insert_one({'sku': 'A'})
+    index = SkuIndex(MongoProductStore(coll.database))
+
+    assert index.might_contain('A')
+    assert not index.might_contain('B')
+    index.add('B')
+    assert index.might_contain('B')
+    assert 'sku_1' in coll.index_information()
+
+
+def test_added_skus_are_merged_into_the_sorted_array():
+    coll = MongoClient().testdb.products
+    coll.insert_many([{'sku': f'S{i}'} for i in range(10)])
+    index = SkuIndex(MongoProductStore(coll.database), merge_size=4)
+
+    for i in range(10, 15):
+        index.add(f'S{i}')
+    index.add('S3')   # already known: not counted twice
+    assert len(index) == 15 and len(index._recent) == 1
+    assert index._sorted.itemsize == 8 and list(index._sorted) == sorted(index._sorted)
+    assert all(index.might_contain(f'S{i}') for i in range(15))
+    assert not index.might_contain('S15')
+
+
+def _eventually(check, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not check() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return check()
+
+
+def test_index_reloads_after_ttl():
+    coll = MongoClient().testdb.products
+    index = SkuIndex(MongoProductStore(coll.database), ttl=0)
+    assert not index.might_contain('LATE')
+    coll.insert_one({'sku': 'LATE'})
+    assert _eventually(lambda: index.might_contain('LATE'))
+
+
+def test_reload_does_not_block_callers(monkeypatch):
+    """The rescan runs on a background thread; the old set answers meanwhile and keeps new adds."""
+    coll = MongoClient().testdb.products
+    coll.insert_one({'sku': 'A'})
+    store = MongoProductStore(coll.database)
+    index = SkuIndex(store, ttl=60)
+    assert index.might_contain('A')
+
+    release = threading.Event()
+    scan = store.iter_skus
+    monkeypatch.setattr(store, 'iter_skus', lambda: (release.wait(5), scan())[1])
+    index._loaded_at -= 60
+
+    started = time.monotonic()
+    assert index.might_contain('A') and not index.might_contain('B')
+    index.add('B')
+    assert time.monotonic() - started < 1
+
+    release.set()
+    assert _eventually(lambda: index._added is None)
+    assert index.might_contain('A') and index.might_contain('B')
+
+
+def test_add_product_skips_pre_read_for_new_sku(app, client, headers, monkeypatch):
+    """A definite miss goes straight to insert_one."""
+    app.sku_index.might_contain('warm-up')
+    calls = []
+    collection_class = type(app.db.products)
+    original = collection_class.find_one
+
+    def find_one(self, *args, **kwargs):
+        calls.append((self.name, args))
+        return original(self, *args, **kwargs)
+
+    monkeypatch.setattr(collection_class, 'find_one', find_one)
+
+    res = client.post('/products', json=_product('NEW-1'), headers=headers)
+    assert res.status_code == 201
+    assert not [args for name, args in calls if name == 'products']
+
+
+def test_add_product_duplicate_is_409(client, headers):
+    assert client.post('/products', json=_product('OLD-1'), headers=headers).status_code == 409
+    assert client.post('/products', json=_product('NEW-2'), headers=headers).status_code == 201
+    assert client.post('/products', json=_product('NEW-2'), headers=headers).status_code == 409
+
+
+def test_unique_index_catches_duplicate_unknown_to_index(app, client, headers):
+    """A SKU inserted by another worker is rejected by the unique index."""
+    app.sku_index.might_contain('warm-up')
+    app.db.products.insert_one({'name': 'Other', 'type': 'Test', 'sku': 'OTHER-1', 'quantity': 1, 'price': 1.0})
+
+    res = client.post('/products', json=_product('OTHER-1'), headers=headers)
+    assert res.status_code == 409
+    assert app.sku_index.might_contain('OTHER-1')
+
+# --- Hot SKU lookup Tests ---
+
+def test_get_by_sku_uses_cache(app, client, headers):
+    res = client.get('/products/sku/OLD-1', headers=headers)
+    assert res.status_code == 200
+    assert res.get_json()['name'] == 'Existing'
+
+    client.get('/products/sku/OLD-1', headers=headers)
+    assert app.product_cache.stats['hits'] == 1
+
+
+def test_get_by_sku_not_found(client, headers):
+    assert client.get('/products/sku/MISSING', headers=headers).status_code == 404
+
+
+def test_quantity_update_invalidates_cache(app, client, headers):
+    product_id = client.get('/products/sku/OLD-1', headers=headers).get_json()['id']
+    client.put(f'/products/{product_id}/quantity', json={'quantity': 40}, headers=headers)
+
+    assert client.get('/products/sku/OLD-1', headers=headers).get_json()['quantity'] == 40
+
+
+def test_cache_evicts_least_recently_used():
+    cache = HotProductCache(max_size=2, ttl=60)
+    for sku in ('A', 'B'):
+        cache.put(sku, {'_id': sku, 'sku': sku})
+    cache.get('A')
+    cache.put('C', {'_id': 'C', 'sku': 'C'})
+
+    assert cache.get('B') is None
+    assert cache.get('A') is not None and cache.get('C') is not None
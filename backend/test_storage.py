@@ -0,0 +1,403 @@
+import threading
+from datetime import datetime, timedelta, timezone
+import pytest
+from flask import Flask
+from mongomock import MongoClient
+from auth import auth_bp
+from products import product_bp
+from storage import DuplicateError, create_audit_store, create_job_store, create_location_store, create_movement_store, create_stores
+
+# --- Test Fixtures: every backend runs the same conformance suite ---
+
+@pytest.fixture(params=['mongo', 'memory', 'sqlite'])
+def stores(request, tmp_path):
+    """A fresh (product_store, user_store) pair for each storage backend."""
+    db = MongoClient().testdb if request.param == 'mongo' else None
+    return create_stores(request.param, db=db, sqlite_path=str(tmp_path / 'inventory.db'))
+
+
+@pytest.fixture
+def products(stores):
+    store = stores[0]
+    store.ensure_indexes()
+    return store
+
+
+@pytest.fixture
+def users(stores):
+    return stores[1]
+
+
+def _product(sku, quantity=1, **extra):
+    return dict({'name': f'Item {sku}', 'type': 'Test', 'sku': sku, 'image_url': '',
+                 'description': '', 'quantity': quantity, 'price': 2.5, 'added_by': 'tester'}, **extra)
+
+# --- Product store conformance ---
+
+def test_insert_and_get(products):
+    product_id = products.insert(_product('A', 3))
+
+    product = products.get(product_id)
+    assert isinstance(product_id, str)
+    assert str(product['_id']) == product_id
+    assert product['sku'] == 'A' and product['quantity'] == 3 and product['price'] == 2.5
+
+
+def test_duplicate_sku_raises(products):
+    products.insert(_product('A'))
+    with pytest.raises(DuplicateError):
+        products.insert(_product('A'))
+
+
+def test_unknown_and_malformed_ids_do_not_match(products):
+    assert products.get('64b7f0c2a1b2c3d4e5f60718') is None
+    assert products.get('not-an-id') is None
+    assert products.set_quantity('not-an-id', 1) is False
+    assert products.get_many(['not-an-id']) == []
+
+
+def test_get_by_sku_with_projection(products):
+    products.insert(_product('A', 7))
+
+    product = products.get_by_sku('A', ['quantity'])
+    assert set(product) == {'_id', 'quantity'}
+    assert product['quantity'] == 7
+    assert products.get_by_sku('B') is None
+
+
+def test_get_many(products):
+    ids = [products.insert(_product(sku)) for sku in ('A', 'B', 'C')]
+
+    found = products.get_many([ids[2], ids[0], ids[0], '64b7f0c2a1b2c3d4e5f60718'])
+    assert sorted(p['sku'] for p in found) == ['A', 'C']
+
+    found = products.get_many_by_sku(['C', 'Z', 'B'], ['sku'])
+    assert sorted(p['sku'] for p in found) == ['B', 'C']
+
+
+def test_list_paginates_in_insertion_order(products):
+    for i in range(5):
+        products.insert(_product(f'S{i}'))
+
+    assert [p['sku'] for p in products.list(0, 2)] == ['S0', 'S1']
+    assert [p['sku'] for p in products.list(4, 2)] == ['S4']
+    assert list(products.list(10, 2)) == []
+
+
+def test_list_after_pages_by_id(products):
+    ids = sorted(products.insert(_product(f'S{i}')) for i in range(5))
+
+    first = list(products.list_after(None, 2))
+    assert [str(p['_id']) for p in first] == ids[:2]
+    assert [str(p['_id']) for p in products.list_after(ids[1], 10)] == ids[2:]
+    assert list(products.list_after(ids[4], 2)) == []
+
+
+def test_set_quantity_and_set_quantities(products):
+    a = products.insert(_product('A'))
+    b = products.insert(_product('B'))
+
+    assert products.set_quantity(a, 10) is True
+    assert products.set_quantity('64b7f0c2a1b2c3d4e5f60718', 10) is False
+    products.set_quantities({a: 20, b: 30, '64b7f0c2a1b2c3d4e5f60718': 40})
+
+    assert products.get(a)['quantity'] == 20
+    assert products.get(b)['quantity'] == 30
+
+
+def test_set_image(products):
+    a = products.insert(_product('A'))
+    assert products.set_image(a, 'f' * 64) is True
+    assert products.get(a)['image_hash'] == 'f' * 64
+    assert products.set_image(a, None) is True
+    assert 'image_hash' not in products.get(a)
+    assert products.set_image('64b7f0c2a1b2c3d4e5f60718', 'f' * 64) is False
+
+
+def test_extra_fields_round_trip(products):
+    product_id = products.insert(_product('A', image_hash='abc123'))
+    assert products.get(product_id)['image_hash'] == 'abc123'
+
+
+def test_iter_skus(products):
+    for sku in ('A', 'B'):
+        products.insert(_product(sku))
+    assert sorted(products.iter_skus()) == ['A', 'B']
+
+
+def test_concurrent_inserts_keep_sku_unique(products):
+    errors = []
+
+    def insert():
+        try:
+            products.insert(_product('RACE'))
+        except DuplicateError:
+            errors.append(1)
+
+    threads = [threading.Thread(target=insert) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(errors) == 7
+
+# --- Movement store conformance ---
+
+T0 = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def _movement(product_id, minutes):
+    return {'product_id': product_id, 'reason': 'test', 'user': 'tester', 'at': T0 + timedelta(minutes=minutes)}
+
+
+def test_add_quantity_is_conditional(products):
+    a = products.insert(_product('A', 5))
+
+    assert products.add_quantity(a, 3) == 8
+    assert products.add_quantity(a, -8) == 0
+    assert products.add_quantity(a, -1) is None
+    assert products.get(a)['quantity'] == 0
+    assert products.add_quantity('64b7f0c2a1b2c3d4e5f60718', 1) is None
+
+
+def test_swap_quantity_returns_previous(products):
+    a = products.insert(_product('A', 5))
+
+    assert products.swap_quantity(a, 9) == 5
+    assert products.swap_quantity(a, 2) == 9
+    assert products.get(a)['quantity'] == 2
+    assert products.swap_quantity('64b7f0c2a1b2c3d4e5f60718', 1) is None
+
+
+def test_movements_are_recorded_with_the_quantity(products):
+    movements = create_movement_store(products)
+    movements.ensure_indexes()
+    a = products.insert(_product('A', 10))
+
+    assert products.add_quantity(a, 4, _movement(a, 1)) == 14
+    assert products.add_quantity(a, -20, _movement(a, 2)) is None
+    assert products.swap_quantity(a, 13, _movement(a, 2)) == 14
+    assert products.swap_quantity(a, 13, _movement(a, 3)) == 13    # no difference: no movement
+    assert products.add_quantity(a, 7, _movement(a, 3)) == 20
+
+    for flushed in (False, True):   # Mongo reads them before and after moving them
+        history = movements.history(a, 2)
+        assert [(m['seq'], m['delta'], m['quantity']) for m in history] == [(3, 7, 20), (2, -1, 13)]
+        assert history[0]['at'] == T0 + timedelta(minutes=3) and history[0]['user'] == 'tester'
+        assert movements.quantity_at(a, T0) == 10
+        assert movements.quantity_at(a, T0 + timedelta(minutes=2)) == 13
+        assert movements.quantity_at(a, T0 + timedelta(hours=1)) == 20
+        assert movements.quantity_at('64b7f0c2a1b2c3d4e5f60718', T0) is None
+        assert movements.flush(10) == (3 if movements.deferred and not flushed else 0)
+
+# --- Location store conformance ---
+
+@pytest.fixture
+def locations(products):
+    store = create_location_store(products)
+    store.ensure_indexes()
+    return store
+
+
+def test_location_writes_move_the_product_total(products, locations):
+    a = products.insert(_product('A', 0))
+
+    assert locations.set_quantity('A', 'WH-1', 10) == 10
+    assert locations.set_quantity('A', 'WH-2', 5) == 5
+    assert locations.set_quantity('A', 'WH-1', 4) == -6
+    assert products.get(a)['quantity'] == 9
+
+    assert locations.get('A', 'WH-1')['quantity'] == 4
+    assert locations.get('A', 'WH-3') is None
+    assert [(r['location'], r['quantity']) for r in locations.list_for_sku('A')] == [('WH-1', 4), ('WH-2', 5)]
+
+
+
+def test_location_write_never_makes_the_total_negative(products, locations):
+    a = products.insert(_product('A', 0))
+    assert not locations.has_records('A')
+    locations.set_quantity('A', 'WH-1', 10)
+    assert locations.has_records('A')
+    products.set_quantity(a, 3)   # stock taken out of the total elsewhere
+
+    assert locations.set_quantity('A', 'WH-1', 0) is None
+    assert locations.get('A', 'WH-1')['quantity'] == 10
+    assert locations.set_quantity('A', 'WH-1', 7) == -3
+    assert products.get(a)['quantity'] == 0
+
+    assert locations.set_quantity('A', 'WH-2', 5) == 5
+    assert products.get(a)['quantity'] == 5
+
+
+def test_location_write_records_the_movement(products, locations):
+    movements = create_movement_store(products)
+    movements.ensure_indexes()
+    a = products.insert(_product('A', 2))
+
+    assert locations.set_quantity('A', 'WH-1', 10, _movement(a, 1)) == 10
+    assert locations.set_quantity('A', 'WH-1', 10, _movement(a, 2)) == 0
+    assert locations.set_quantity('A', 'WH-1', 4, _movement(a, 3)) == -6
+    assert [(m['delta'], m['quantity']) for m in movements.history(a, 10)] == [(-6, 6), (10, 12)]
+
+def test_list_for_location_is_paginated_by_sku(products, locations):
+    for sku in ('C', 'A', 'B'):
+        products.insert(_product(sku, 0))
+        locations.set_quantity(sku, 'WH-1', 1)
+    locations.set_quantity('A', 'WH-2', 1)
+
+    assert [r['sku'] for r in locations.list_for_location('WH-1', 0, 2)] == ['A', 'B']
+    assert [r['sku'] for r in locations.list_for_location('WH-1', 2, 2)] == ['C']
+
+
+def test_transfer_keeps_the_total(products, locations):
+    a = products.insert(_product('A', 0))
+    locations.set_quantity('A', 'WH-1', 10)
+
+    assert locations.transfer('A', 'WH-1', 'WH-2', 4) is True
+    assert locations.transfer('A', 'WH-1', 'WH-2', 7) is False
+    assert locations.transfer('A', 'WH-9', 'WH-2', 1) is False
+    assert locations.get('A', 'WH-1')['quantity'] == 6
+    assert locations.get('A', 'WH-2')['quantity'] == 4
+    assert products.get(a)['quantity'] == 10
+
+
+def test_concurrent_location_writes_keep_the_total_exact(products, locations):
+    a = products.insert(_product('A', 0))
+
+    def write(i):
+        locations.set_quantity('A', f'WH-{i % 4}', i)
+
+    threads = [threading.Thread(target=write, args=(i,)) for i in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert products.get(a)['quantity'] == sum(r['quantity'] for r in locations.list_for_sku('A'))
+
+
+def test_interrupted_mongo_location_write_is_finished_by_the_next_read(monkeypatch):
+    db = MongoClient().testdb
+    products = create_stores('mongo', db=db)[0]
+    locations = create_location_store(products)
+    locations.ensure_indexes()
+    a = products.insert(_product('A', 0))
+    locations.set_quantity('A', 'WH-1', 10)
+
+    def stop(doc):
+        raise TimeoutError('deadline')
+
+    # The record is written, then the request stops before the total moves.
+    monkeypatch.setattr(locations, '_settle', stop)
+    with pytest.raises(TimeoutError):
+        locations.set_quantity('A', 'WH-1', 4)
+    monkeypatch.undo()
+    stale = db.stock_locations.find_one({'sku': 'A', 'location': 'WH-1'})
+    assert stale['pending']['change'] == -6 and products.get(a)['quantity'] == 10
+
+    assert locations.get('A', 'WH-1')['quantity'] == 4
+    assert products.get(a)['quantity'] == 4
+    # Finishing the same write again changes nothing.
+    locations._settle(stale)
+    assert products.get(a)['quantity'] == 4
+    assert locations.set_quantity('A', 'WH-1', 5) == 1
+    assert products.get(a)['quantity'] == 5 and locations.get('A', 'WH-1')['quantity'] == 5
+
+# --- Job store conformance ---
+
+@pytest.fixture
+def jobs(products):
+    store = create_job_store(products)
+    store.ensure_indexes()
+    return store
+
+
+def _job(owner, lease_until, status='queued'):
+    return {'kind': 'export', 'params': {}, 'status': status, 'offset': 0, 'owner': owner, 'lease_until': lease_until}
+
+
+def test_job_claim_respects_live_leases(jobs):
+    job_id = jobs.insert(_job('a', 100.0))
+
+    assert jobs.claim(job_id, 'b', 130.0, now=50.0) is None
+    assert jobs.claim(job_id, 'a', 130.0, now=50.0)['status'] == 'running'
+    claimed = jobs.claim(job_id, 'b', 230.0, now=200.0)   # a's lease ran out
+    assert claimed['owner'] == 'b' and claimed['lease_until'] == 230.0
+
+    assert jobs.update(job_id, {'offset': 500}, owner='a') is None
+    assert jobs.update(job_id, {'offset': 500}, owner='b')['offset'] == 500
+    assert jobs.get(job_id)['offset'] == 500
+    assert jobs.get('not-an-id') is None
+
+
+def test_find_resumable_jobs(jobs):
+    expired = jobs.insert(_job('a', 10.0, status='running'))
+    jobs.insert(_job('b', 1000.0, status='running'))
+    jobs.insert(_job(None, None, status='succeeded'))
+
+    assert jobs.find_resumable(now=100.0) == [expired]
+    jobs.update(expired, {'status': 'succeeded'})
+    assert jobs.claim(expired, 'c', 200.0, now=100.0) is None
+    assert jobs.find_resumable(now=100.0) == []
+
+# --- Audit store conformance ---
+
+def _event(action, target, minutes=0):
+    return {'action': action, 'user': 'u1', 'target': target, 'ip': '127.0.0.1', 'details': {'n': minutes},
+            'at': datetime.now(timezone.utc) - timedelta(minutes=minutes)}
+
+
+def test_audit_events_newest_first(products):
+    audit = create_audit_store(products, retention=86400)
+    audit.ensure_indexes()
+    audit.append([_event('product.create', 'p1', 3), _event('product.quantity', 'p1', 2)])
+    audit.append([_event('auth.login', 'alice', 1)])
+
+    assert [e['action'] for e in audit.recent()] == ['auth.login', 'product.quantity', 'product.create']
+    assert [e['action'] for e in audit.recent(target='p1', limit=1)] == ['product.quantity']
+    assert audit.recent(action='product.create')[0]['details'] == {'n': 3}
+
+
+def test_expired_audit_events_are_removed(stores):
+    if stores[0].__class__.__name__.startswith('Mongo'):
+        pytest.skip('Mongo expires events with a TTL index on the server')
+    audit = create_audit_store(stores[0], retention=60)
+    audit.append([_event('auth.login', 'alice', minutes=5)])
+    audit.append([_event('auth.login', 'bob')])
+    assert [e['target'] for e in audit.recent()] == ['bob']
+
+# --- User store conformance ---
+
+def test_user_insert_and_lookup(users):
+    users.insert({'public_id': 'p1', 'username': 'alice', 'password': 'hash'})
+
+    assert users.get_by_username('alice')['public_id'] == 'p1'
+    assert users.get_by_public_id('p1')['username'] == 'alice'
+    assert users.get_by_username('bob') is None
+    assert users.get_by_public_id('p2') is None
+
+# --- HTTP layer on each backend ---
+
+def test_api_round_trip(stores):
+    flask_app = Flask(__name__)
+    flask_app.config['TESTING'] = True
+    flask_app.config['SECRET_KEY'] = 'test-secret-key-for-jwt'
+    flask_app.product_store, flask_app.user_store = stores
+    flask_app.register_blueprint(auth_bp)
+    flask_app.register_blueprint(product_bp, url_prefix='/products')
+    client = flask_app.test_client()
+
+    assert client.post('/register', json={'username': 'edge', 'password': 'password123'}).status_code == 201
+    assert client.post('/register', json={'username': 'edge', 'password': 'password123'}).status_code == 409
+    token = client.post('/login', json={'username': 'edge', 'password': 'password123'}).get_json()['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+
+    res = client.post('/products', json=_product('EDGE-1', 5), headers=headers)
+    assert res.status_code == 201
+    product_id = res.get_json()['product_id']
+    assert client.post('/products', json=_product('EDGE-1', 5), headers=headers).status_code == 409
+
+    res = client.put(f'/products/{product_id}/quantity', json={'quantity': 9}, headers=headers)
+    assert res.status_code == 200 and res.get_json()['quantity'] == 9
+
+    listed = client.get('/products', headers=headers).get_json()
+    assert [(p['id'], p['quantity']) for p in listed] == [(product_id, 9)]
@@ -0,0 +1,83 @@
+import pytest
+from validation import Validator
+
+# --- Test Fixtures ---
+
+@pytest.fixture
+def product():
+    return {'name': 'Desk', 'type': 'Furniture', 'sku': 'DESK-1', 'quantity': 3, 'price': 120.0}
+
+# --- Compiled Validator Tests ---
+
+def test_schema_keywords():
+    validate = Validator({
+        'id': 'Sample',
+        'required': ['code', 'count'],
+        'properties': {
+            'code': {'type': 'string', 'minLength': 2, 'maxLength': 4},
+            'count': {'type': 'integer', 'minimum': 1, 'maximum': 10},
+            'size': {'type': 'string', 'enum': ['S', 'M']},
+            'note': {'description': 'Not checked.'},
+        }
+    })
+    assert validate({'code': 'AB', 'count': 5, 'size': 'M', 'note': None, 'other': 1}) == {}
+    assert validate({}) == {'code': 'is required', 'count': 'is required'}
+    assert validate({'code': 'A', 'count': 11, 'size': 'XL'}) == {
+        'code': 'must be at least 2 characters long',
+        'count': 'must be at most 10',
+        'size': 'must be one of: S, M',
+    }
+    assert validate({'code': 'ABCDE', 'count': 0}) == {
+        'code': 'must be at most 4 characters long', 'count': 'must be at least 1'
+    }
+    assert validate({'code': 7, 'count': True}) == {'code': 'must be a string', 'count': 'must be an integer'}
+    assert validate(['code']) == {'body': 'must be a JSON object'}
+
+
+def test_app_compiles_the_swagger_body_schemas(app, product):
+    assert {'Product', 'ProductQuantity', 'UserLogin'} <= set(app.validators)
+
+    validate = app.validators['Product']
+    assert validate(product) == {}
+    assert validate(dict(product, price=5)) == {}
+    assert validate(dict(product, name='', quantity=-1, price='free')) == {
+        'name': 'must not be empty', 'quantity': 'must be at least 0', 'price': 'must be a number'
+    }
+    assert app.validators['ProductQuantity']({'quantity': 2.5}) == {'quantity': 'must be an integer'}
+
+# --- Endpoint Tests ---
+
+def test_add_product_returns_field_errors(client, headers, product):
+    res = client.post('/products', json=dict(product, sku='', quantity='3'), headers=headers)
+    assert res.status_code == 400
+    body = res.get_json()
+    assert body['errors'] == {'sku': 'must not be empty', 'quantity': 'must be an integer'}
+    assert body['message'] == 'Invalid product data: sku must not be empty; quantity must be an integer.'
+
+
+def test_update_quantity_returns_field_errors(app, client, headers, product):
+    product_id = app.product_store.insert(product)
+    res = client.put(f'/products/{product_id}/quantity', json={'quantity': -2}, headers=headers)
+    assert res.status_code == 400
+    assert res.get_json()['errors'] == {'quantity': 'must be at least 0'}
+    res = client.put(f'/products/{product_id}/quantity', json={}, headers=headers)
+    assert res.get_json()['errors'] == {'quantity': 'is required'}
+
+
+def test_handlers_refuse_bodies_that_are_not_objects(app, client, headers, product):
+    product_id = app.product_store.insert(product)
+    routes = [
+        ('post', '/products'),
+        ('put', f'/products/{product_id}/quantity'),
+        ('put', f'/products/{product_id}/image'),
+        ('put', '/locations/WH-1/DESK-1'),
+        ('post', '/locations/transfer'),
+        ('post', '/jobs'),
+    ]
+    for body in ([1], 'text', 7):
+        for method, url in routes:
+            res = getattr(client, method)(url, json=body, headers=headers)
+            assert res.status_code == 400, (url, body)
+            assert res.get_json()['errors'] == {'body': 'must be a JSON object'}, (url, body)
+        assert client.post('/register', json=body).status_code == 400
+        assert client.post('/login', json=body).status_code == 401
@@ -0,0 +1,164 @@
+import time
+import pytest
+from storage import MongoProductStore
+from write_behind import QuantityWriteBuffer
+
+# --- Test Fixtures ---
+
+@pytest.fixture
+def collection(db):
+    """The test products collection seeded with two products."""
+    db.products.insert_many([
+        {'name': 'Scanner A', 'type': 'Device', 'sku': 'A', 'quantity': 1, 'price': 10.0},
+        {'name': 'Scanner B', 'type': 'Device', 'sku': 'B', 'quantity': 1, 'price': 10.0},
+    ])
+    return db.products
+
+
+@pytest.fixture
+def buffer(collection):
+    """A buffer with a long interval so that only explicit triggers flush."""
+    buf = QuantityWriteBuffer(MongoProductStore(collection.database), flush_interval=60, max_pending=100, max_staleness=60)
+    yield buf
+    buf.close()
+
+
+@pytest.fixture
+def app(app, collection):
+    """The test app with write-behind enabled."""
+    app.quantity_buffer = QuantityWriteBuffer(app.product_store, flush_interval=60, max_pending=100, max_staleness=60)
+    yield app
+    app.quantity_buffer.close()
+
+def _eventually(check, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not check() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return check()
+
+# --- Buffer Tests ---
+
+def test_put_coalesces_per_product(buffer, collection):
+    """Only the last quantity for a product is written, in a single flush."""
+    product = collection.find_one({'sku': 'A'})
+    for quantity in (5, 6, 7):
+        buffer.put(str(product['_id']), quantity)
+
+    assert len(buffer) == 1
+    assert buffer.stats['coalesced'] == 2
+    assert collection.find_one({'sku': 'A'})['quantity'] == 1
+
+    assert buffer.flush() == 1
+    assert collection.find_one({'sku': 'A'})['quantity'] == 7
+    assert len(buffer) == 0
+
+
+def test_flush_when_size_threshold_reached(collection):
+    buf = QuantityWriteBuffer(MongoProductStore(collection.database), flush_interval=60, max_pending=2, max_staleness=60)
+    a = collection.find_one({'sku': 'A'})
+    b = collection.find_one({'sku': 'B'})
+
+    buf.put(str(a['_id']), 10)
+    assert collection.find_one({'sku': 'A'})['quantity'] == 1
+    buf.put(str(b['_id']), 20)
+
+    # The flusher is woken and writes both, well before the 60s interval.
+    assert _eventually(lambda: collection.find_one({'sku': 'B'})['quantity'] == 20)
+    assert collection.find_one({'sku': 'A'})['quantity'] == 10
+    buf.close()
+
+
+def test_flush_when_max_staleness_exceeded(collection):
+    buf = QuantityWriteBuffer(MongoProductStore(collection.database), flush_interval=60, max_pending=100, max_staleness=0.01)
+    a = collection.find_one({'sku': 'A'})
+    b = collection.find_one({'sku': 'B'})
+
+    buf.put(str(a['_id']), 3)
+    time.sleep(0.02)
+    buf.put(str(b['_id']), 4)
+
+    assert _eventually(lambda: collection.find_one({'sku': 'B'})['quantity'] == 4)
+    assert collection.find_one({'sku': 'A'})['quantity'] == 3
+    buf.close()
+
+
+def test_max_staleness_is_kept_without_further_writes(collection):
+    """The flusher wakes by itself for the oldest write; no later put() is needed."""
+    buf = QuantityWriteBuffer(MongoProductStore(collection.database), flush_interval=60, max_pending=100, max_staleness=0.05)
+    a = collection.find_one({'sku': 'A'})
+
+    buf.put(str(a['_id']), 9)
+    assert _eventually(lambda: collection.find_one({'sku': 'A'})['quantity'] == 9, timeout=1)
+    buf.close()
+
+
+def test_failed_flush_does_not_fail_the_write(collection, monkeypatch):
+    """A threshold only wakes the flusher; a store error is counted and retried, not raised to the caller."""
+    store = MongoProductStore(collection.database)
+    buf = QuantityWriteBuffer(store, flush_interval=60, max_pending=1, max_staleness=60)
+    a = str(collection.find_one({'sku': 'A'})['_id'])
+    real = store.set_quantities
+    monkeypatch.setattr(store, 'set_quantities', lambda values: (_ for _ in ()).throw(RuntimeError('down')))
+
+    buf.put(a, 5)
+    assert _eventually(lambda: buf.stats['errors'] >= 1)
+    assert buf.get(a) == 5
+
+    monkeypatch.setattr(store, 'set_quantities', real)
+    assert buf.flush() == 1
+    assert collection.find_one({'sku': 'A'})['quantity'] == 5
+    buf.close()
+
+
+def test_background_flusher_writes_on_interval(collection):
+    buf = QuantityWriteBuffer(MongoProductStore(collection.database), flush_interval=0.01, max_pending=100, max_staleness=60)
+    a = collection.find_one({'sku': 'A'})
+    buf.put(str(a['_id']), 42)
+
+    deadline = time.monotonic() + 2
+    while collection.find_one({'sku': 'A'})['quantity'] != 42 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert collection.find_one({'sku': 'A'})['quantity'] == 42
+    buf.close()
+
+
+def test_close_flushes_pending_and_rejects_writes(buffer, collection):
+    a = collection.find_one({'sku': 'A'})
+    buffer.put(str(a['_id']), 9)
+    buffer.close()
+
+    assert collection.find_one({'sku': 'A'})['quantity'] == 9
+    with pytest.raises(RuntimeError):
+        buffer.put(str(a['_id']), 10)
+
+
+def test_overlay_returns_pending_value(buffer, collection):
+    a = collection.find_one({'sku': 'A'})
+    buffer.put(str(a['_id']), 11)
+
+    assert buffer.get(str(a['_id'])) == 11
+    assert buffer.overlay(collection.find_one({'sku': 'A'}))['quantity'] == 11
+    assert buffer.overlay(collection.find_one({'sku': 'B'}))['quantity'] == 1
+
+# --- Endpoint Tests ---
+
+def test_update_quantity_is_buffered_and_visible(app, client, headers, collection):
+    """The PUT is acknowledged immediately and GET /products sees the pending value."""
+    product = collection.find_one({'sku': 'A'})
+
+    res = client.put(f"/products/{product['_id']}/quantity", json={'quantity': 77}, headers=headers)
+    assert res.status_code == 200
+    assert res.get_json()['quantity'] == 77
+    assert collection.find_one({'sku': 'A'})['quantity'] == 1
+
+    listed = {p['sku']: p['quantity'] for p in client.get('/products', headers=headers).get_json()}
+    assert listed['A'] == 77
+
+    app.quantity_buffer.flush()
+    assert collection.find_one({'sku': 'A'})['quantity'] == 77
+
+
+def test_update_quantity_unknown_product_is_404(app, client, headers):
+    res = client.put('/products/64b7f0c2a1b2c3d4e5f60718/quantity', json={'quantity': 1}, headers=headers)
+    assert res.status_code == 404
+    assert len(app.quantity_buffer) == 0
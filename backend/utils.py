@@ -1,6 +1,54 @@
 from flask import request, jsonify, current_app
 from functools import wraps
+import threading
 import jwt
+import pymongo
+from pymongo.errors import PyMongoError, ServerSelectionTimeoutError
+from storage import get_user_store
+
+# --- Request deadline counters (reported by /health) ---
+deadline_stats = {'exceeded': 0, 'unavailable': 0, 'by_endpoint': {}}
+_deadline_lock = threading.Lock()
+
+
+def _record_deadline(kind):
+    with _deadline_lock:
+        deadline_stats[kind] += 1
+        per_endpoint = deadline_stats['by_endpoint'].setdefault(request.endpoint, {'exceeded': 0, 'unavailable': 0})
+        per_endpoint[kind] += 1
+
+
+def request_deadline():
+    """Returns the deadline in seconds for the current route, or None for no deadline."""
+    deadlines = current_app.config.get('REQUEST_DEADLINES', {})
+    return deadlines.get(request.endpoint, current_app.config.get('REQUEST_DEADLINE'))
+
+
+def with_deadline(f):
+    """
+    Runs the route under `pymongo.timeout()` so that every Mongo call it makes,
+    including the user lookup in `token_required`, shares one deadline and is
+    sent with a matching `maxTimeMS`.
+    """
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        budget = request_deadline()
+        if not budget:
+            return f(*args, **kwargs)
+
+        try:
+            with pymongo.timeout(budget):
+                return f(*args, **kwargs)
+        except ServerSelectionTimeoutError:
+            _record_deadline('unavailable')
+            return jsonify({'message': 'Database unavailable, please retry.'}), 503, {'Retry-After': '1'}
+        except PyMongoError as e:
+            if not e.timeout:
+                raise
+            _record_deadline('exceeded')
+            return jsonify({'message': 'Request deadline exceeded.'}), 504
+
+    return decorated
 
 def token_required(f):
     @wraps(f)
@@ -18,8 +66,7 @@ def token_required(f):
 
         try:
             data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=["HS256"])
-            db = current_app.db
-            current_user = db.users.find_one({'public_id': data['public_id']})
+            current_user = get_user_store().get_by_public_id(data['public_id'])
             if not current_user:
                 return jsonify({'message': 'User not found!'}), 401
         except jwt.ExpiredSignatureError:
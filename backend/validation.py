@@ -0,0 +1,124 @@
+from flask import current_app, jsonify
+
+# JSON schema type -> exact Python type names (JSON decoding never yields
+# subclasses, and a bool must not pass as an integer).
+JSON_TYPES = {
+    'string': ('str',),
+    'integer': ('int',),
+    'number': ('int', 'float'),
+    'boolean': ('bool',),
+    'array': ('list',),
+    'object': ('dict',),
+}
+
+BODY = 'body'
+_MISSING = object()
+
+
+def _field_checks(prop, constant):
+    """
+    Turns one property schema into (condition, message) pairs, where the
+    condition is a Python expression on `v` that is true for an invalid value.
+    """
+    checks = []
+    kind = prop.get('type')
+    if kind is not None:
+        condition = ' and '.join(f'type(v) is not {name}' for name in JSON_TYPES[kind])
+        checks.append((condition, f"must be {'an' if kind[0] in 'aeiou' else 'a'} {kind}"))
+    if 'enum' in prop:
+        allowed = constant(frozenset(prop['enum']))
+        checks.append((f'v not in {allowed}', f"must be one of: {', '.join(map(str, prop['enum']))}"))
+    if 'minLength' in prop:
+        min_length = prop['minLength']
+        message = 'must not be empty' if min_length == 1 else f'must be at least {min_length} characters long'
+        checks.append((f'len(v) < {int(min_length)}', message))
+    if 'maxLength' in prop:
+        checks.append((f"len(v) > {int(prop['maxLength'])}", f"must be at most {prop['maxLength']} characters long"))
+    if 'minimum' in prop:
+        checks.append((f"v < {constant(prop['minimum'])}", f"must be at least {prop['minimum']}"))
+    if 'maximum' in prop:
+        checks.append((f"v > {constant(prop['maximum'])}", f"must be at most {prop['maximum']}"))
+    return checks
+
+
+class Validator:
+    """
+    A request body schema compiled into a single Python function, so a row
+    is checked with plain inline comparisons and no per-field calls.
+    Calling it with a decoded JSON body returns {field: message} for every
+    invalid field, or an empty dict. Fields that are not in the schema are
+    ignored. The generated code is kept in `source`.
+    """
+
+    def __init__(self, schema):
+        self.name = schema.get('id')
+        properties = schema.get('properties', {})
+        required = schema.get('required', ())
+        namespace = {'_MISSING': _MISSING}
+
+        def constant(value):
+            key = f'_c{len(namespace)}'
+            namespace[key] = value
+            return key
+
+        lines = [
+            'def validate(data):',
+            '    if type(data) is not dict:',
+            f'        return {{{BODY!r}: "must be a JSON object"}}',
+            '    errors = {}',
+        ]
+        for name in list(properties) + [name for name in required if name not in properties]:
+            checks = _field_checks(properties.get(name, {}), constant)
+            if not checks and name not in required:
+                continue
+            lines.append(f'    v = data.get({name!r}, _MISSING)')
+            lines.append('    if v is _MISSING:')
+            lines.append(f'        errors[{name!r}] = "is required"' if name in required else '        pass')
+            for condition, message in checks:
+                lines.append(f'    elif {condition}:')
+                lines.append(f'        errors[{name!r}] = {message!r}')
+        lines.append('    return errors')
+
+        self.source = '\n'.join(lines)
+        exec(compile(self.source, f'<validator {self.name}>', 'exec'), namespace)
+        self._validate = namespace['validate']
+
+    def __call__(self, data):
+        return self._validate(data)
+
+
+def body_schemas(app):
+    """Yields every named request body schema declared in the `swag_from` specs of `app`."""
+    for view in app.view_functions.values():
+        for param in getattr(view, 'specs_dict', {}).get('parameters', ()):
+            schema = param.get('schema') or {}
+            if param.get('in') == 'body' and 'id' in schema:
+                yield schema
+
+
+def compile_validators(app):
+    """Compiles every named body schema of `app` once. Returns {schema id: Validator}."""
+    return {schema['id']: Validator(schema) for schema in body_schemas(app)}
+
+
+def get_validators():
+    """Returns the validators of the current app, compiling them on first use if `create_app` did not."""
+    validators = getattr(current_app, 'validators', None)
+    if validators is None:
+        validators = current_app.validators = compile_validators(current_app)
+    return validators
+
+
+def validate(name, data):
+    """Validates `data` against the named schema of the current app. Returns {field: message}."""
+    return get_validators()[name](data)
+
+
+def describe(errors):
+    """One readable sentence for a set of field errors, e.g. "quantity must be at least 0"."""
+    return '; '.join(f'{field} {message}' for field, message in errors.items())
+
+
+def invalid(errors, what='data'):
+    """The 400 response for failed validation: a summary message plus the per-field errors."""
+    return jsonify({'message': f'Invalid {what}: {describe(errors)}.', 'errors': errors}), 400
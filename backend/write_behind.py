@@ -0,0 +1,169 @@
+import atexit
+import threading
+import time
+
+
+class QuantityWriteBuffer:
+    """
+    Coalesces absolute quantity writes per product in memory and flushes the
+    latest value for each product with a single `set_quantities` call on the
+    product store (one `bulk_write` on Mongo).
+
+    The background thread flushes every `flush_interval` seconds, or sooner
+    once the oldest pending write is `max_staleness` seconds old, even if no
+    other write arrives. It is woken early as soon as `max_pending` distinct
+    products are waiting. Pending values are flushed on shutdown.
+    """
+
+    def __init__(self, store, flush_interval=0.5, max_pending=500, max_staleness=2.0):
+        self.store = store
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_staleness = max_staleness
+
+        self._pending = {}    # product_id -> (quantity, first_enqueued_at)
+        self._oldest = None   # first_enqueued_at of the oldest pending write
+        self._inflight = {}   # batch currently being written
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._closed = False
+
+        self.stats = {'enqueued': 0, 'coalesced': 0, 'flushed': 0, 'flushes': 0, 'errors': 0}
+
+    # --- Writes ---
+    def put(self, product_id, quantity):
+        now = time.monotonic()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError('Quantity write buffer is closed.')
+            entry = self._pending.get(product_id)
+            if entry is not None:
+                # Keep the first enqueue time so staleness is measured from the
+                # oldest unflushed write, not the newest one.
+                self.stats['coalesced'] += 1
+                self._pending[product_id] = (quantity, entry[1])
+            else:
+                self._pending[product_id] = (quantity, now)
+                if self._oldest is None:
+                    self._oldest = now
+            self.stats['enqueued'] += 1
+            size = len(self._pending)
+            oldest = self._oldest
+
+        self._ensure_flusher()
+
+        # Only wake the flusher: a write that fails must not fail this request,
+        # since the value is already buffered and will be written later.
+        if size >= self.max_pending or now - oldest >= self.max_staleness:
+            self._wake.set()
+
+    def flush(self):
+        """Writes every pending value to the store. Returns the number of products written."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+                oldest, self._oldest = self._oldest, None
+                self._inflight = batch
+            if not batch:
+                return 0
+
+            try:
+                self.store.set_quantities({product_id: quantity for product_id, (quantity, _) in batch.items()})
+            except Exception:
+                with self._lock:
+                    # Requeue the batch, but never overwrite a newer value that
+                    # arrived while the write was in flight.
+                    for product_id, entry in batch.items():
+                        self._pending.setdefault(product_id, entry)
+                    self._oldest = oldest if self._oldest is None else min(self._oldest, oldest)
+                    self._inflight = {}
+                    self.stats['errors'] += 1
+                raise
+
+            with self._lock:
+                self._inflight = {}
+                self.stats['flushes'] += 1
+                self.stats['flushed'] += len(batch)
+            return len(batch)
+
+    def apply_change(self, product_id, write):
+        """
+        Runs `write()`, a store write that changes the stored quantity of a
+        product by the amount it returns, and adds that amount to a pending
+        value of the product so that the next flush does not overwrite it.
+        No flush runs meanwhile, so an in-flight value cannot land after the write.
+        """
+        with self._flush_lock:
+            change = write()
+            if change:
+                with self._lock:
+                    entry = self._pending.get(product_id)
+                    if entry is not None:
+                        self._pending[product_id] = (entry[0] + change, entry[1])
+        return change
+
+    # --- Read-your-writes overlay ---
+    def get(self, product_id):
+        """Returns the pending quantity for a product, or None if nothing is buffered."""
+        with self._lock:
+            entry = self._pending.get(product_id) or self._inflight.get(product_id)
+        return entry[0] if entry is not None else None
+
+    def overlay(self, product):
+        """Replaces the stored quantity of a product document with its pending value, if any."""
+        pending = self.get(str(product['_id']))
+        if pending is not None:
+            product['quantity'] = pending
+        return product
+
+    def __len__(self):
+        with self._lock:
+            return len(self._pending)
+
+    # --- Lifecycle ---
+    def _ensure_flusher(self):
+        # Started lazily so that gunicorn workers each get their own thread
+        # after the fork instead of inheriting a dead one from the master.
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='quantity-write-behind', daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def _wait_time(self):
+        # An empty buffer waits no longer than max_staleness either, so that
+        # a write arriving meanwhile is flushed within it.
+        with self._lock:
+            oldest = self._oldest
+        if oldest is None:
+            return min(self.flush_interval, self.max_staleness)
+        return max(0, min(self.flush_interval, oldest + self.max_staleness - time.monotonic()))
+
+    def _run(self):
+        failed = False
+        while not self._closed:
+            # After a failure the requeued writes are already overdue: wait a full interval before retrying.
+            self._wake.wait(self.flush_interval if failed else self._wait_time())
+            self._wake.clear()
+            try:
+                self.flush()
+                failed = False
+            except Exception as e:
+                failed = True
+                print(f"❌ Quantity write-behind flush failed: {e}")
+
+    def close(self):
+        """Stops the background flusher and writes anything still pending."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._wake.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()
@@ -1,7 +1,7 @@
 "use client"
 
 import { useState, useEffect } from "react"
-import { productAPI } from "../services/api"
+import { productAPI, imageSrc } from "../services/api"
 import toast from "react-hot-toast"
 
 // --- Edit Icon SVG ---
@@ -71,7 +71,7 @@ const ProductDetailModal = ({ product, onClose, onQuantityUpdated }) => {
           {/* Image */}
           <div className="flex justify-center items-center">
             <img
-              src={product.image_url || 'https://placehold.co/600x400/121624/FFFFFF?text=No+Image'}
+              src={imageSrc(product.image_url) || 'https://placehold.co/600x400/121624/FFFFFF?text=No+Image'}
               alt={product.name}
               className="w-full h-auto max-h-80 object-contain rounded-xl border border-gray-700"
               onError={(e) => { e.target.onerror = null; e.target.src = 'https://placehold.co/600x400/121624/FFFFFF?text=No+Image'; }}
@@ -249,7 +249,7 @@ const fetchProducts = async () => {
                         {product.image_url ? (
                           <img
                             className="h-12 w-12 rounded-xl object-cover mr-4 border border-gray-700"
-                            src={product.image_url}
+                            src={imageSrc(product.thumbnail_url || product.image_url)}
                             alt={product.name}
                             onError={(e) => { e.target.src = 'https://placehold.co/100x100/121624/FFFFFF?text=Img'; }}
                           />
@@ -304,7 +304,7 @@ const fetchProducts = async () => {
                   {product.image_url ? (
                     <img
                       className="h-16 w-16 rounded-xl object-cover border border-gray-600"
-                      src={product.image_url}
+                      src={imageSrc(product.thumbnail_url || product.image_url)}
                       alt={product.name}
                       onError={(e) => { e.target.src = 'https://placehold.co/100x100/121624/FFFFFF?text=Img'; }}
                     />
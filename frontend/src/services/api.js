@@ -86,4 +86,8 @@ export const productAPI = {
   },
 }
 
+// Uploaded images come back as paths on the API (e.g. /images/<hash>/thumb/128).
+export const imageSrc = (url) =>
+  url && url.startsWith("/") ? API_BASE_URL.replace(/\/$/, "") + url : url
+
 export default api